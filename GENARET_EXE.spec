@@ -10,7 +10,8 @@ datas = [
     ('static', 'static'),
 ]
 
-hiddenimports = []
+# Imported lazily on the first comparison, so list them for the analysis
+hiddenimports = ['app.services.compare_logic', 'app.services.pdf', 'openpyxl']
 binaries = []
 
 a = Analysis(
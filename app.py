@@ -1,120 +1,774 @@
+import time
+_import_start = time.perf_counter()
 
+import contextvars
+import copy
 import json
-from flask import Flask, render_template, request, send_from_directory, jsonify
+import logging
+import queue
+import shutil
+import tempfile
+import threading
+from functools import partial
+from flask import Flask, Response, g, render_template, request, send_file, jsonify, stream_with_context
 import os
+import uuid
 
-from waitress import serve
-
+from app import config
 from app.formatter import format_comparison_results
-from app.services.compare_logic import *
-from app.services.pdf import generate_pdf_report
+from app.services.admission import AdmissionRejected, admission_controller, estimate_workbook_bytes
+from app.services.local_files import LocalFile, PathNotAllowed, allowed_filename
+from app.services.logging_setup import bind_log_context, configure_logging, log_context, reset_log_context
+from app.services.metrics import REGISTRY, collect_timings, render_metrics, span, summarize_spans
+from app.services.path_compare import compare_local_files, open_allowed_pair
+from app.services.history_store import history_store, record_results
+from app.services.job_store import job_store
+from app.services.prewarm import prewarm, start_prewarm
+from app.services.profiling import profiling_requested, run_profiled
+from app.services.report_store import report_store
+from app.services.upload_store import UploadError, upload_store
+from app.services.verdict import quick_verdict, results_verdict
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+REPORT_FOLDER = config.REPORT_FOLDER
 
 app = Flask(__name__)
 
+def compare_excel_stats(file1, file2, **options):
+    # pandas, NumPy and openpyxl are only imported once the first comparison needs them
+    from app.services.compare_logic import compare_excel_stats as _compare_excel_stats
+    return _compare_excel_stats(file1, file2, **options)
+
+def generate_xlsx_report(comparison_data, output_path):
+    from app.services.xlsx_report import generate_xlsx_report as _generate_xlsx_report
+    return _generate_xlsx_report(comparison_data, output_path)
+
+def generate_pdf_report(comparison_data, output_path):
+    from app.services.pdf import generate_pdf_report as _generate_pdf_report
+    return _generate_pdf_report(comparison_data, output_path)
+
+@app.before_request
+def _bind_request_id():
+    # Every log record written while handling the request carries its id
+    g.request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    g.log_token = bind_log_context(request_id=g.request_id)
+
+@app.after_request
+def _add_request_id_header(response):
+    response.headers["X-Request-ID"] = g.get("request_id", "")
+    return response
+
+@app.teardown_request
+def _unbind_request_id(error=None):
+    token = g.pop("log_token", None)
+    if token is not None:
+        reset_log_context(token)
+
 @app.route("/", methods=["GET"])
 def index():
     return render_template("index.html", results=None)
 
-@app.route("/process", methods=["POST"])
-def process():
-    start_time = time.time()
-    uploaded_pairs = []
+def process_pair(actual_file, expected_file, include_timings=False, profile=False, compare=None):
+    """Compare one uploaded pair, write its JSON and PDF reports and build the response entry"""
+    compare = compare or compare_excel_stats
+    pair_start_time = time.time()
+    pair_name = f"{actual_file.filename} vs {expected_file.filename}"
+    job_id = job_store.create(pair_name)
+    try:
+        with log_context(job_id=job_id):
+            pair_data = _run_pair(job_id, actual_file, expected_file, include_timings, profile, compare)
+    except Exception as e:
+        job_store.finish(job_id, error=str(e))
+        raise
+    pair_data["job_id"] = job_id
+    job_store.finish(job_id, reports={
+        "json": pair_data["json_report_file"],
+        "pdf": pair_data["pdf_report_file"],
+        "xlsx": pair_data["xlsx_report_file"],
+    }, error=pair_data["results"].get("error"))
+
+    pair_time = time.time() - pair_start_time
+    if include_timings:
+        pair_data["timings"]["total_seconds"] = round(pair_time, 6)
+    REGISTRY.inc("excel_compare_pairs_total",
+                 labels={"outcome": "error" if "error" in pair_data["results"] else "ok"},
+                 help_text="File pairs compared")
+    REGISTRY.observe("excel_compare_pair_duration_seconds", pair_time,
+                     help_text="End-to-end processing time per file pair")
+    logger.info(f"Pair {pair_name} completed in {pair_time:.2f}s")
+    return pair_data
+
+def _run_pair(job_id, actual_file, expected_file, include_timings, profile, compare):
+    # Download name for the reports; they are stored under the job id and content hash
+    base_name = f"report_{actual_file.filename.split('.')[0]}_VS_{expected_file.filename.split('.')[0]}"
+
+    with collect_timings() as spans:
+        # Run comparison
+        profile_files = None
+        if profile:
+            profile_dir = report_store.staging_directory()
+            try:
+                comparison_results, profile_files = run_profiled(
+                    compare, actual_file, expected_file,
+                    output_dir=profile_dir, base_name=f"{base_name}_profile"
+                )
+                for key in ("profile_file", "allocations_file"):
+                    name = profile_files[key]
+                    profile_files[key] = report_store.put_file(f"{job_id}_profile", os.path.join(profile_dir, name), name)
+            finally:
+                shutil.rmtree(profile_dir, ignore_errors=True)
+        else:
+            comparison_results = compare(actual_file, expected_file)
+
+        with span("history_record"):
+            record_results(job_id, comparison_results)
+        
+        # Save JSON report only if needed
+        with span("json_write"):
+            json_report_filename = report_store.put_bytes(
+                job_id, json.dumps(comparison_results, indent=2).encode("utf-8"), f"{base_name}.json")
+        
+        # Generate PDF report asynchronously or in background if needed
+        pdf_report_filename = None
+        pdf_report_path = report_store.staging_path(".pdf")
+        
+        with span("pdf_render"):
+            pdf_success = generate_pdf_report(comparison_results, pdf_report_path)
+            if pdf_success:
+                pdf_report_filename = report_store.put_file(job_id, pdf_report_path, f"{base_name}.pdf")
+            else:
+                os.unlink(pdf_report_path)
+        
+        xlsx_report_filename = None
+        if config.XLSX_REPORTS:
+            xlsx_report_path = report_store.staging_path(".xlsx")
+            with span("xlsx_render"):
+                if generate_xlsx_report(comparison_results, xlsx_report_path):
+                    xlsx_report_filename = report_store.put_file(job_id, xlsx_report_path, f"{base_name}.xlsx")
+                else:
+                    os.unlink(xlsx_report_path)
+
+        with span("formatting"):
+            formatted_results = format_comparison_results(comparison_results)
+
+    pair_data = {
+        "report_file": pdf_report_filename if pdf_success else json_report_filename,
+        "json_report_file": json_report_filename,
+        "pdf_report_file": pdf_report_filename,
+        "xlsx_report_file": xlsx_report_filename,
+        "pair": f"{actual_file.filename} vs {expected_file.filename}",
+        "results": formatted_results,
+        "has_pdf": pdf_success
+    }
+
+    if profile_files:
+        profile_files["profile_url"] = f"/download/reports/{profile_files['profile_file']}"
+        profile_files["allocations_url"] = f"/download/reports/{profile_files['allocations_file']}"
+        pair_data["profile_files"] = profile_files
+
+    if include_timings:
+        pair_data["timings"] = {
+            "phases": summarize_spans(spans),
+            "spans": spans,
+        }
+    return pair_data
+
+def estimate_file_bytes(file):
+    """Estimated memory for one workbook of a pair, read from its zip directory"""
+    if hasattr(file, "open_stream"):
+        # Files on disk are mapped for the estimate only; the comparison maps them again
+        with file.open_stream() as stream:
+            return estimate_workbook_bytes(stream)["estimated_bytes"]
+    return estimate_workbook_bytes(file.stream)["estimated_bytes"]
+
+def estimate_pair_bytes(actual_file, expected_file):
+    """Estimated memory for comparing an uploaded pair, read from the zip directories"""
+    return estimate_file_bytes(actual_file) + estimate_file_bytes(expected_file)
+
+def admission_error_response(error, completed_pairs=None):
+    logger.warning(f"Admission rejected ({error.status_code}): {error.message}")
+    response = jsonify({
+        "error": error.message,
+        "queue_depth": admission_controller.snapshot()["queue_depth"],
+        "completed_pairs": completed_pairs or [],
+    })
+    response.status_code = error.status_code
+    if error.retry_after:
+        response.headers["Retry-After"] = str(error.retry_after)
+    return response
+
+def requested_tolerances(values=None):
+    """Optional JSON object of per-column tolerances: {"column": {"abs": ..., "rel": ...}}"""
+    values = request.values if values is None else values
+    try:
+        tolerances = json.loads(values.get("tolerances") or "{}")
+    except ValueError:
+        tolerances = None
+    if not isinstance(tolerances, dict):
+        raise ValueError("tolerances must be a JSON object")
+    return tolerances
+
+def requested_alignment(values=None):
+    """Optional ``alignment`` mode (off, report or apply); None keeps the configured default"""
+    from app.services.alignment import ALIGNMENT_MODES
+
+    values = request.values if values is None else values
+    alignment = values.get("alignment", "").strip().lower() or None
+    if alignment is not None and alignment not in ALIGNMENT_MODES:
+        raise ValueError(f"alignment must be one of {', '.join(ALIGNMENT_MODES)}")
+    return alignment
+
+def requested_sampling(values=None):
+    """Optional ``sample`` (rows per sheet), ``seed`` and ``escalate`` fields; absent ones keep the configured defaults"""
+    values = request.values if values is None else values
+    sampling = {}
+    for name in ("sample", "seed"):
+        value = values.get(name, "").strip()
+        if value:
+            try:
+                sampling[name] = int(value)
+            except ValueError:
+                raise ValueError(f"{name} must be an integer")
+            if sampling[name] < 0:
+                raise ValueError(f"{name} must not be negative")
+    escalate = values.get("escalate", "").strip().lower()
+    if escalate:
+        sampling["escalate"] = escalate in ("1", "true", "yes")
+    return sampling
+
+def requested_file(side, index):
+    """Upload ``<side>_<index>``, or the finished chunked upload named by ``<side>_upload_<index>``"""
+    upload_id = request.values.get(f"{side}_upload_{index}")
+    if upload_id:
+        return upload_store.open(upload_id)
+    return request.files.get(f"{side}_{index}")
+
+def requested_pairs():
+    """(actual, expected) uploads of every complete ``actual_<i>``/``expected_<i>`` pair, in index order"""
     indices = set()
-    
-    logger.info("Starting file processing request")
-    
-    for key in request.files.keys():
+    for key in list(request.files.keys()) + list(request.values.keys()):
         if key.startswith("actual_") or key.startswith("expected_"):
             try:
-                idx = int(key.split("_")[-1])
-                indices.add(idx)
+                indices.add(int(key.split("_")[-1]))
             except ValueError:
                 pass
-    indices = sorted(indices)
 
-    try:
-        for i in indices:
-            pair_start_time = time.time()
-            actual_file = request.files.get(f"actual_{i}")
-            expected_file = request.files.get(f"expected_{i}")
+    pairs = []
+    for i in sorted(indices):
+        actual_file = requested_file("actual", i)
+        expected_file = requested_file("expected", i)
+        if not actual_file or not expected_file:
+            logger.warning(f"Pair {i}: Incomplete file pair")
+            continue
+        if not allowed_filename(actual_file.filename) or not allowed_filename(expected_file.filename):
+            logger.warning(f"Pair {i}: Invalid file types")
+            continue
+        pairs.append((actual_file, expected_file))
+    return pairs
 
-            if not actual_file or not expected_file:
-                logger.warning(f"Pair {i}: Incomplete file pair")
-                continue
+def _detached_uploads(pairs):
+    """
+    Pairs whose form uploads are saved to temporary files.
 
-            if not allowed_filename(actual_file.filename) or not allowed_filename(expected_file.filename):
-                logger.warning(f"Pair {i}: Invalid file types")
+    Flask closes uploaded files as soon as the view returns, which is before
+    a streamed response is generated. Returns the pairs with ``LocalFile``
+    objects in place of the uploads, and the paths to remove afterwards.
+    """
+    detached, paths = [], []
+    for pair in pairs:
+        files = []
+        for upload in pair:
+            if isinstance(upload, LocalFile):
+                files.append(upload)
                 continue
+            fd, path = tempfile.mkstemp(prefix="stream-", suffix=os.path.splitext(upload.filename)[1])
+            os.close(fd)
+            paths.append(path)
+            upload.save(path)
+            files.append(LocalFile(path, upload.filename))
+        detached.append(tuple(files))
+    return detached, paths
 
-            logger.info(f"Processing pair {i}: {actual_file.filename} vs {expected_file.filename}")
+def requested_files(name):
+    """Uploads named ``name`` followed by the finished chunked uploads listed as ``<name>_upload``"""
+    return request.files.getlist(name) + [upload_store.open(upload_id)
+                                          for upload_id in request.values.getlist(f"{name}_upload")]
 
-            # Run comparison
-            comparison_results = compare_excel_stats(actual_file, expected_file)
-            
-            # Generate unique base name for reports
-            base_name = f"report_{actual_file.filename.split('.')[0]}_VS_{expected_file.filename.split('.')[0]}"
-            
-            # Save JSON report only if needed
-            json_report_filename = f"{base_name}.json"
-            json_report_path = os.path.join(REPORT_FOLDER, json_report_filename)
-            
-            with open(json_report_path, "w", encoding="utf-8") as rf:
-                json.dump(comparison_results, rf, indent=2)
-            
-            # Generate PDF report asynchronously or in background if needed
-            pdf_report_filename = f"{base_name}.pdf"
-            pdf_report_path = os.path.join(REPORT_FOLDER, pdf_report_filename)
-            
-            pdf_success = generate_pdf_report(comparison_results, pdf_report_path)
-            
-            pair_data = {
-                "report_file": pdf_report_filename if pdf_success else json_report_filename,
-                "json_report_file": json_report_filename,
-                "pdf_report_file": pdf_report_filename if pdf_success else None,
-                "pair": f"{actual_file.filename} vs {expected_file.filename}",
-                "results": format_comparison_results(comparison_results),
-                "has_pdf": pdf_success
-            }
+def upload_error_response(error):
+    body = {"error": error.message}
+    if error.offset is not None:
+        body["offset"] = error.offset
+    response = jsonify(body)
+    response.status_code = error.status_code
+    if error.offset is not None:
+        response.headers["Upload-Offset"] = str(error.offset)
+    return response
+
+def _upload_response(upload, status_code=200):
+    response = jsonify({
+        "upload_id": upload["id"],
+        "filename": upload["filename"],
+        "status": upload["status"],
+        "offset": upload["received"],
+        "size": upload["size"],
+        "sha256": upload["sha256"],
+        "chunk_size": config.UPLOAD_CHUNK_MB * 2**20,
+    })
+    response.status_code = status_code
+    response.headers["Upload-Offset"] = str(upload["received"])
+    if upload["size"] is not None:
+        response.headers["Upload-Length"] = str(upload["size"])
+    return response
+
+@app.route("/uploads", methods=["POST"])
+def create_upload():
+    """
+    Start a resumable upload: ``{"filename": ..., "size": bytes}`` (size optional).
+
+    Chunks are then sent with ``PUT /uploads/<id>`` and an ``Upload-Offset``
+    header (or ``offset`` query parameter) equal to the bytes received so
+    far; ``HEAD`` or ``GET /uploads/<id>`` tells a reconnecting client where
+    to resume, and ``POST /uploads/<id>/finalize`` closes the upload.
+    """
+    payload = request.get_json(silent=True) or request.values
+    try:
+        size = payload.get("size")
+        upload = upload_store.create(payload.get("filename", ""), int(size) if size not in (None, "") else None)
+    except UploadError as e:
+        return upload_error_response(e)
+    except ValueError:
+        return jsonify({"error": "size must be an integer"}), 400
+    return _upload_response(upload, 201)
+
+@app.route("/uploads/<upload_id>", methods=["GET"])
+def get_upload(upload_id):
+    upload = upload_store.get(upload_id)
+    if upload is None:
+        return jsonify({"error": "Upload not found"}), 404
+    return _upload_response(upload)
+
+@app.route("/uploads/<upload_id>", methods=["PUT", "PATCH"])
+def upload_chunk(upload_id):
+    try:
+        offset = int(request.headers.get("Upload-Offset", request.args.get("offset", "")))
+    except ValueError:
+        return jsonify({"error": "Upload-Offset header or offset parameter required"}), 400
+    try:
+        # request.stream reads the body as it arrives, without buffering it in memory
+        upload_store.write_chunk(upload_id, offset, request.stream)
+    except UploadError as e:
+        return upload_error_response(e)
+    return _upload_response(upload_store.get(upload_id))
+
+@app.route("/uploads/<upload_id>/finalize", methods=["POST"])
+def finalize_upload(upload_id):
+    payload = request.get_json(silent=True) or request.values
+    try:
+        upload = upload_store.finalize(upload_id, payload.get("sha256"))
+    except UploadError as e:
+        return upload_error_response(e)
+    return _upload_response(upload)
+
+@app.route("/uploads/<upload_id>", methods=["DELETE"])
+def delete_upload(upload_id):
+    try:
+        upload_store.delete(upload_id)
+    except UploadError as e:
+        return upload_error_response(e)
+    return jsonify({"deleted": upload_id})
+
+@app.route("/process", methods=["POST"])
+def process():
+    start_time = time.time()
+    uploaded_pairs = []
+    include_timings = request.values.get("timings", "").lower() in ("1", "true", "yes")
+    profile = profiling_requested(request.values.get("profile"))
+    try:
+        tolerances = requested_tolerances()
+        alignment = requested_alignment()
+        sampling = requested_sampling()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    compare = partial(compare_excel_stats, tolerances=tolerances or None, alignment=alignment, **sampling) \
+        if tolerances or alignment or sampling else None
+    # verdict=1: only decide match/different per pair, without reports
+    quick = request.values.get("verdict", "").lower() in ("1", "true", "yes")
+    
+    logger.info("Starting file processing request")
+
+    try:
+        pairs = requested_pairs()
+    except UploadError as e:
+        return jsonify({"error": e.message}), e.status_code
+
+    try:
+        for actual_file, expected_file in pairs:
+            logger.info(f"Processing pair: {actual_file.filename} vs {expected_file.filename}")
+
+            estimated_bytes = estimate_pair_bytes(actual_file, expected_file)
+            try:
+                with admission_controller.admit(estimated_bytes):
+                    if quick:
+                        pair_data = dict(quick_verdict(actual_file, expected_file, tolerances=tolerances or None),
+                                         pair=f"{actual_file.filename} vs {expected_file.filename}")
+                    else:
+                        pair_data = process_pair(actual_file, expected_file, include_timings, profile,
+                                                 compare=compare)
+            except AdmissionRejected as rejected:
+                _record_request("process", "rejected", time.time() - start_time)
+                return admission_error_response(rejected, uploaded_pairs)
             
             uploaded_pairs.append(pair_data)
-            logger.info(f"Pair {i} completed in {time.time() - pair_start_time:.2f}s")
 
         total_time = time.time() - start_time
         logger.info(f"All pairs processed in {total_time:.2f}s")
+        _record_request("process", "ok", total_time)
         return jsonify(uploaded_pairs)
         
     except Exception as e:
         logger.error(f"Process route error: {str(e)}")
+        _record_request("process", "error", time.time() - start_time)
+        return jsonify({"error": str(e)})
+
+@app.route("/process/stream", methods=["POST"])
+def process_stream():
+    """
+    Streaming variant of ``/process``: newline-delimited JSON events.
+
+    Emits ``pair_start`` when a pair begins, ``sheet`` as soon as each sheet
+    of it is compared, ``pair`` with the same entry ``/process`` would
+    return for it, and a final ``summary``. The pairs are compared on a
+    worker thread that hands events to the response through a queue, so
+    the first sheet reaches the client while the rest are still running.
+    """
+    start_time = time.time()
+    include_timings = request.values.get("timings", "").lower() in ("1", "true", "yes")
+    profile = profiling_requested(request.values.get("profile"))
+    try:
+        tolerances = requested_tolerances()
+        alignment = requested_alignment()
+        sampling = requested_sampling()
+        pairs, spooled = _detached_uploads(requested_pairs())
+    except UploadError as e:
+        return jsonify({"error": e.message}), e.status_code
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    quick = request.values.get("verdict", "").lower() in ("1", "true", "yes")
+    logger.info(f"Starting streamed processing of {len(pairs)} pairs")
+
+    events = queue.Queue()
+    cancelled = threading.Event()
+
+    def emit(event, **fields):
+        events.put(dict(fields, event=event))
+
+    def compare_pairs():
+        verdicts = []
+        outcome = "ok"
+        try:
+            for index, (actual_file, expected_file) in enumerate(pairs):
+                if cancelled.is_set():
+                    outcome = "cancelled"
+                    break
+                pair_name = f"{actual_file.filename} vs {expected_file.filename}"
+                emit("pair_start", pair=index, name=pair_name)
+
+                def on_sheet(sheet_data, position, total, index=index):
+                    # Formatting works in place, and the raw result still goes into the reports
+                    sheet = format_comparison_results({"sheets": [copy.deepcopy(sheet_data)]})["sheets"][0]
+                    emit("sheet", pair=index, position=position, total=total, sheet=sheet)
+
+                def compare(file1, file2):
+                    results = compare_excel_stats(file1, file2, tolerances=tolerances or None, alignment=alignment,
+                                                  on_sheet=on_sheet, **sampling)
+                    verdicts.append(results_verdict(results))
+                    return results
+
+                try:
+                    with admission_controller.admit(estimate_pair_bytes(actual_file, expected_file)):
+                        if quick:
+                            pair_data = dict(quick_verdict(actual_file, expected_file, tolerances=tolerances or None),
+                                             pair=pair_name)
+                            verdicts.append(pair_data["verdict"])
+                        else:
+                            pair_data = process_pair(actual_file, expected_file, include_timings, profile,
+                                                     compare=compare)
+                except AdmissionRejected as rejected:
+                    logger.warning(f"Admission rejected ({rejected.status_code}): {rejected.message}")
+                    emit("error", pair=index, error=rejected.message, status=rejected.status_code,
+                         retry_after=rejected.retry_after)
+                    outcome = "rejected"
+                    break
+                emit("pair", pair=index, data=pair_data)
+        except Exception as e:
+            logger.error(f"Process stream error: {str(e)}")
+            emit("error", error=str(e))
+            outcome = "error"
+        finally:
+            total_time = time.time() - start_time
+            emit("summary", pairs=len(pairs), completed=len(verdicts),
+                 verdicts={verdict: verdicts.count(verdict) for verdict in sorted(set(verdicts))},
+                 seconds=round(total_time, 3))
+            _record_request("process_stream", outcome, total_time)
+            events.put(None)
+            for path in spooled:
+                os.unlink(path)
+
+    worker = threading.Thread(target=contextvars.copy_context().run, args=(compare_pairs,),
+                              name="process-stream", daemon=True)
+
+    def generate():
+        worker.start()
+        try:
+            while (event := events.get()) is not None:
+                yield app.json.dumps(event) + "\n"
+        finally:
+            # A client that went away stops the run after the pair in progress
+            cancelled.set()
+
+    response = Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+    # Keep proxies from buffering the stream
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+@app.route("/process-paths", methods=["POST"])
+def process_paths():
+    """
+    Compare workbooks already on shared storage.
+
+    Expects JSON ``{"pairs": [{"actual": path, "expected": path}, ...]}`` with
+    paths under ``EXCEL_COMPARE_ALLOWED_ROOTS``, plus the ``tolerances``,
+    ``alignment`` and sampling options of ``/process``. Files are memory-mapped
+    instead of uploaded, and results are reused while mtime and size and the
+    comparison settings are unchanged.
+    """
+    start_time = time.time()
+    payload = request.get_json(silent=True) or {}
+    pairs = payload.get("pairs") or []
+    include_timings = bool(payload.get("timings")) or request.args.get("timings", "").lower() in ("1", "true", "yes")
+    profile = profiling_requested(payload.get("profile") or request.args.get("profile"))
+
+    if not pairs:
+        return jsonify({"error": "No pairs given. Expected {\"pairs\": [{\"actual\": ..., \"expected\": ...}]}"}), 400
+
+    # Options may come as JSON values or query parameters; the request helpers expect form-style strings
+    values = request.args.to_dict()
+    values.update({key: value if isinstance(value, str) else json.dumps(value) for key, value in payload.items()
+                   if key in ("tolerances", "alignment", "sample", "seed", "escalate")})
+    try:
+        options = dict(tolerances=requested_tolerances(values) or None, alignment=requested_alignment(values),
+                       **requested_sampling(values))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        opened = []
+        for pair in pairs:
+            actual_file, expected_file = open_allowed_pair(pair.get("actual", ""), pair.get("expected", ""))
+            if not allowed_filename(actual_file.filename) or not allowed_filename(expected_file.filename):
+                return jsonify({"error": f"Invalid file types: {actual_file.filename}, {expected_file.filename}"}), 400
+            opened.append((actual_file, expected_file))
+    except PathNotAllowed as e:
+        logger.warning(f"Rejected server-side path: {str(e)}")
+        return jsonify({"error": str(e)}), 403
+
+    results = []
+    try:
+        for actual_file, expected_file in opened:
+            logger.info(f"Processing paths: {actual_file.path} vs {expected_file.path}")
+            try:
+                with admission_controller.admit(estimate_pair_bytes(actual_file, expected_file)):
+                    results.append(process_pair(actual_file, expected_file, include_timings, profile,
+                                                compare=partial(compare_local_files, **options)))
+            except AdmissionRejected as rejected:
+                _record_request("process_paths", "rejected", time.time() - start_time)
+                return admission_error_response(rejected, results)
+    except Exception as e:
+        logger.error(f"Process paths route error: {str(e)}")
+        _record_request("process_paths", "error", time.time() - start_time)
         return jsonify({"error": str(e)})
+
+    _record_request("process_paths", "ok", time.time() - start_time)
+    return jsonify(results)
+
+@app.route("/process-matrix", methods=["POST"])
+def process_matrix():
+    """
+    Compare a set of workbooks in one request.
+
+    With ``pairing=cross`` (default) every ``actual`` upload is compared
+    against every ``expected`` upload; one file on either side gives
+    one-vs-many. With ``pairing=all-vs-all`` every pair of ``workbooks``
+    uploads is compared. Identical uploads are detected by content hash,
+    and each distinct workbook is parsed once for all of its pairs.
+    """
+    start_time = time.time()
+    mode = request.values.get("pairing", "cross")
+    include_timings = request.values.get("timings", "").lower() in ("1", "true", "yes")
+    try:
+        if mode == "cross":
+            actual_uploads, expected_uploads = requested_files("actual"), requested_files("expected")
+        else:
+            actual_uploads, expected_uploads = requested_files("workbooks"), []
+        tolerances = requested_tolerances()
+        alignment = requested_alignment()
+        sampling = requested_sampling()
+    except UploadError as e:
+        return upload_error_response(e)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    invalid = [f.filename for f in actual_uploads + expected_uploads if not allowed_filename(f.filename)]
+    if invalid:
+        return jsonify({"error": f"Invalid file types: {', '.join(invalid)}"}), 400
+
+    from app.services.matrix import PAIRING_MODES, load_shared_workbooks, plan_pairs, recording_compare
+
+    if mode not in PAIRING_MODES:
+        return jsonify({"error": f"pairing must be one of {', '.join(PAIRING_MODES)}"}), 400
+    pairs = plan_pairs(mode, actual_uploads, expected_uploads)
+    if not pairs:
+        return jsonify({"error": "Nothing to compare: upload at least one workbook per side (or two for all-vs-all)"}), 400
+
+    logger.info(f"Matrix request: {len(actual_uploads)} x {len(expected_uploads) or len(actual_uploads)} "
+                f"workbooks, {len(pairs)} pairs ({mode})")
+    try:
+        registry = {}
+        actual = load_shared_workbooks(actual_uploads, registry)
+        expected = load_shared_workbooks(expected_uploads, registry) if mode == "cross" else actual
+        row_names = [f.filename for f in actual_uploads]
+        column_names = [f.filename for f in expected_uploads] if mode == "cross" else row_names
+        grid = [[None] * len(column_names) for _ in row_names]
+
+        cells, reports = {}, []
+        compare = recording_compare(cells, tolerances=tolerances or None, alignment=alignment, **sampling)
+        estimated_bytes = sum(estimate_workbook_bytes(wb.stream)["estimated_bytes"] for wb in registry.values())
+        with admission_controller.admit(estimated_bytes):
+            for i, j in pairs:
+                pair_data = process_pair(actual[i], expected[j], include_timings, compare=compare)
+                cell = dict(cells[(id(actual[i]), id(expected[j]))], job_id=pair_data["job_id"],
+                            report_index=len(reports), report_file=pair_data["report_file"])
+                grid[i][j] = cell
+                if mode == "all-vs-all":
+                    grid[j][i] = cell
+                reports.append(pair_data)
+    except AdmissionRejected as rejected:
+        _record_request("process_matrix", "rejected", time.time() - start_time)
+        return admission_error_response(rejected)
+    except Exception as e:
+        logger.error(f"Process matrix route error: {str(e)}")
+        _record_request("process_matrix", "error", time.time() - start_time)
+        return jsonify({"error": str(e)})
+
+    _record_request("process_matrix", "ok", time.time() - start_time)
+    return jsonify({
+        "pairing": mode,
+        "workbooks": [wb.summary() for wb in registry.values()],
+        "grid": {"rows": row_names, "columns": column_names, "cells": grid},
+        "pairs": reports,
+    })
+
+def _record_request(endpoint, outcome, seconds):
+    REGISTRY.inc("excel_compare_requests_total", labels={"endpoint": endpoint, "outcome": outcome},
+                 help_text="Comparison requests handled")
+    REGISTRY.observe("excel_compare_request_duration_seconds", seconds, labels={"endpoint": endpoint},
+                     help_text="Comparison request latency")
+
+@app.route("/jobs", methods=["GET"])
+def list_jobs():
+    return jsonify(job_store.recent(limit=request.args.get("limit", 50, type=int)))
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job)
+
+@app.route("/history/runs", methods=["GET"])
+def history_runs():
+    return jsonify(history_store.runs(request.args.get("file1"), request.args.get("file2"),
+                                      limit=request.args.get("limit", 50, type=int)))
+
+@app.route("/history/trend", methods=["GET"])
+def history_trend():
+    """Statistics and status of one column over recent runs: ``?sheet=&column=[&statistic=&file1=&file2=&limit=]``"""
+    sheet, column = request.args.get("sheet"), request.args.get("column")
+    if not sheet or not column:
+        return jsonify({"error": "sheet and column are required"}), 400
+    return jsonify(history_store.trend(sheet, column, request.args.get("file1"), request.args.get("file2"),
+                                       statistic=request.args.get("statistic"),
+                                       limit=request.args.get("limit", 30, type=int)))
+
+@app.route("/history/drift", methods=["GET"])
+def history_drift():
+    """Columns of a sheet that differed or changed status over recent runs: ``?sheet=[&runs=&file1=&file2=]``"""
+    sheet = request.args.get("sheet")
+    if not sheet:
+        return jsonify({"error": "sheet is required"}), 400
+    return jsonify(history_store.drift(sheet, request.args.get("file1"), request.args.get("file2"),
+                                       runs=request.args.get("runs", 30, type=int)))
+
+@app.route("/admission", methods=["GET"])
+def admission_status():
+    return jsonify(admission_controller.snapshot())
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4; charset=utf-8")
     
 @app.route("/download/<folder>/<filename>")
 def download_file(folder, filename):
     if folder not in ("uploads", "reports"):
         return "Not allowed", 403
-    directory = REPORT_FOLDER
+    # Reports are looked up by id in the index; raw paths under REPORT_FOLDER are never served
+    stored = report_store.resolve(filename)
+    if stored is None:
+        return "Report not found or expired", 404
+    path, download_name = stored
     
     # Determine content type based on file extension
     if filename.lower().endswith('.pdf'):
         mimetype = 'application/pdf'
     elif filename.lower().endswith('.json'):
         mimetype = 'application/json'
+    elif filename.lower().endswith('.xlsx'):
+        mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    elif filename.lower().endswith('.prof'):
+        mimetype = 'application/octet-stream'
     else:
         mimetype = 'text/plain'
     
-    return send_from_directory(directory, filename, as_attachment=True, mimetype=mimetype)
+    return send_file(path, as_attachment=True, download_name=download_name, mimetype=mimetype)
 
 def run_browser(message):
+    from app.services.serving import serve_production
+
     print(message)
     # app.run(debug=True, use_reloader=True)  # Run with debug mode
-    serve(app, host='127.0.0.1', port=5000) # Run with production mode 
+    # Run with production mode; workers are forked after pre-warming so they share the imported stack
+    serve_production(app, prewarm=prewarm if config.PREWARM else None)
+
+STARTUP_SECONDS = time.perf_counter() - _import_start
+REGISTRY.set_gauge("excel_compare_startup_seconds", round(STARTUP_SECONDS, 6),
+                   help_text="Time from importing app.py to the Flask app being ready")
 
 
 if __name__ == "__main__":
 
-    PRODUCTION = False
-    message = "Welcome to the tool. Please access the tool using the link: http://127.0.0.1:5000/"
+    logger.info(f"App ready in {STARTUP_SECONDS:.3f}s")
+
+    PRODUCTION = config.PRODUCTION
+    message = f"Welcome to the tool. Please access the tool using the link: http://{config.HOST}:{config.PORT}/"
+
+    # The debug reloader re-executes this file in a child process; only warm the one that serves
+    if config.PREWARM and not PRODUCTION and os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_prewarm()
 
     if PRODUCTION:
         run_browser(message)
     else:
-        app.run(debug=True)
+        app.run(host=config.HOST, port=config.PORT, debug=True)
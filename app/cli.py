@@ -0,0 +1,272 @@
+"""
+Headless batch comparison of workbook pairs.
+
+Usage:
+    python -m app.cli ACTUAL_DIR EXPECTED_DIR [options]
+    python -m app.cli --manifest pairs.csv [options]
+
+Exit status is 0 when every pair matches, 1 when any pair has differences
+and 2 when any pair could not be compared.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from app import config
+
+EXIT_MATCH = 0
+EXIT_DIFFERENT = 1
+EXIT_ERROR = 2
+
+WORKBOOK_EXTENSIONS = (".xls", ".xlsx")
+
+
+def pairs_from_directories(actual_dir, expected_dir):
+    """Pair workbooks with the same file name in both directories"""
+    def workbooks(directory):
+        return {
+            name: os.path.join(directory, name)
+            for name in os.listdir(directory)
+            if name.lower().endswith(WORKBOOK_EXTENSIONS) and not name.startswith("~$")
+        }
+
+    actual = workbooks(actual_dir)
+    expected = workbooks(expected_dir)
+    pairs = [(actual[name], expected[name]) for name in sorted(actual.keys() & expected.keys())]
+    unmatched = sorted(actual.keys() ^ expected.keys())
+    return pairs, unmatched
+
+
+def pairs_from_manifest(manifest_path):
+    """
+    Read pairs from a CSV file with ``actual`` and ``expected`` columns, or a
+    JSON list of ``{"actual": ..., "expected": ...}`` objects. Relative paths
+    are resolved against the manifest's directory.
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, "r", encoding="utf-8", newline="") as f:
+        if manifest_path.lower().endswith(".json"):
+            entries = json.load(f)
+        else:
+            entries = list(csv.DictReader(f))
+
+    pairs = []
+    for entry in entries:
+        actual = os.path.join(base_dir, entry["actual"].strip())
+        expected = os.path.join(base_dir, entry["expected"].strip())
+        pairs.append((actual, expected))
+    return pairs, []
+
+
+def _init_worker(log_level):
+    # Importing first lets the module's logging setup run before the level is lowered
+    import app.services.compare_logic  # noqa: F401
+    logging.getLogger().setLevel(log_level)
+
+
+def report_base_names(pairs):
+    """
+    ``report_<actual>_VS_<expected>`` for every pair. Pairs whose file names
+    collide (same names in different directories) get their 1-based position
+    in ``pairs`` appended, so concurrent workers never write the same report.
+    """
+    names = []
+    for actual_path, expected_path in pairs:
+        actual_stem = os.path.splitext(os.path.basename(actual_path))[0]
+        expected_stem = os.path.splitext(os.path.basename(expected_path))[0]
+        names.append(f"report_{actual_stem}_VS_{expected_stem}")
+    counts = {name: names.count(name) for name in names}
+    return [f"{name}_{index}" if counts[name] > 1 else name for index, name in enumerate(names, 1)]
+
+
+def compare_pair(actual_path, expected_path, output_dir, write_pdf=True, write_formatted=True, tolerances=None,
+                 alignment=None, quick=False, write_xlsx=True, sample=None, seed=None, base_name=None):
+    """Compare one pair on disk and write its reports; runs inside a pool worker"""
+    from app.services.compare_logic import compare_excel_stats
+    from app.services.history_store import record_results
+    from app.services.local_files import LocalFile
+    from app.services.logging_setup import log_context
+
+    base_name = base_name or report_base_names([(actual_path, expected_path)])[0]
+    if quick:
+        return quick_pair_verdict(actual_path, expected_path, output_dir, base_name, tolerances)
+    with log_context(job_id=base_name):
+        results = compare_excel_stats(LocalFile(actual_path), LocalFile(expected_path), tolerances=tolerances,
+                                      alignment=alignment, sample=sample, seed=seed)
+    reports = {"json": os.path.join(output_dir, f"{base_name}.json")}
+    with open(reports["json"], "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    record_results(os.path.abspath(reports["json"]), results)
+
+    if write_pdf and "error" not in results:
+        from app.services.pdf import generate_pdf_report
+        pdf_path = os.path.join(output_dir, f"{base_name}.pdf")
+        if generate_pdf_report(results, pdf_path):
+            reports["pdf"] = pdf_path
+
+    if write_xlsx and "error" not in results:
+        from app.services.xlsx_report import generate_xlsx_report
+        xlsx_path = os.path.join(output_dir, f"{base_name}.xlsx")
+        if generate_xlsx_report(results, xlsx_path):
+            reports["xlsx"] = xlsx_path
+
+    # Formatting rewrites statistics in place, so it has to come after the PDF and Excel reports
+    if write_formatted:
+        from app.formatter import format_comparison_results
+        reports["formatted"] = os.path.join(output_dir, f"{base_name}.formatted.json")
+        with open(reports["formatted"], "w", encoding="utf-8") as f:
+            json.dump(format_comparison_results(results), f, indent=2)
+
+    return pair_verdict(actual_path, expected_path, results, reports)
+
+
+def quick_pair_verdict(actual_path, expected_path, output_dir, base_name, tolerances=None):
+    """``--verdict`` mode: stop at the first difference and write only a small JSON result"""
+    from app.services.local_files import LocalFile
+    from app.services.logging_setup import log_context
+    from app.services.verdict import quick_verdict
+
+    with log_context(job_id=base_name):
+        result = quick_verdict(LocalFile(actual_path), LocalFile(expected_path), tolerances=tolerances)
+    reports = {"json": os.path.join(output_dir, f"{base_name}.verdict.json")}
+    with open(reports["json"], "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    return {
+        "actual": actual_path,
+        "expected": expected_path,
+        "verdict": result["verdict"],
+        "error": result["detail"] if result["verdict"] == "error" else None,
+        "decided_by": result["decided_by"],
+        "detail": result["detail"],
+        "summary": {},
+        "reports": reports,
+    }
+
+
+def pair_verdict(actual_path, expected_path, results, reports=None):
+    """Reduce full comparison results to the fields the batch summary needs"""
+    from app.services.verdict import results_verdict
+
+    summary = results.get("summary", {})
+    return {
+        "actual": actual_path,
+        "expected": expected_path,
+        "verdict": results_verdict(results),
+        "estimated": bool(results.get("estimated")),
+        "error": results.get("error"),
+        "summary": summary,
+        "reports": reports or {},
+    }
+
+
+def run_batch(pairs, output_dir, workers=None, write_pdf=True, write_formatted=True, log_level=logging.WARNING,
+              tolerances=None, alignment=None, quick=False, write_xlsx=True, sample=None, seed=None):
+    """Compare ``pairs`` across a process pool, preserving input order in the result"""
+    os.makedirs(output_dir, exist_ok=True)
+    if not pairs:
+        return []
+    workers = max(1, min(workers or os.cpu_count() or 1, len(pairs)))
+    from app.services.logging_setup import serve_child_logs
+
+    # Workers forward their records to this process, which alone writes the log file
+    serve_child_logs()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(log_level,)) as pool:
+        futures = [
+            pool.submit(compare_pair, actual, expected, output_dir, write_pdf, write_formatted, tolerances,
+                        alignment, quick, write_xlsx, sample, seed, base_name)
+            for (actual, expected), base_name in zip(pairs, report_base_names(pairs))
+        ]
+        outcomes = []
+        for (actual, expected), future in zip(pairs, futures):
+            try:
+                outcomes.append(future.result())
+            except Exception as e:
+                outcomes.append(pair_verdict(actual, expected, {"error": f"Worker failed: {str(e)}"}))
+    return outcomes
+
+
+def exit_status(outcomes, unmatched=()):
+    verdicts = {outcome["verdict"] for outcome in outcomes}
+    if "error" in verdicts or unmatched:
+        return EXIT_ERROR
+    if "different" in verdicts:
+        return EXIT_DIFFERENT
+    return EXIT_MATCH
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m app.cli",
+                                     description="Compare directories or a manifest of Excel workbook pairs")
+    parser.add_argument("actual_dir", nargs="?", help="Directory of actual workbooks")
+    parser.add_argument("expected_dir", nargs="?", help="Directory of expected workbooks (paired by file name)")
+    parser.add_argument("--manifest", help="CSV (actual,expected columns) or JSON list of pairs")
+    parser.add_argument("--output-dir", default="reports", help="Where JSON/PDF reports and summary.json go")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--skip-pdf", action="store_true", help="Do not render PDF reports")
+    parser.add_argument("--xlsx", action="store_true",
+                        help="Also write Excel reports (default: EXCEL_COMPARE_XLSX_REPORTS)")
+    parser.add_argument("--skip-xlsx", action="store_true", help="Do not write Excel reports")
+    parser.add_argument("--skip-format", action="store_true", help="Do not write display-formatted reports")
+    parser.add_argument("--tolerances", help="JSON file of per-column tolerances: {\"column\": {\"abs\": ..., \"rel\": ...}}")
+    parser.add_argument("--align", choices=("off", "report", "apply"), default=None,
+                        help="Pair renamed sheets and columns by content: list the mapping or also apply it")
+    parser.add_argument("--verdict", action="store_true",
+                        help="Only decide match/different, stopping at the first difference (no PDF or formatting)")
+    parser.add_argument("--sample", type=int, default=None, metavar="ROWS",
+                        help="Compare a seeded sample of ROWS rows per sheet; verdicts are marked as estimated")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the --sample row selection")
+    parser.add_argument("--verbose", action="store_true", help="Show per-sheet progress logging")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.manifest:
+        pairs, unmatched = pairs_from_manifest(args.manifest)
+    elif args.actual_dir and args.expected_dir:
+        pairs, unmatched = pairs_from_directories(args.actual_dir, args.expected_dir)
+    else:
+        parser.error("give ACTUAL_DIR and EXPECTED_DIR, or --manifest")
+
+    for name in unmatched:
+        print(f"UNMATCHED  {name}", file=sys.stderr)
+
+    tolerances = None
+    if args.tolerances:
+        with open(args.tolerances, "r", encoding="utf-8") as f:
+            tolerances = json.load(f)
+
+    write_xlsx = (args.xlsx or config.XLSX_REPORTS) and not args.skip_xlsx
+    log_level = logging.INFO if args.verbose else logging.WARNING
+    logging.getLogger().setLevel(log_level)
+    outcomes = run_batch(pairs, args.output_dir, workers=args.workers, write_pdf=not args.skip_pdf,
+                         write_formatted=not args.skip_format, log_level=log_level, tolerances=tolerances,
+                         alignment=args.align, quick=args.verdict,
+                         write_xlsx=write_xlsx, sample=args.sample, seed=args.seed)
+
+    for outcome in outcomes:
+        summary = outcome["summary"]
+        if "decided_by" in outcome:
+            detail = f"{outcome['decided_by']}: {outcome['detail']}"
+        else:
+            detail = outcome["error"] or (f"{summary.get('different_columns', 0)} different / "
+                                          f"{summary.get('total_columns_compared', 0)} columns")
+            if outcome.get("estimated"):
+                detail += " (estimated from a sample)"
+        print(f"{outcome['verdict'].upper():<10} {os.path.basename(outcome['actual'])} vs "
+              f"{os.path.basename(outcome['expected'])}: {detail}")
+
+    status = exit_status(outcomes, unmatched)
+    with open(os.path.join(args.output_dir, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump({"exit_status": status, "unmatched": unmatched, "pairs": outcomes}, f, indent=2)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+import os
+
+
+def _env_str(name, default):
+    return os.environ.get(name, default).strip()
+
+
+def _env_bool(name, default=False):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+LOGS_DIR = os.path.join(BASE_DIR, "logs")
+REPORT_FOLDER = os.path.join(BASE_DIR, "reports")
+CACHE_DIR = os.environ.get("EXCEL_COMPARE_CACHE_DIR", os.path.join(BASE_DIR, "cache"))
+
+# Profiling capture for /process: "off", "on-request" (honour profile=1) or "always"
+PROFILING_MODE = _env_str("EXCEL_COMPARE_PROFILING", "off").lower()
+PROFILING_TOP_ALLOCATIONS = _env_int("EXCEL_COMPARE_PROFILING_TOP", 25)
+
+# Admission control in front of compare_excel_stats
+ADMISSION_MEMORY_BUDGET_MB = _env_int("EXCEL_COMPARE_MEMORY_BUDGET_MB", 2048)
+ADMISSION_MAX_QUEUE = _env_int("EXCEL_COMPARE_MAX_QUEUE", 8)
+ADMISSION_QUEUE_TIMEOUT = _env_float("EXCEL_COMPARE_QUEUE_TIMEOUT", 60.0)
+# Rough DataFrame + parser cost per cell; object columns dominate real workbooks
+ADMISSION_BYTES_PER_CELL = _env_int("EXCEL_COMPARE_BYTES_PER_CELL", 120)
+
+# Reuse per-sheet results when a workbook's sheet parts are unchanged since the last run of the same pair
+INCREMENTAL_COMPARISON = _env_bool("EXCEL_COMPARE_INCREMENTAL", False)
+
+# Threads used to compare the columns of one sheet; 1 keeps the serial path
+COLUMN_WORKERS = _env_int("EXCEL_COMPARE_COLUMN_WORKERS", 1)
+# Columns handed to a worker at a time, and the minimum width before threads are used
+COLUMN_BATCH_SIZE = _env_int("EXCEL_COMPARE_COLUMN_BATCH_SIZE", 16)
+# "thread", or "process" to compare batches in worker processes fed through shared memory
+COLUMN_EXECUTOR = _env_str("EXCEL_COMPARE_COLUMN_EXECUTOR", "thread").lower()
+
+# Directories /process-paths may read from (os.pathsep separated); empty disables the endpoint
+ALLOWED_ROOTS = [
+    os.path.realpath(root) for root in os.environ.get("EXCEL_COMPARE_ALLOWED_ROOTS", "").split(os.pathsep)
+    if root.strip()
+]
+# Cached /process-paths results are pruned by age, then oldest first down to the size cap
+PATH_CACHE_MAX_AGE_HOURS = _env_float("EXCEL_COMPARE_PATH_CACHE_MAX_AGE_HOURS", 72)
+PATH_CACHE_MAX_MB = _env_int("EXCEL_COMPARE_PATH_CACHE_MAX_MB", 512)
+
+# Import pandas, openpyxl and fpdf in the background at startup so the first /process is not slower
+PREWARM = _env_bool("EXCEL_COMPARE_PREWARM", True)
+
+# Serving: run `py app.py` with EXCEL_COMPARE_PRODUCTION=1 to serve through waitress
+PRODUCTION = _env_bool("EXCEL_COMPARE_PRODUCTION", False)
+HOST = _env_str("EXCEL_COMPARE_HOST", "127.0.0.1")
+PORT = _env_int("EXCEL_COMPARE_PORT", 5000)
+WAITRESS_THREADS = _env_int("EXCEL_COMPARE_THREADS", 4)
+# Worker processes sharing the listening socket (POSIX only; Windows always runs one)
+WORKERS = _env_int("EXCEL_COMPARE_WORKERS", 1)
+# Address-space cap per worker process in MB; 0 disables it
+WORKER_MEMORY_MB = _env_int("EXCEL_COMPARE_WORKER_MEMORY_MB", 0)
+JOB_DB_PATH = os.environ.get("EXCEL_COMPARE_JOB_DB", os.path.join(CACHE_DIR, "jobs.sqlite3"))
+# Per-worker metrics snapshots merged by /metrics when there are several workers
+METRICS_DB_PATH = os.environ.get("EXCEL_COMPARE_METRICS_DB", os.path.join(CACHE_DIR, "metrics.sqlite3"))
+
+# Logging: JSON lines in logs/comparison.log, rotated by size (0 disables rotation)
+LOG_LEVEL = _env_str("EXCEL_COMPARE_LOG_LEVEL", "INFO").upper()
+LOG_MAX_BYTES = _env_int("EXCEL_COMPARE_LOG_MAX_BYTES", 10 * 2**20)
+LOG_BACKUP_COUNT = _env_int("EXCEL_COMPARE_LOG_BACKUPS", 5)
+# Fraction of per-column debug records that are kept
+LOG_DEBUG_SAMPLE_RATE = _env_float("EXCEL_COMPARE_LOG_DEBUG_SAMPLE_RATE", 0.05)
+
+# Report storage: content-addressed blobs under REPORT_FOLDER, indexed in SQLite and pruned by a janitor thread
+REPORT_INDEX_PATH = os.environ.get("EXCEL_COMPARE_REPORT_INDEX", os.path.join(REPORT_FOLDER, "index.sqlite3"))
+REPORT_MAX_AGE_HOURS = _env_float("EXCEL_COMPARE_REPORT_MAX_AGE_HOURS", 72)
+REPORT_MAX_TOTAL_MB = _env_int("EXCEL_COMPARE_REPORT_MAX_TOTAL_MB", 1024)
+REPORT_JANITOR_INTERVAL = _env_float("EXCEL_COMPARE_REPORT_JANITOR_INTERVAL", 300)
+
+# Numeric statistics differ when further apart than max(abs, rel * magnitude)
+NUMERIC_ABS_TOLERANCE = _env_float("EXCEL_COMPARE_ABS_TOLERANCE", 1e-6)
+NUMERIC_REL_TOLERANCE = _env_float("EXCEL_COMPARE_REL_TOLERANCE", 1e-6)
+# Min and max use the absolute tolerance only; p1/p50/p99 estimated from a sample get this relative one
+NUMERIC_QUANTILE_REL_TOLERANCE = _env_float("EXCEL_COMPARE_QUANTILE_REL_TOLERANCE", 1e-3)
+# JSON file of per-column overrides: {"column": {"abs": ..., "rel": ...}}
+TOLERANCES_FILE = _env_str("EXCEL_COMPARE_TOLERANCES_FILE", "")
+
+# Datetime values are rounded to this pandas frequency before comparison; empty keeps full precision
+DATETIME_PRECISION = _env_str("EXCEL_COMPARE_DATETIME_PRECISION", "ms")
+
+# Near-match pairing of text values present on one side only ("HR" vs "Human Resources")
+NEAR_MATCH = _env_bool("EXCEL_COMPARE_NEAR_MATCH", False)
+NEAR_MATCH_MAX_VALUES = _env_int("EXCEL_COMPARE_NEAR_MATCH_MAX_VALUES", 20000)
+NEAR_MATCH_CANDIDATE_BUDGET = _env_int("EXCEL_COMPARE_NEAR_MATCH_BUDGET", 64)
+NEAR_MATCH_MIN_SCORE = _env_float("EXCEL_COMPARE_NEAR_MATCH_MIN_SCORE", 0.6)
+
+# Content-based alignment of sheets and columns whose names differ: "off", "report" or "apply"
+ALIGNMENT = _env_str("EXCEL_COMPARE_ALIGNMENT", "off").lower()
+ALIGNMENT_MIN_SIMILARITY = _env_float("EXCEL_COMPARE_ALIGNMENT_MIN_SIMILARITY", 0.5)
+
+# Resumable chunked uploads (/uploads); finished uploads can be compared by id
+UPLOAD_FOLDER = os.environ.get("EXCEL_COMPARE_UPLOAD_DIR", os.path.join(CACHE_DIR, "uploads"))
+UPLOAD_INDEX_PATH = os.path.join(UPLOAD_FOLDER, "index.sqlite3")
+UPLOAD_MAX_MB = _env_int("EXCEL_COMPARE_UPLOAD_MAX_MB", 2048)
+UPLOAD_CHUNK_MB = _env_int("EXCEL_COMPARE_UPLOAD_CHUNK_MB", 8)
+UPLOAD_MAX_AGE_HOURS = _env_int("EXCEL_COMPARE_UPLOAD_MAX_AGE_HOURS", 24)
+
+# Every comparison result is also normalized into this SQLite database for trend and drift queries
+HISTORY = _env_bool("EXCEL_COMPARE_HISTORY", False)
+HISTORY_DB_PATH = os.environ.get("EXCEL_COMPARE_HISTORY_DB", os.path.join(CACHE_DIR, "history.sqlite3"))
+
+# Also write each comparison as a streamed, diff-highlighted xlsx report
+XLSX_REPORTS = _env_bool("EXCEL_COMPARE_XLSX_REPORTS", False)
+
+# Approximate comparison on a seeded sample of rows per sheet; 0 compares every row
+SAMPLE_ROWS = _env_int("EXCEL_COMPARE_SAMPLE_ROWS", 0)
+SAMPLE_SEED = _env_int("EXCEL_COMPARE_SAMPLE_SEED", 0)
+SAMPLE_CONFIDENCE = _env_float("EXCEL_COMPARE_SAMPLE_CONFIDENCE", 0.95)
+# Compare a sheet in full when a sampled difference is within the confidence intervals
+SAMPLE_ESCALATE = _env_bool("EXCEL_COMPARE_SAMPLE_ESCALATE", True)
@@ -1,4 +1,5 @@
-import numpy as np
+import math
+
 def format_number(value, precision=2, multiply_factor=1, percentage_sign=False, add_commas=True):
     """
     Format numerical values for better viewing with comma separation and smart precision.
@@ -18,8 +19,8 @@ def format_number(value, precision=2, multiply_factor=1, percentage_sign=False,
         return str(value) if value is not None else "N/A"
     
     # Handle NaN and infinite values
-    if isinstance(value, (int, float)) and (np.isnan(value) or np.isinf(value)):
-        if np.isnan(value):
+    if isinstance(value, (int, float)) and (math.isnan(value) or math.isinf(value)):
+        if math.isnan(value):
             return "NaN"
         elif value > 0:
             return "∞"
@@ -139,6 +140,8 @@ def format_statistics_display(statistics_dict, precision=2):
                 stat_precision = max(2, precision)
             elif stat_name in ['min', 'max']:
                 stat_precision = precision
+            elif stat_name in ['count', 'null_count']:
+                stat_precision = 0
             
             formatted_stats[stat_name] = {
                 'file1': format_number(files_dict['file1'], stat_precision),
@@ -0,0 +1,195 @@
+import logging
+import re
+import threading
+import time
+import zipfile
+from collections import deque
+from contextlib import contextmanager
+
+from app import config
+from app.services.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+_DIMENSION_RE = re.compile(rb'<dimension[^>]*\sref="([A-Z]+)(\d+)(?::([A-Z]+)(\d+))?"')
+# Legacy .xls files are not zip archives; assume they inflate this much when parsed
+XLS_EXPANSION_FACTOR = 10
+
+
+class AdmissionRejected(Exception):
+    """Raised when a comparison cannot be admitted; carries the HTTP status to return"""
+
+    def __init__(self, message, status_code, retry_after=None):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def _column_number(letters):
+    number = 0
+    for char in letters:
+        number = number * 26 + (ord(char) - 64)
+    return number
+
+
+def _sheet_cells(archive, info):
+    """Read the ``<dimension>`` element at the top of a worksheet part"""
+    with archive.open(info) as part:
+        head = part.read(4096)
+    match = _DIMENSION_RE.search(head)
+    if not match:
+        return None
+    first_col, first_row, last_col, last_row = match.groups()
+    if not last_col:
+        return 1
+    rows = int(last_row) - int(first_row) + 1
+    cols = _column_number(last_col.decode()) - _column_number(first_col.decode()) + 1
+    return max(rows, 0) * max(cols, 0)
+
+
+def estimate_workbook_bytes(stream):
+    """
+    Estimate the memory needed to parse and compare a workbook.
+
+    Uses the zip central directory (uncompressed part sizes) and each
+    worksheet's ``<dimension>`` element, so nothing is decompressed beyond
+    the first few KB of every sheet. The stream position is restored.
+
+    Returns:
+        Dictionary with the raw, uncompressed and cell counts plus the estimate
+    """
+    position = stream.tell()
+    try:
+        stream.seek(0, 2)
+        raw_bytes = stream.tell()
+        stream.seek(0)
+        try:
+            archive = zipfile.ZipFile(stream)
+        except zipfile.BadZipFile:
+            return {"raw_bytes": raw_bytes, "uncompressed_bytes": None, "cells": None,
+                    "estimated_bytes": raw_bytes * XLS_EXPANSION_FACTOR}
+
+        with archive:
+            uncompressed = 0
+            largest_part = 0
+            cells = 0
+            for info in archive.infolist():
+                uncompressed += info.file_size
+                if info.filename.startswith("xl/worksheets/") and info.filename.endswith(".xml"):
+                    largest_part = max(largest_part, info.file_size)
+                    sheet_cells = _sheet_cells(archive, info)
+                    # Without a dimension tag fall back to ~40 bytes of XML per cell
+                    cells += sheet_cells if sheet_cells is not None else info.file_size // 40
+    finally:
+        stream.seek(position)
+
+    # In-memory copy of the upload + DataFrames for every cell + transient XML of the sheet being parsed
+    estimate = raw_bytes + cells * config.ADMISSION_BYTES_PER_CELL + largest_part
+    return {"raw_bytes": raw_bytes, "uncompressed_bytes": uncompressed, "cells": cells,
+            "estimated_bytes": estimate}
+
+
+class AdmissionController:
+    """
+    Track the estimated memory of in-flight comparisons against a budget.
+
+    Work that does not fit waits in a FIFO queue; when the queue is full the
+    request is rejected with 429, and when it waits longer than the timeout
+    it is rejected with 503. A single job larger than the whole budget is
+    still admitted once nothing else is running, so it cannot starve.
+
+    The state lives in one process; with several production workers each
+    gets an equal share of the budget (see ``share_between``).
+    """
+
+    def __init__(self, budget_bytes, max_queue, queue_timeout):
+        self.budget_bytes = budget_bytes
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._in_flight_bytes = 0
+        self._active = 0
+
+    def _fits(self, estimate):
+        return self._active == 0 or self._in_flight_bytes + estimate <= self.budget_bytes
+
+    def _publish(self):
+        REGISTRY.set_gauge("excel_compare_admission_queue_depth", len(self._queue),
+                           help_text="Comparisons waiting for memory budget")
+        REGISTRY.set_gauge("excel_compare_admission_in_flight_bytes", self._in_flight_bytes,
+                           help_text="Estimated memory of running comparisons")
+        REGISTRY.set_gauge("excel_compare_admission_active", self._active,
+                           help_text="Comparisons currently running")
+
+    @contextmanager
+    def admit(self, estimated_bytes):
+        """Block until ``estimated_bytes`` fits in the budget, then hold it for the block"""
+        ticket = object()
+        with self._cond:
+            if self._queue or not self._fits(estimated_bytes):
+                if len(self._queue) >= self.max_queue:
+                    REGISTRY.inc("excel_compare_admission_rejected_total", labels={"reason": "queue_full"},
+                                 help_text="Comparisons rejected by admission control")
+                    raise AdmissionRejected(
+                        f"Server is busy: {len(self._queue)} comparisons already queued. Please retry shortly.",
+                        429, retry_after=max(1, int(self.queue_timeout / 2)))
+
+                self._queue.append(ticket)
+                self._publish()
+                deadline = time.monotonic() + self.queue_timeout
+                try:
+                    while self._queue[0] is not ticket or not self._fits(estimated_bytes):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            REGISTRY.inc("excel_compare_admission_rejected_total", labels={"reason": "timeout"})
+                            raise AdmissionRejected(
+                                f"Timed out after {self.queue_timeout:.0f}s waiting for memory to free up. "
+                                "Please retry shortly.", 503, retry_after=int(self.queue_timeout))
+                        self._cond.wait(remaining)
+                finally:
+                    self._queue.remove(ticket)
+                    self._cond.notify_all()
+
+            self._in_flight_bytes += estimated_bytes
+            self._active += 1
+            self._publish()
+
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_flight_bytes -= estimated_bytes
+                self._active -= 1
+                self._publish()
+                self._cond.notify_all()
+
+    def share_between(self, workers):
+        """
+        Split the budget and queue evenly between ``workers`` processes.
+
+        Each production worker has its own controller, so without this the
+        server as a whole would admit ``workers`` times the configured budget.
+        """
+        with self._cond:
+            self.budget_bytes //= workers
+            self.max_queue = max(1, -(-self.max_queue // workers))
+            self._cond.notify_all()
+
+    def snapshot(self):
+        with self._cond:
+            return {
+                "budget_bytes": self.budget_bytes,
+                "in_flight_bytes": self._in_flight_bytes,
+                "active": self._active,
+                "queue_depth": len(self._queue),
+                "max_queue": self.max_queue,
+            }
+
+
+admission_controller = AdmissionController(
+    budget_bytes=config.ADMISSION_MEMORY_BUDGET_MB * 2**20,
+    max_queue=config.ADMISSION_MAX_QUEUE,
+    queue_timeout=config.ADMISSION_QUEUE_TIMEOUT,
+)
@@ -0,0 +1,138 @@
+import difflib
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from app import config
+
+ALIGNMENT_MODES = ("off", "report", "apply")
+
+NUM_PERM = 64
+# 16 bands of 4 rows: pairs above ~0.5 Jaccard similarity share a band with high probability
+BANDS = 16
+_HASH_BLOCK = 16384
+
+_rng = np.random.default_rng(0x5EED)
+# Odd multipliers and offsets of the (a * h + b) mod 2**64 permutations
+_PERM_A = _rng.integers(1, 2**63, size=NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_PERM_B = _rng.integers(0, 2**63, size=NUM_PERM, dtype=np.uint64)
+_EMPTY = np.full(NUM_PERM, np.iinfo(np.uint64).max, dtype=np.uint64)
+
+
+def _value_hashes(col):
+    """Stable 64-bit hashes of a column's distinct non-null values"""
+    col = col.dropna()
+    if pd.api.types.is_bool_dtype(col):
+        col = col.astype(np.float64)
+    if pd.api.types.is_numeric_dtype(col):
+        # 1 and 1.0 are the same value whichever way pandas typed the column
+        values = col.to_numpy(dtype=np.float64)
+    elif pd.api.types.is_datetime64_any_dtype(col):
+        values = col.astype("datetime64[us]").to_numpy().view(np.int64)
+    else:
+        values = col.astype(str).str.strip().str.lower().to_numpy(dtype=object)
+    return pd.unique(pd.util.hash_array(values))
+
+
+def column_signature(col):
+    """
+    MinHash signature of a column's set of distinct values.
+
+    Each of the ``NUM_PERM`` entries is the minimum of one random
+    permutation of the value hashes, so the share of entries two signatures
+    agree on estimates the Jaccard similarity of the two value sets.
+    Returns None for a column without values.
+    """
+    hashes = _value_hashes(col)
+    if not hashes.size:
+        return None
+    signature = _EMPTY.copy()
+    with np.errstate(over="ignore"):
+        for start in range(0, hashes.size, _HASH_BLOCK):
+            block = hashes[start:start + _HASH_BLOCK, None]
+            np.minimum(signature, (block * _PERM_A + _PERM_B).min(axis=0), out=signature)
+    return signature
+
+
+def sheet_signature(df):
+    """MinHash of the union of every column's values: the element-wise minimum of the column signatures"""
+    signatures = [sig for sig in (column_signature(df[col]) for col in df.columns) if sig is not None]
+    return np.minimum.reduce(signatures) if signatures else None
+
+
+def similarity(signature1, signature2):
+    """Estimated Jaccard similarity of the value sets behind two signatures"""
+    return float(np.count_nonzero(signature1 == signature2)) / len(signature1)
+
+
+def _lsh_candidates(signatures1, signatures2, bands=BANDS):
+    """
+    Pairs whose signatures agree on every row of at least one band. Only
+    these are scored, so similar keys are found without comparing every
+    key of one side against every key of the other.
+    """
+    rows = NUM_PERM // bands
+    buckets = defaultdict(lambda: ([], []))
+    for side, signatures in enumerate((signatures1, signatures2)):
+        for key, signature in signatures.items():
+            for band in range(bands):
+                buckets[(band, signature[band * rows:(band + 1) * rows].tobytes())][side].append(key)
+    candidates = set()
+    for keys1, keys2 in buckets.values():
+        candidates.update((key1, key2) for key1 in keys1 for key2 in keys2)
+    return candidates
+
+
+def propose_alignment(signatures1, signatures2, min_similarity=None):
+    """
+    Pair keys of two signature dicts by estimated content similarity.
+
+    Candidate pairs come from LSH banding and are accepted best-first, each
+    key at most once. Ties, common for low-cardinality columns such as Y/N
+    flags, go to the pair whose names are most alike.
+
+    Args:
+        signatures1: Dict of file 1 column or sheet name to MinHash signature
+        signatures2: Same for file 2
+        min_similarity: Lowest estimated Jaccard similarity proposed
+
+    Returns:
+        List of ``(file1_key, file2_key, similarity)``, most similar first
+    """
+    min_similarity = config.ALIGNMENT_MIN_SIMILARITY if min_similarity is None else min_similarity
+    scored = []
+    for key1, key2 in _lsh_candidates(signatures1, signatures2):
+        score = similarity(signatures1[key1], signatures2[key2])
+        if score >= min_similarity:
+            name_score = difflib.SequenceMatcher(None, str(key1).lower(), str(key2).lower()).ratio()
+            scored.append((score, name_score, key1, key2))
+
+    used1, used2, accepted = set(), set(), []
+    for score, _, key1, key2 in sorted(scored, key=lambda s: (-s[0], -s[1], str(s[2]), str(s[3]))):
+        if key1 in used1 or key2 in used2:
+            continue
+        used1.add(key1)
+        used2.add(key2)
+        accepted.append((key1, key2, round(score, 3)))
+    return accepted
+
+
+def align_columns(df1, df2, columns1, columns2, min_similarity=None):
+    """Proposed ``(file1_column, file2_column, similarity)`` pairs among columns present on one side only"""
+    signatures1 = {col: sig for col in columns1 if (sig := column_signature(df1[col])) is not None}
+    signatures2 = {col: sig for col in columns2 if (sig := column_signature(df2[col])) is not None}
+    return propose_alignment(signatures1, signatures2, min_similarity)
+
+
+def align_sheets(frames1, frames2, min_similarity=None):
+    """Proposed ``(file1_sheet, file2_sheet, similarity)`` pairs from dicts of sheet name to parsed frame"""
+    signatures1 = {name: sig for name, df in frames1.items() if (sig := sheet_signature(df)) is not None}
+    signatures2 = {name: sig for name, df in frames2.items() if (sig := sheet_signature(df)) is not None}
+    return propose_alignment(signatures1, signatures2, min_similarity)
+
+
+def alignment_report(proposals, applied):
+    """JSON-ready form of ``propose_alignment`` output"""
+    return [{"file1": str(key1), "file2": str(key2), "similarity": score, "applied": applied}
+            for key1, key2, score in proposals]
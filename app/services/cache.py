@@ -0,0 +1,92 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+from app import config
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(*parts):
+    """Stable file-system safe key for the given string parts"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _entry_path(namespace, key):
+    return os.path.join(config.CACHE_DIR, namespace, key[:2], f"{key}.json")
+
+
+def load_json(namespace, key):
+    """Return the cached JSON document, or None when missing or unreadable"""
+    path = _entry_path(namespace, key)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable cache entry {path}: {str(e)}")
+        return None
+
+
+def store_json(namespace, key, value):
+    """Write a JSON document atomically (temp file plus rename)"""
+    path = _entry_path(namespace, key)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(value, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def prune_namespace(namespace, max_age_seconds=None, max_total_bytes=None):
+    """
+    Delete entries of ``namespace`` older than ``max_age_seconds``, then the
+    oldest ones until the rest fits in ``max_total_bytes``.
+
+    Returns:
+        Number of entries removed
+    """
+    entries = []
+    for root, _, files in os.walk(os.path.join(config.CACHE_DIR, namespace)):
+        for name in files:
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+    entries.sort()
+
+    cutoff = time.time() - max_age_seconds if max_age_seconds else None
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for mtime, size, path in entries:
+        expired = cutoff is not None and mtime < cutoff
+        oversized = max_total_bytes is not None and total > max_total_bytes
+        if not expired and not oversized:
+            break
+        try:
+            os.unlink(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
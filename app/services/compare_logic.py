@@ -1,44 +1,76 @@
 import pandas as pd
 import numpy as np
-import os
 from datetime import datetime
 import traceback
 import logging
 from io import BytesIO
 import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-BASE_DIR = os.path.join(BASE_DIR, "..", "..")
-
-LOGS_DIR = os.path.join(BASE_DIR, "logs")
-os.makedirs(LOGS_DIR, exist_ok=True)
-
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.join(LOGS_DIR, 'comparison.log')),
-        logging.StreamHandler()
-    ]
-)
+from app import config
+from app.services.alignment import ALIGNMENT_MODES, align_columns, align_sheets, alignment_report
+from app.services.datetime_stats import compare_datetime_values, is_datetime_column, normalize_datetimes
+from app.services.incremental import load_manifest, read_sheet_fingerprints, reusable_sheet_result, store_manifest
+from app.services.logging_setup import configure_logging, sampled
+from app.services.metrics import span
+from app.services.near_match import propose_renames
+from app.services.numeric_stats import (EXACT_STATISTICS, STATISTICS, numeric_summary, resolve_tolerances,
+                                        statistic_tolerance, values_differ)
+from app.services.profiling import profile_call
+from app.services.shared_columns import compare_columns_in_processes
+
+configure_logging()
 logger = logging.getLogger(__name__)
 
-REPORT_FOLDER = os.path.join(BASE_DIR, "reports")
-os.makedirs(REPORT_FOLDER, exist_ok=True)
+REPORT_FOLDER = config.REPORT_FOLDER
+
+# Bump whenever the shape or meaning of per-sheet results changes, so cached
+# results from incremental runs are not reused across versions
+RESULTS_VERSION = 5
+
+# Columns always compared as text
+FORCE_OBJECT_COLS = {"UW_Year", "Loss_Period"}
+
+def read_sheet_header(excel_file, sheet_name):
+    """
+    Read only the header row and the dimensions of a sheet.
 
-ALLOWED_EXT = {".xls", ".xlsx"}
+    Returns:
+        Tuple of (column names as pandas would label them, row count, column count);
+        the counts come from the sheet's dimension record and may be None
+    """
+    with span("sheet_header", sheet=sheet_name) as header_span:
+        # Dimensions first: pandas resets them on read-only sheets once it reads rows
+        rows = cols = None
+        try:
+            worksheet = excel_file.book[sheet_name]
+            rows, cols = worksheet.max_row, worksheet.max_column
+        except Exception:
+            pass
+        header = pd.read_excel(excel_file, sheet_name=sheet_name, nrows=0)
+        header_span.update(rows=rows, columns=cols)
+    return list(header.columns), rows, cols
 
-def allowed_filename(filename):
-    _, ext = os.path.splitext(filename.lower())
-    return ext in ALLOWED_EXT
+def safe_parse_excel_from_memory(file_stream, sheet_name, usecols=None):
+    """
+    Parse Excel sheet directly from memory without saving to disk.
 
-def safe_parse_excel_from_memory(file_stream, sheet_name):
-    """Parse Excel sheet directly from memory without saving to disk"""
+    ``file_stream`` may also be an open ``pd.ExcelFile``, which avoids loading
+    the workbook again for every sheet. ``usecols`` restricts parsing to the
+    given column names.
+    """
     try:
-        start_time = time.time()
-        df = pd.read_excel(file_stream, sheet_name=sheet_name, engine='openpyxl')
-        logger.info(f"Parsed sheet '{sheet_name}' in {time.time() - start_time:.2f}s, shape: {df.shape}")
+        with span("sheet_parse", sheet=sheet_name) as parse_span:
+            if usecols is not None:
+                wanted = set(usecols)
+                df = pd.read_excel(file_stream, sheet_name=sheet_name, engine='openpyxl',
+                                   usecols=lambda name: name in wanted)
+            else:
+                df = pd.read_excel(file_stream, sheet_name=sheet_name, engine='openpyxl')
+            parse_span.update(rows=df.shape[0], columns=df.shape[1])
+        logger.info(f"Parsed sheet '{sheet_name}' in {parse_span['seconds']:.2f}s, shape: {df.shape}")
         
         if df.empty or len(df) == 0:
             return pd.DataFrame()
@@ -47,8 +79,76 @@ def safe_parse_excel_from_memory(file_stream, sheet_name):
         logger.warning(f"Could not parse sheet '{sheet_name}': {str(e)}")
         return pd.DataFrame()
 
-def efficient_column_comparison(col1, col2, col_name, force_object_cols):
-    """Optimized column comparison with performance improvements"""
+def _sheet_header(source, sheet):
+    # SharedWorkbook (matrix mode) caches headers and frames across pairs
+    return source.header(sheet) if hasattr(source, "header") else read_sheet_header(source, sheet)
+
+def _sheet_frame(source, sheet, usecols):
+    return source.frame(sheet) if hasattr(source, "frame") else safe_parse_excel_from_memory(source, sheet, usecols=usecols)
+
+def _sheet_rows(source, sampler, sheet, rows):
+    """Row count of a sheet for sampling, counted when the workbook has no dimension record"""
+    if rows is not None:
+        return rows
+    try:
+        if sampler is not None:
+            return sampler.last_row(sheet)
+        if hasattr(source, "frame"):
+            return len(source.frame(sheet)) + 1
+    except Exception as e:
+        logger.warning(f"Could not count the rows of sheet '{sheet}': {str(e)}")
+    return None
+
+def _column_stats(source, sheet, sampled, renamed=None):
+    # Only statistics of a shared workbook's full frame hold for its other pairs
+    if sampled or not hasattr(source, "column_stats"):
+        return None
+    cache = source.column_stats(sheet)
+    # Columns aligned by content are compared under the file 1 name but cached under their own
+    renamed = renamed or {}
+    return lambda col: cache.setdefault(renamed.get(col, col), {})
+
+def _sampled_frame(source, sampler, sheet, rows, usecols):
+    """
+    Frame of the sampled Excel ``rows`` of a sheet, and how it was read.
+
+    ``sampler`` reads only those rows; without one (shared workbooks) or if
+    it fails, the sheet is parsed in full and the rows are picked from it.
+    """
+    if sampler is not None:
+        try:
+            with span("sheet_sample", sheet=sheet, rows=len(rows)):
+                df = sampler.read(sheet, rows)
+            if usecols is not None:
+                df = df[[col for col in df.columns if col in set(usecols)]]
+            return df, "rows"
+        except Exception as e:
+            logger.warning(f"Sampled read of sheet '{sheet}' failed, parsing it in full: {str(e)}")
+    df = _sheet_frame(source, sheet, usecols)
+    return df.iloc[[row - 2 for row in rows if row - 2 < len(df)]].reset_index(drop=True), "parsed"
+
+def _column_statistic(memo, kind, compute):
+    # ``memo`` is a shared workbook's cache for this column (matrix mode), so other pairs reuse the result
+    if memo is None:
+        return compute()
+    if kind not in memo:
+        memo[kind] = compute()
+    return memo[kind]
+
+def _numeric_column_summary(col):
+    numeric = pd.to_numeric(col, errors='coerce')
+    if numeric.isna().all():
+        return None
+    # One blocked pass per column computes every statistic without a filtered copy
+    return numeric_summary(numeric.to_numpy(dtype=np.float64, na_value=np.nan))
+
+def efficient_column_comparison(col1, col2, col_name, force_object_cols, tolerances=None, memos=(None, None)):
+    """
+    Optimized column comparison with performance improvements.
+
+    ``memos`` are optional per-column caches of each side's statistics,
+    kept by ``SharedWorkbook`` so a column is summarised once per workbook.
+    """
     start_time = time.time()
     
     try:
@@ -97,14 +197,33 @@ def efficient_column_comparison(col1, col2, col_name, force_object_cols):
         except Exception:
             is_numeric = False
 
-        col_data["type"] = "numeric" if is_numeric else "text"
+        is_datetime = (not is_numeric and col_name not in force_object_cols
+                       and is_datetime_column(col1) and is_datetime_column(col2))
+        col_data["type"] = "numeric" if is_numeric else "datetime" if is_datetime else "text"
 
-        if col_name in force_object_cols or not is_numeric:
+        if is_datetime:
+            # Compared on datetime64 values; formatting millions of Timestamps as strings is slow
+            try:
+                kind = ("datetimes", config.DATETIME_PRECISION)
+                stats, differences_found, histograms = compare_datetime_values(
+                    _column_statistic(memos[0], kind, lambda: normalize_datetimes(col1)),
+                    _column_statistic(memos[1], kind, lambda: normalize_datetimes(col2)))
+                col_data.update({
+                    "status": "different" if differences_found else "matching",
+                    "differences": differences_found,
+                    "statistics": stats,
+                    "histograms": histograms
+                })
+            except Exception as e:
+                logger.warning(f"Datetime comparison failed for {col_name}: {str(e)}")
+                col_data.update({"status": "error", "error": f"Datetime comparison failed: {str(e)}"})
+
+        elif col_name in force_object_cols or not is_numeric:
             # Optimized text comparison
             try:
                 # Use value_counts with dropna=False for better performance
-                vc1 = col1.astype(str).value_counts(dropna=False)
-                vc2 = col2.astype(str).value_counts(dropna=False)
+                vc1 = _column_statistic(memos[0], "value_counts", lambda: col1.astype(str).value_counts(dropna=False))
+                vc2 = _column_statistic(memos[1], "value_counts", lambda: col2.astype(str).value_counts(dropna=False))
                 
                 # Find differences efficiently using set operations
                 all_values = set(vc1.index).union(set(vc2.index))
@@ -126,6 +245,13 @@ def efficient_column_comparison(col1, col2, col_name, force_object_cols):
                     "status": "different" if diffs else "matching",
                     "differences": diffs
                 })
+
+                if diffs and config.NEAR_MATCH:
+                    # Values present on one side only may be renames of each other
+                    near_matches = propose_renames(vc1.index.difference(vc2.index).tolist(),
+                                                   vc2.index.difference(vc1.index).tolist())
+                    if near_matches:
+                        col_data["near_matches"] = near_matches
                 
             except Exception as e:
                 logger.warning(f"Text comparison failed for {col_name}: {str(e)}")
@@ -134,73 +260,50 @@ def efficient_column_comparison(col1, col2, col_name, force_object_cols):
         else:
             # Optimized numeric comparison
             try:
-                # Convert to numeric in one go
-                col1_numeric = pd.to_numeric(col1, errors='coerce')
-                col2_numeric = pd.to_numeric(col2, errors='coerce')
-                
+                summary1 = _column_statistic(memos[0], "numeric", lambda: _numeric_column_summary(col1))
+                summary2 = _column_statistic(memos[1], "numeric", lambda: _numeric_column_summary(col2))
+
                 # Quick check for failed conversion
-                if col1_numeric.isna().all() or col2_numeric.isna().all():
+                if summary1 is None or summary2 is None:
                     col_data.update({"type": "text", "status": "error", 
                                    "error": "Failed numeric conversion"})
                     return col_data
 
-                # Calculate only essential statistics
                 stats = {}
                 differences_found = []
-                
-                # Use numpy for faster calculations
-                col1_vals = col1_numeric.values
-                col2_vals = col2_numeric.values
-                
-                # Remove NaN values for statistical calculations
-                col1_clean = col1_vals[~np.isnan(col1_vals)]
-                col2_clean = col2_vals[~np.isnan(col2_vals)]
-                
-                if len(col1_clean) > 0 and len(col2_clean) > 0:
-                    stats = {
-                        "sum": {"file1": float(np.sum(col1_clean)), "file2": float(np.sum(col2_clean))},
-                        "mean": {"file1": float(np.mean(col1_clean)), "file2": float(np.mean(col2_clean))},
-                        "min": {"file1": float(np.min(col1_clean)), "file2": float(np.min(col2_clean))},
-                        "max": {"file1": float(np.max(col1_clean)), "file2": float(np.max(col2_clean))},
-                    }
-                    
-                    # Check differences with vectorized operations
+
+                tolerances = tolerances or resolve_tolerances()
+                quantiles_estimated = summary1["quantiles_estimated"] or summary2["quantiles_estimated"]
+
+                if summary1["count"] > 0 and summary2["count"] > 0:
+                    stats = {stat: {"file1": summary1[stat], "file2": summary2[stat]} for stat in STATISTICS}
+
                     for stat, values in stats.items():
                         v1, v2 = values["file1"], values["file2"]
-                        
-                        if np.isnan(v1) or np.isnan(v2) or np.isinf(v1) or np.isinf(v2):
+
+                        if stat in EXACT_STATISTICS:
+                            if v1 != v2:
+                                differences_found.append({
+                                    "statistic": stat,
+                                    "file1_value": v1,
+                                    "file2_value": v2,
+                                    "difference": v2 - v1
+                                })
+                        elif np.isnan(v1) or np.isnan(v2) or np.isinf(v1) or np.isinf(v2):
                             differences_found.append({
                                 "statistic": stat,
                                 "file1_value": v1,
                                 "file2_value": v2,
                                 "difference": "NaN/Inf detected"
                             })
-                        elif stat in ["mean", "sum"]:
-                            if abs(v1) > 1 or abs(v2) > 1:
-                                relative_diff = abs(v1 - v2) / max(abs(v1), abs(v2))
-                                if relative_diff > 1e-6:  # Slightly relaxed tolerance
-                                    differences_found.append({
-                                        "statistic": stat,
-                                        "file1_value": round(v1, 4),
-                                        "file2_value": round(v2, 4),
-                                        "difference": round(v2 - v1, 4)
-                                    })
-                            else:
-                                if abs(v1 - v2) > 1e-6:
-                                    differences_found.append({
-                                        "statistic": stat,
-                                        "file1_value": round(v1, 4),
-                                        "file2_value": round(v2, 4),
-                                        "difference": round(v2 - v1, 4)
-                                    })
-                        elif stat in ["min", "max"]:
-                            if abs(v1 - v2) > 1e-6:
-                                differences_found.append({
-                                    "statistic": stat,
-                                    "file1_value": v1,
-                                    "file2_value": v2,
-                                    "difference": round(v2 - v1, 4)
-                                })
+                        elif values_differ(v1, v2, *statistic_tolerance(tolerances, col_name, stat,
+                                                                        quantiles_estimated)):
+                            differences_found.append({
+                                "statistic": stat,
+                                "file1_value": round(v1, 4),
+                                "file2_value": round(v2, 4),
+                                "difference": round(v2 - v1, 4)
+                            })
 
                 col_data.update({
                     "status": "different" if differences_found else "matching",
@@ -212,7 +315,10 @@ def efficient_column_comparison(col1, col2, col_name, force_object_cols):
                 logger.warning(f"Numeric comparison failed for {col_name}: {str(e)}")
                 col_data.update({"status": "error", "error": f"Numeric comparison failed: {str(e)}"})
 
-        logger.debug(f"Column {col_name} comparison completed in {time.time() - start_time:.3f}s")
+        # Wide sheets would otherwise produce one record per column
+        if logger.isEnabledFor(logging.DEBUG) and sampled():
+            logger.debug(f"Column {col_name} comparison completed in {time.time() - start_time:.3f}s",
+                         extra={"column": str(col_name), "seconds": round(time.time() - start_time, 6)})
         return col_data
 
     except Exception as e:
@@ -225,28 +331,372 @@ def efficient_column_comparison(col1, col2, col_name, force_object_cols):
             "error": f"Unexpected error: {str(e)}"
         }
 
-def compare_excel_stats(file1, file2):
-    """Optimized Excel comparison without temporary file operations"""
+def _compare_column(df1, df2, col, force_object_cols, tolerances=None, column_stats=(None, None)):
+    try:
+        memos = tuple(None if stats is None else stats(col) for stats in column_stats)
+        return efficient_column_comparison(df1[col], df2[col], col, force_object_cols, tolerances, memos)
+    except Exception as col_error:
+        logger.warning(f"Column {col} failed: {str(col_error)}")
+        return {
+            "name": col, "type": "unknown", "status": "error",
+            "differences": [], "error": f"Processing failed: {str(col_error)}"
+        }
+
+def _compare_column_batch(df1, df2, cols, force_object_cols, tolerances=None, column_stats=(None, None)):
+    return [_compare_column(df1, df2, col, force_object_cols, tolerances, column_stats) for col in cols]
+
+_column_executor = None
+_column_executor_lock = threading.Lock()
+
+def _get_column_executor(workers):
+    """Shared thread pool for column batches, resized when the worker count changes"""
+    global _column_executor
+    with _column_executor_lock:
+        if _column_executor is None or _column_executor._max_workers != workers:
+            if _column_executor is not None:
+                _column_executor.shutdown(wait=False)
+            _column_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="column-compare")
+        return _column_executor
+
+def compare_sheet_columns(df1, df2, common_cols, force_object_cols, sheet_data, workers=None, tolerances=None,
+                          column_stats=(None, None)):
+    """
+    Compare every common column of a sheet and tally the results into ``sheet_data``.
+
+    With more than one worker, and more columns than one batch, batches of
+    columns are compared on a thread pool. Most of the work happens in NumPy
+    and pandas code that releases the GIL. With ``COLUMN_EXECUTOR`` set to
+    ``process`` the batches go to worker processes instead, which read the
+    columns from shared memory rather than receiving pickled copies.
+    Results are always collected in the original column order.
+
+    ``column_stats`` maps a column name to the per-column statistics cache
+    of each side's ``SharedWorkbook`` (None for other sources). Worker
+    processes cannot fill those caches, so they only apply in this process.
+    """
+    workers = workers or config.COLUMN_WORKERS
+    batch_size = max(1, config.COLUMN_BATCH_SIZE)
+
+    if workers > 1 and len(common_cols) > batch_size:
+        batches = [common_cols[i:i + batch_size] for i in range(0, len(common_cols), batch_size)]
+    else:
+        batches = None
+
+    if batches and config.COLUMN_EXECUTOR == "process":
+        col_results = compare_columns_in_processes(df1, df2, batches, force_object_cols, tolerances, workers)
+    elif batches:
+        executor = _get_column_executor(workers)
+        futures = [
+            executor.submit(contextvars.copy_context().run, profile_call, _compare_column_batch,
+                            df1, df2, batch, force_object_cols, tolerances, column_stats)
+            for batch in batches
+        ]
+        col_results = [result for future in futures for result in future.result()]
+    else:
+        col_results = _compare_column_batch(df1, df2, common_cols, force_object_cols, tolerances, column_stats)
+
+    for col_result in col_results:
+        # Update counters
+        status = col_result.get("status")
+        if status == "matching":
+            sheet_data["matching_columns"] += 1
+        elif status == "different":
+            sheet_data["different_columns"] += 1
+        elif status == "error":
+            sheet_data["error_columns"] += 1
+            
+        sheet_data["columns"].append(col_result)
+
+def compare_sheet(xl1, xl2, sheet, force_object_cols, tolerances=None, alignment="off", sheet2=None,
+                  sample=None, seed=0, escalate=False, samplers=(None, None)):
+    """
+    Parse one sheet from both workbooks and compare their common columns.
+
+    Loading is two-phase: the header rows are read first, and only the
+    columns present on both sides are parsed, so columns that exist in one
+    workbook only are never decoded or held in memory.
+
+    With ``alignment`` set to ``report`` or ``apply``, sheets that have
+    columns on one side only are parsed in full so those columns can be
+    paired by content (``column_alignment``); ``apply`` then compares each
+    pair as if the file 2 column had the file 1 name. ``sheet2`` names the
+    sheet in file 2 when it differs from ``sheet``.
+
+    With ``sample``, a side with more data rows than that is compared on a
+    seeded stratified sample of them (``samplers`` read only the sampled
+    rows). Column results are then estimates with confidence intervals; if
+    any difference is ``borderline`` and ``escalate`` is set, the sheet is
+    compared again in full.
+    """
+    sheet_start_time = time.time()
+    sheet2 = sheet if sheet2 is None else sheet2
+    sheet_data = {
+        "sheet_name": sheet,
+        "status": "processed",
+        "error": None,
+        "total_columns": 0,
+        "matching_columns": 0,
+        "different_columns": 0,
+        "error_columns": 0,
+        "reused": False,
+        "columns": []
+    }
+
+    try:
+        # Phase 1: headers and dimensions only
+        header1, rows1, cols1 = _sheet_header(xl1, sheet)
+        header2, rows2, cols2 = _sheet_header(xl2, sheet2)
+        sheet_data["dimensions"] = {
+            "file1": {"rows": rows1, "columns": cols1},
+            "file2": {"rows": rows2, "columns": cols2},
+        }
+        header2_set = set(header2)
+        header1_set = set(header1)
+        shared_header = [col for col in header1 if col in header2_set]
+        sheet_data["columns_only_in_file1"] = [str(col) for col in header1 if col not in header2_set]
+        sheet_data["columns_only_in_file2"] = [str(col) for col in header2 if col not in header1_set]
+
+        align = alignment != "off" and bool(sheet_data["columns_only_in_file1"]) \
+            and bool(sheet_data["columns_only_in_file2"])
+
+        if not shared_header and header1 and header2 and not align:
+            sheet_data.update({
+                "status": "warning",
+                "error": "No common columns found"
+            })
+            return sheet_data
+
+        # pandas renames duplicate headers ("A", "A.1"), which a name filter
+        # cannot express, so such sheets are parsed in full
+        has_duplicates = len(header1_set) != len(header1) or len(header2_set) != len(header2)
+        usecols = None if has_duplicates or not shared_header or align else shared_header
+        if usecols is not None:
+            skipped = len(header1) + len(header2) - 2 * len(shared_header)
+            if skipped:
+                logger.info(f"Sheet {sheet}: skipping {skipped} columns present on one side only")
+
+        # Phase 2: parse the common columns only, or a sample of their rows
+        sampled1 = sampled2 = None
+        if sample:
+            from app.services.sampling import sample_rows
+
+            rows1, rows2 = _sheet_rows(xl1, samplers[0], sheet, rows1), _sheet_rows(xl2, samplers[1], sheet2, rows2)
+            sampled1 = sample_rows((rows1 or 1) - 1, sample, seed, sheet)
+            sampled2 = sample_rows((rows2 or 1) - 1, sample, seed, sheet2)
+        if sampled1 or sampled2:
+            df1, method1 = (_sampled_frame(xl1, samplers[0], sheet, sampled1, usecols) if sampled1
+                            else (_sheet_frame(xl1, sheet, usecols), None))
+            df2, method2 = (_sampled_frame(xl2, samplers[1], sheet2, sampled2, usecols) if sampled2
+                            else (_sheet_frame(xl2, sheet2, usecols), None))
+            population1 = rows1 - 1 if sampled1 else len(df1)
+            population2 = rows2 - 1 if sampled2 else len(df2)
+            sheet_data["sampling"] = {
+                "file1": {"rows": len(df1), "population": population1},
+                "file2": {"rows": len(df2), "population": population2},
+                "seed": seed, "method": "parsed" if "parsed" in (method1, method2) else "rows", "escalated": False,
+            }
+            logger.info(f"Sheet {sheet}: comparing a sample of {len(df1)}/{population1} and "
+                        f"{len(df2)}/{population2} rows")
+        else:
+            df1 = _sheet_frame(xl1, sheet, usecols)
+            df2 = _sheet_frame(xl2, sheet2, usecols)
+        
+        if df1.empty or df2.empty:
+            sheet_data.update({
+                "status": "warning",
+                "error": "One or both sheets are empty",
+                "total_columns": 0
+            })
+            return sheet_data
+
+        renamed = {}
+        if align:
+            with span("column_alignment", sheet=sheet):
+                proposals = align_columns(df1, df2, [col for col in df1.columns if col not in df2.columns],
+                                          [col for col in df2.columns if col not in df1.columns])
+            sheet_data["column_alignment"] = alignment_report(proposals, alignment == "apply")
+            if alignment == "apply" and proposals:
+                renamed = {col1: col2 for col1, col2, _ in proposals}
+                df2 = df2.rename(columns={col2: col1 for col1, col2 in renamed.items()})
+                aligned1 = {str(col1) for col1 in renamed}
+                aligned2 = {str(col2) for col2 in renamed.values()}
+                sheet_data["columns_only_in_file1"] = [c for c in sheet_data["columns_only_in_file1"] if c not in aligned1]
+                sheet_data["columns_only_in_file2"] = [c for c in sheet_data["columns_only_in_file2"] if c not in aligned2]
+            logger.info(f"Sheet {sheet}: {len(proposals)} column(s) aligned by content")
+
+        # Get common columns
+        common_cols = list(df1.columns.intersection(df2.columns))
+        sheet_data["total_columns"] = len(common_cols)
+        
+        if not common_cols:
+            sheet_data.update({
+                "status": "warning",
+                "error": "No common columns found"
+            })
+            return sheet_data
+
+        logger.info(f"Sheet {sheet}: Comparing {len(common_cols)} columns")
+        
+        # Process columns in batches for better memory management
+        with span("column_compare", sheet=sheet, rows=max(len(df1), len(df2)),
+                  columns=len(common_cols)):
+            column_stats = (_column_stats(xl1, sheet, sampled1), _column_stats(xl2, sheet2, sampled2, renamed))
+            compare_sheet_columns(df1, df2, common_cols, force_object_cols, sheet_data, tolerances=tolerances,
+                                  column_stats=column_stats)
+        for col_result in sheet_data["columns"]:
+            if col_result["name"] in renamed:
+                col_result["file2_name"] = str(renamed[col_result["name"]])
+
+        if "sampling" in sheet_data:
+            from app.services.sampling import annotate_estimates, z_score
+
+            z = z_score()
+            for col_result in sheet_data["columns"]:
+                annotate_estimates(col_result, df1[col_result["name"]], df2[col_result["name"]],
+                                   population1, population2, z)
+            borderline = [str(col["name"]) for col in sheet_data["columns"] if col.get("borderline")]
+            if borderline and escalate:
+                logger.info(f"Sheet {sheet}: {len(borderline)} borderline column(s) in the sample, "
+                            f"comparing every row")
+                full_data = compare_sheet(xl1, xl2, sheet, force_object_cols, tolerances, alignment, sheet2)
+                full_data["sampling"] = dict(sheet_data["sampling"], escalated=True, borderline_columns=borderline)
+                return full_data
+
+        logger.info(f"Sheet {sheet} completed in {time.time() - sheet_start_time:.2f}s")
+        
+    except Exception as sheet_error:
+        logger.error(f"Sheet {sheet} failed: {str(sheet_error)}")
+        sheet_data.update({
+            "status": "error",
+            "error": f"Sheet processing failed: {str(sheet_error)}",
+            "total_columns": 0,
+            "columns": []
+        })
+
+    return sheet_data
+
+def comparison_settings(tolerances=None, alignment=None, sample=None, seed=None, escalate=None):
+    """
+    Every option and setting that changes a comparison's result, resolved
+    the way ``compare_excel_stats`` resolves them. Cached results (incremental
+    manifests, stored path results) are only reused while this is unchanged.
+    """
+    sample = max(0, config.SAMPLE_ROWS if sample is None else int(sample))
+    settings = {
+        "version": RESULTS_VERSION,
+        "force_object_cols": sorted(FORCE_OBJECT_COLS),
+        "tolerances": resolve_tolerances(tolerances),
+        "quantile_rel_tolerance": config.NUMERIC_QUANTILE_REL_TOLERANCE,
+        "datetime_precision": config.DATETIME_PRECISION,
+        "alignment": config.ALIGNMENT if alignment is None else alignment,
+        "alignment_min_similarity": config.ALIGNMENT_MIN_SIMILARITY,
+        "near_match": [config.NEAR_MATCH, config.NEAR_MATCH_MAX_VALUES, config.NEAR_MATCH_CANDIDATE_BUDGET,
+                       config.NEAR_MATCH_MIN_SCORE],
+    }
+    if sample:
+        settings["sampling"] = {"rows": sample, "seed": config.SAMPLE_SEED if seed is None else int(seed),
+                                "escalate": config.SAMPLE_ESCALATE if escalate is None else escalate,
+                                "confidence": config.SAMPLE_CONFIDENCE}
+    return settings
+
+def open_workbook_stream(file):
+    """Seekable stream for an upload, or a memory map for files already on disk"""
+    if hasattr(file, "open_stream"):
+        return file.open_stream()
+    return BytesIO(file.read())
+
+def _stream_size(stream):
+    position = stream.tell()
+    stream.seek(0, 2)
+    size = stream.tell()
+    stream.seek(position)
+    return size
+
+def _align_workbook_sheets(xl1, xl2, sheets1, sheets2):
+    """
+    Content-based pairs among sheets present in one workbook only.
+
+    Uploads are parsed again when an aligned pair is compared; alignment
+    is opt-in, and only sheets without a same-named partner are read here.
+    """
+    with span("sheet_alignment", sheets=len(sheets1) + len(sheets2)):
+        frames1 = {sheet: _sheet_frame(xl1, sheet, None) for sheet in sheets1}
+        frames2 = {sheet: _sheet_frame(xl2, sheet, None) for sheet in sheets2}
+        return align_sheets(frames1, frames2)
+
+def compare_excel_stats(file1, file2, incremental=None, tolerances=None, alignment=None,
+                        sample=None, seed=None, escalate=None, on_sheet=None):
+    """
+    Optimized Excel comparison without temporary file operations.
+
+    ``tolerances`` maps column names to ``{"abs": ..., "rel": ...}`` and
+    overrides the configured tolerances for numeric statistics.
+
+    ``alignment`` (defaults to ``config.ALIGNMENT``) pairs sheets and
+    columns whose names exist in one workbook only by the similarity of
+    their values: ``report`` lists the proposed mapping, ``apply`` also
+    compares the pairs as if they had the same name.
+
+    ``sample`` (defaults to ``config.SAMPLE_ROWS``; 0 compares every row)
+    compares sheets with more data rows than that on a stratified sample
+    drawn with ``seed`` (``config.SAMPLE_SEED``). Sampled column results
+    carry confidence intervals and ``estimated``; with ``escalate``
+    (``config.SAMPLE_ESCALATE``) a sheet whose sampled differences are
+    within those intervals is compared again in full.
+
+    With ``incremental`` (defaults to ``config.INCREMENTAL_COMPARISON``) the
+    CRCs of each sheet's zip parts are checked against the manifest stored
+    by the previous run of the same pair, and unchanged sheets reuse their
+    cached results instead of being parsed again.
+
+    ``on_sheet``, when given, is called with each sheet's result, its
+    position and the number of sheets as soon as the sheet is done.
+
+    ``file1`` and ``file2`` may also be ``SharedWorkbook`` objects from
+    matrix mode; their sheets are parsed once and shared by every pair they
+    take part in, so incremental reuse is skipped for them.
+    """
     start_time = time.time()
+    alignment = config.ALIGNMENT if alignment is None else alignment
+    if alignment not in ALIGNMENT_MODES:
+        return {"error": f"Unknown alignment mode '{alignment}'; expected one of {', '.join(ALIGNMENT_MODES)}"}
+    shared = hasattr(file1, "frame") and hasattr(file2, "frame")
+    sample = max(0, config.SAMPLE_ROWS if sample is None else int(sample))
+    seed = config.SAMPLE_SEED if seed is None else int(seed)
+    escalate = config.SAMPLE_ESCALATE if escalate is None else escalate
+    if incremental is None:
+        incremental = config.INCREMENTAL_COMPARISON
+    incremental = incremental and not shared
     logger.info(f"Starting comparison: {file1.filename} vs {file2.filename}")
+    streams = []
     
     try:
-        # Read Excel files directly from memory
-        file1_stream = BytesIO(file1.read())
-        file2_stream = BytesIO(file2.read())
-        
-        # Reset stream positions for multiple reads
-        file1_stream.seek(0)
-        file2_stream.seek(0)
+        if shared:
+            xl1, xl2 = file1, file2
+        else:
+            # Read Excel files directly from memory
+            with span("upload_read") as read_span:
+                file1_stream = open_workbook_stream(file1)
+                streams.append(file1_stream)
+                file2_stream = open_workbook_stream(file2)
+                streams.append(file2_stream)
+                read_span["bytes"] = _stream_size(file1_stream) + _stream_size(file2_stream)
+            
+            # Reset stream positions for multiple reads
+            file1_stream.seek(0)
+            file2_stream.seek(0)
         
         # Get sheet names
         try:
-            xl1 = pd.ExcelFile(file1_stream, engine='openpyxl')
-            xl2 = pd.ExcelFile(file2_stream, engine='openpyxl')
-            
-            sheets1 = xl1.sheet_names
-            sheets2 = xl2.sheet_names
-            common_sheets = sorted(set(sheets1).intersection(sheets2))
+            with span("workbook_open") as open_span:
+                if not shared:
+                    xl1 = pd.ExcelFile(file1_stream, engine='openpyxl')
+                    xl2 = pd.ExcelFile(file2_stream, engine='openpyxl')
+                
+                sheets1 = xl1.sheet_names
+                sheets2 = xl2.sheet_names
+                common_sheets = sorted(set(sheets1).intersection(sheets2))
+                open_span["sheets"] = len(common_sheets)
             
             logger.info(f"Found {len(common_sheets)} common sheets: {common_sheets}")
             
@@ -254,111 +704,91 @@ def compare_excel_stats(file1, file2):
             logger.error(f"Failed to read Excel files: {str(e)}")
             return {"error": f"Failed to read Excel files: {str(e)}"}
 
-        force_object_cols = {"UW_Year", "Loss_Period"}
+        force_object_cols = set(FORCE_OBJECT_COLS)
+        options = comparison_settings(tolerances, alignment, sample, seed, escalate)
+        tolerances = options["tolerances"]
+        samplers = (None, None)
+        if sample:
+            if not shared:
+                # Only sampled runs load the row reader, which relies on openpyxl internals
+                from app.services.sampling import open_sampler
+
+                samplers = (open_sampler(file1_stream, xl1.book), open_sampler(file2_stream, xl2.book))
+
+        # (file 1 sheet, file 2 sheet) for every pair compared
+        sheet_pairs = [(sheet, sheet) for sheet in common_sheets]
+        sheet_alignment = []
+        only1 = [sheet for sheet in sheets1 if sheet not in sheets2]
+        only2 = [sheet for sheet in sheets2 if sheet not in sheets1]
+        if alignment != "off" and only1 and only2:
+            proposals = _align_workbook_sheets(xl1, xl2, only1, only2)
+            sheet_alignment = alignment_report(proposals, alignment == "apply")
+            if alignment == "apply":
+                sheet_pairs += [(sheet1, sheet2) for sheet1, sheet2, _ in proposals]
+            logger.info(f"{len(proposals)} sheet(s) aligned by content")
         
         comparison_results = {
             "file1_name": file1.filename,
             "file2_name": file2.filename,
             "comparison_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "total_sheets": len(common_sheets),
+            "total_sheets": len(sheet_pairs),
             "sheets_processed": 0,
             "sheets_failed": 0,
+            "sheets_reused": 0,
             "sheets": []
         }
+        if alignment != "off":
+            comparison_results["sheet_alignment"] = sheet_alignment
+        if sample:
+            comparison_results["sampling"] = options["sampling"]
 
-        if not common_sheets:
+        if not sheet_pairs:
             logger.warning("No common sheets found between files")
             comparison_results["warning"] = "No common sheets found between files"
             return comparison_results
 
+        fingerprints1 = fingerprints2 = manifest = None
+        if incremental:
+            fingerprints1 = read_sheet_fingerprints(file1_stream) or {}
+            fingerprints2 = read_sheet_fingerprints(file2_stream) or {}
+            manifest = load_manifest(file1.filename, file2.filename)
+        new_manifest = {"options": options, "sheets": {}}
+
         # Process sheets
-        for sheet_idx, sheet in enumerate(common_sheets):
-            sheet_start_time = time.time()
-            logger.info(f"Processing sheet {sheet_idx + 1}/{len(common_sheets)}: {sheet}")
-            
-            sheet_data = {
-                "sheet_name": sheet,
-                "status": "processed",
-                "error": None,
-                "total_columns": 0,
-                "matching_columns": 0,
-                "different_columns": 0,
-                "error_columns": 0,
-                "columns": []
-            }
+        for sheet_idx, (sheet, sheet2) in enumerate(sheet_pairs):
+            logger.info(f"Processing sheet {sheet_idx + 1}/{len(sheet_pairs)}: {sheet}")
 
-            try:
-                # Reset streams for each sheet read
-                file1_stream.seek(0)
-                file2_stream.seek(0)
-                
-                # Parse sheets
-                df1 = safe_parse_excel_from_memory(file1_stream, sheet)
-                df2 = safe_parse_excel_from_memory(file2_stream, sheet)
-                
-                if df1.empty or df2.empty:
-                    sheet_data.update({
-                        "status": "warning",
-                        "error": "One or both sheets are empty",
-                        "total_columns": 0
-                    })
-                    comparison_results["sheets"].append(sheet_data)
-                    continue
-
-                # Get common columns
-                common_cols = list(df1.columns.intersection(df2.columns))
-                sheet_data["total_columns"] = len(common_cols)
-                
-                if not common_cols:
-                    sheet_data.update({
-                        "status": "warning",
-                        "error": "No common columns found"
-                    })
-                    comparison_results["sheets"].append(sheet_data)
-                    continue
-
-                logger.info(f"Sheet {sheet}: Comparing {len(common_cols)} columns")
-                
-                # Process columns in batches for better memory management
-                for col_idx, col in enumerate(common_cols):
-                    try:
-                        col_result = efficient_column_comparison(
-                            df1[col], df2[col], col, force_object_cols
-                        )
-                        
-                        # Update counters
-                        status = col_result.get("status")
-                        if status == "matching":
-                            sheet_data["matching_columns"] += 1
-                        elif status == "different":
-                            sheet_data["different_columns"] += 1
-                        elif status == "error":
-                            sheet_data["error_columns"] += 1
-                            
-                        sheet_data["columns"].append(col_result)
-                        
-                    except Exception as col_error:
-                        logger.warning(f"Column {col} failed: {str(col_error)}")
-                        sheet_data["columns"].append({
-                            "name": col, "type": "unknown", "status": "error",
-                            "differences": [], "error": f"Processing failed: {str(col_error)}"
-                        })
-                        sheet_data["error_columns"] += 1
+            sheet_data = None
+            if incremental:
+                fingerprint1, fingerprint2 = fingerprints1.get(sheet), fingerprints2.get(sheet2)
+                sheet_data = reusable_sheet_result(manifest, sheet, fingerprint1, fingerprint2, options)
+                if sheet_data is not None:
+                    sheet_data["reused"] = True
+                    comparison_results["sheets_reused"] += 1
+                    logger.info(f"Sheet {sheet} unchanged since last run, reusing cached result")
+
+            if sheet_data is None:
+                sheet_data = compare_sheet(xl1, xl2, sheet, force_object_cols, tolerances, alignment, sheet2,
+                                           sample, seed, escalate, samplers)
+                if sheet2 != sheet:
+                    sheet_data["file2_sheet_name"] = sheet2
 
+            if sheet_data["status"] == "processed":
                 comparison_results["sheets_processed"] += 1
-                logger.info(f"Sheet {sheet} completed in {time.time() - sheet_start_time:.2f}s")
-                
-            except Exception as sheet_error:
-                logger.error(f"Sheet {sheet} failed: {str(sheet_error)}")
-                sheet_data.update({
-                    "status": "error",
-                    "error": f"Sheet processing failed: {str(sheet_error)}",
-                    "total_columns": 0,
-                    "columns": []
-                })
+            elif sheet_data["status"] == "error":
                 comparison_results["sheets_failed"] += 1
 
+            # Failed sheets are never cached so they are retried next run
+            if incremental and sheet_data["status"] != "error" and fingerprint1 and fingerprint2:
+                new_manifest["sheets"][sheet] = {"file1": fingerprint1, "file2": fingerprint2,
+                                                 "result": dict(sheet_data, reused=False)}
+
             comparison_results["sheets"].append(sheet_data)
+            if on_sheet is not None:
+                on_sheet(sheet_data, sheet_idx + 1, len(sheet_pairs))
+
+        if incremental:
+            store_manifest(file1.filename, file2.filename, new_manifest)
 
         # Calculate summary
         total_columns = sum(sheet["total_columns"] for sheet in comparison_results["sheets"])
@@ -366,6 +796,11 @@ def compare_excel_stats(file1, file2):
         different_columns = sum(sheet["different_columns"] for sheet in comparison_results["sheets"])
         error_columns = sum(sheet["error_columns"] for sheet in comparison_results["sheets"])
         
+        # Verdicts resting on a sample, not on every row, are marked as estimates
+        if sample:
+            comparison_results["estimated"] = any(
+                "sampling" in sheet and not sheet["sampling"]["escalated"] for sheet in comparison_results["sheets"])
+
         comparison_results["summary"] = {
             "total_columns_compared": total_columns,
             "matching_columns": matching_columns,
@@ -384,4 +819,8 @@ def compare_excel_stats(file1, file2):
         error_msg = f"Critical error in comparison: {str(e)}"
         logger.error(error_msg)
         logger.error(traceback.format_exc())
-        return {"error": error_msg}
\ No newline at end of file
+        return {"error": error_msg}
+    finally:
+        # Memory maps of files on disk keep a descriptor and a mapping until closed
+        for stream in streams:
+            stream.close()
\ No newline at end of file
@@ -0,0 +1,138 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from app import config
+
+# Common resolution both sides are converted to before comparing
+DATETIME_UNIT = "datetime64[us]"
+
+
+def is_datetime_column(col, sample_size=100):
+    """True for datetime64 columns and object columns whose leading values are all dates or datetimes"""
+    if pd.api.types.is_datetime64_any_dtype(col):
+        return True
+    if col.dtype != object:
+        return False
+    sample = col.head(sample_size).dropna()
+    return len(sample) > 0 and all(isinstance(value, (datetime.date, np.datetime64)) for value in sample)
+
+
+def normalize_datetimes(col, precision=None):
+    """
+    Datetime column as a ``datetime64[us]`` array with NaT for nulls.
+
+    Timezone-aware values are converted to UTC and made naive, naive values
+    are kept as they are, and everything is rounded to ``precision`` (a
+    pandas frequency such as ``"ms"`` or ``"s"``). Excel stores datetimes as
+    floating-point days, so sub-millisecond noise would otherwise count as a
+    difference.
+    """
+    precision = config.DATETIME_PRECISION if precision is None else precision
+    if pd.api.types.is_datetime64_any_dtype(col):
+        if getattr(col.dt, "tz", None) is not None:
+            col = col.dt.tz_convert("UTC").dt.tz_localize(None)
+    else:
+        col = pd.to_datetime(col, errors="coerce", utc=True).dt.tz_localize(None)
+    if precision:
+        col = col.dt.round(precision)
+    return col.to_numpy(dtype=DATETIME_UNIT)
+
+
+def _isoformat(value):
+    return None if np.isnat(value) else pd.Timestamp(value).isoformat()
+
+
+def _count_differences(keys1, keys2, limit):
+    """Keys whose occurrence counts differ, as (key, count1, count2), capped at ``limit``"""
+    counts1 = pd.Series(keys1).value_counts(sort=False)
+    counts2 = pd.Series(keys2).value_counts(sort=False)
+    aligned = pd.concat([counts1, counts2], axis=1, keys=["file1", "file2"]).fillna(0).astype(np.int64)
+    mismatched = aligned[aligned["file1"] != aligned["file2"]].sort_index()
+    return len(mismatched), [
+        (key, int(row.file1), int(row.file2)) for key, row in mismatched.head(limit).iterrows()
+    ]
+
+
+def compare_datetime_values(values1, values2, max_value_diffs=10, max_bucket_diffs=20):
+    """
+    Compare two normalized datetime arrays without formatting them as strings.
+
+    Returns:
+        (statistics, differences, histograms). ``statistics`` has
+        count/null_count/min/max/range for both files. ``differences`` mixes
+        statistic rows (``statistic`` key) and value-count rows (``value``
+        key). ``histograms`` lists the day and month buckets whose counts differ.
+    """
+    valid1 = values1[~np.isnat(values1)]
+    valid2 = values2[~np.isnat(values2)]
+
+    def describe(values, valid):
+        if not valid.size:
+            return {"count": 0, "null_count": int(len(values)), "min": None, "max": None, "range": None}
+        low, high = valid.min(), valid.max()
+        return {
+            "count": int(valid.size),
+            "null_count": int(len(values) - valid.size),
+            "min": low,
+            "max": high,
+            "range": high - low,
+        }
+
+    summary1, summary2 = describe(values1, valid1), describe(values2, valid2)
+    statistics, differences = {}, []
+    for stat in ("count", "null_count", "min", "max", "range"):
+        v1, v2 = summary1[stat], summary2[stat]
+        statistics[stat] = {"file1": _display(v1), "file2": _display(v2)}
+        if _differs(v1, v2):
+            differences.append({
+                "statistic": stat,
+                "file1_value": _display(v1),
+                "file2_value": _display(v2),
+                "difference": _delta(v1, v2),
+            })
+
+    # Exact multiset comparison on the integer representation
+    differing_values, value_rows = _count_differences(valid1.view(np.int64), valid2.view(np.int64), max_value_diffs)
+    for key, count1, count2 in value_rows:
+        differences.append({
+            "value": _isoformat(np.int64(key).astype(DATETIME_UNIT)),
+            "file1_count": count1,
+            "file2_count": count2,
+        })
+
+    histograms = {"differing_values": differing_values}
+    for granularity, unit in (("day", "datetime64[D]"), ("month", "datetime64[M]")):
+        total, rows = _count_differences(valid1.astype(unit).view(np.int64), valid2.astype(unit).view(np.int64),
+                                         max_bucket_diffs)
+        histograms[granularity] = {
+            "differing_buckets": total,
+            "buckets": [{"period": str(np.int64(key).astype(unit)), "file1": count1, "file2": count2}
+                        for key, count1, count2 in rows],
+        }
+    return statistics, differences, histograms
+
+
+def _differs(v1, v2):
+    if v1 is None or v2 is None:
+        return (v1 is None) != (v2 is None)
+    return v1 != v2
+
+
+def _display(value):
+    if value is None:
+        return None
+    if isinstance(value, np.datetime64):
+        return _isoformat(value)
+    if isinstance(value, np.timedelta64):
+        return str(pd.Timedelta(value))
+    return value
+
+
+def _delta(v1, v2):
+    if v1 is None or v2 is None:
+        return "missing"
+    if isinstance(v1, (np.datetime64, np.timedelta64)):
+        return str(pd.Timedelta(v2 - v1))
+    return v2 - v1
@@ -0,0 +1,391 @@
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+from app import config
+from app.services.verdict import results_verdict
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL UNIQUE,
+    file1 TEXT NOT NULL,
+    file2 TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    verdict TEXT NOT NULL,
+    total_columns INTEGER,
+    matching_columns INTEGER,
+    different_columns INTEGER,
+    error_columns INTEGER
+);
+CREATE INDEX IF NOT EXISTS runs_files ON runs (file1, file2, created_at);
+CREATE INDEX IF NOT EXISTS runs_created_at ON runs (created_at);
+
+CREATE TABLE IF NOT EXISTS sheets (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    sheet_name TEXT NOT NULL,
+    status TEXT,
+    total_columns INTEGER,
+    matching_columns INTEGER,
+    different_columns INTEGER,
+    error_columns INTEGER
+);
+CREATE INDEX IF NOT EXISTS sheets_run ON sheets (run_id);
+CREATE INDEX IF NOT EXISTS sheets_name ON sheets (sheet_name, run_id);
+
+CREATE TABLE IF NOT EXISTS columns (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    sheet_name TEXT NOT NULL,
+    column_name TEXT NOT NULL,
+    type TEXT,
+    status TEXT,
+    difference_count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS columns_name ON columns (sheet_name, column_name, run_id);
+CREATE INDEX IF NOT EXISTS columns_run ON columns (run_id);
+
+CREATE TABLE IF NOT EXISTS statistics (
+    column_id INTEGER NOT NULL REFERENCES columns (id) ON DELETE CASCADE,
+    statistic TEXT NOT NULL,
+    file1_value,
+    file2_value
+);
+CREATE INDEX IF NOT EXISTS statistics_column ON statistics (column_id, statistic);
+
+CREATE TABLE IF NOT EXISTS differences (
+    column_id INTEGER NOT NULL REFERENCES columns (id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    key TEXT,
+    file1_value,
+    file2_value
+);
+CREATE INDEX IF NOT EXISTS differences_column ON differences (column_id);
+"""
+
+
+def _scalar(value):
+    """Values SQLite can store as they are; anything else as text"""
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+    return str(value)
+
+
+class HistoryStore:
+    """
+    Every comparison result, normalized into runs, sheets, columns,
+    statistics and differences.
+
+    Trend and drift questions ("which columns of Sales_Data changed status
+    over the last 30 runs") become indexed queries instead of opening
+    every JSON report. Sheet and column names are repeated on the column
+    rows so those lookups need no join.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        with self._init_lock:
+            if not self._initialized:
+                conn.executescript(_SCHEMA)
+                self._initialized = True
+        return conn
+
+    def record(self, source, results, created_at=None):
+        """
+        Store one unformatted ``compare_excel_stats`` result.
+
+        Args:
+            source: Unique name of the run (job id or report path); a source already stored is skipped
+            results: Comparison results, before ``format_comparison_results``
+            created_at: Epoch seconds; defaults to now
+
+        Returns:
+            The run id, or None when the source was already recorded
+        """
+        created_at = time.time() if created_at is None else created_at
+        summary = results.get("summary", {})
+
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO runs (source, file1, file2, created_at, verdict, total_columns, "
+                "matching_columns, different_columns, error_columns) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (source, results.get("file1_name", ""), results.get("file2_name", ""), created_at,
+                 results_verdict(results), summary.get("total_columns_compared"), summary.get("matching_columns"),
+                 summary.get("different_columns"), summary.get("error_columns")),
+            )
+            if not cursor.rowcount:
+                return None
+            run_id = cursor.lastrowid
+
+            for sheet in results.get("sheets", []):
+                sheet_name = sheet.get("sheet_name")
+                conn.execute(
+                    "INSERT INTO sheets (run_id, sheet_name, status, total_columns, matching_columns, "
+                    "different_columns, error_columns) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (run_id, sheet_name, sheet.get("status"), sheet.get("total_columns"),
+                     sheet.get("matching_columns"), sheet.get("different_columns"), sheet.get("error_columns")),
+                )
+                for column in sheet.get("columns", []):
+                    differences = column.get("differences") or []
+                    column_id = conn.execute(
+                        "INSERT INTO columns (run_id, sheet_name, column_name, type, status, difference_count) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (run_id, sheet_name, str(column.get("name")), column.get("type"), column.get("status"),
+                         len(differences)),
+                    ).lastrowid
+                    conn.executemany(
+                        "INSERT INTO statistics (column_id, statistic, file1_value, file2_value) VALUES (?, ?, ?, ?)",
+                        [(column_id, stat, _scalar(values.get("file1")), _scalar(values.get("file2")))
+                         for stat, values in (column.get("statistics") or {}).items()],
+                    )
+                    conn.executemany(
+                        "INSERT INTO differences (column_id, kind, key, file1_value, file2_value) VALUES (?, ?, ?, ?, ?)",
+                        [_difference_row(column_id, diff) for diff in differences],
+                    )
+        return run_id
+
+    def runs(self, file1=None, file2=None, limit=50):
+        """Most recent runs, optionally for one pair of file names"""
+        clauses, params = _file_filter(file1, file2)
+        rows = self._connect().execute(
+            f"SELECT * FROM runs {clauses} ORDER BY created_at DESC, id DESC LIMIT ?", (*params, limit)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def trend(self, sheet, column, file1=None, file2=None, statistic=None, limit=30):
+        """
+        Status and statistics of one column across its most recent runs, oldest first.
+
+        Returns:
+            List of ``{"run_id", "created_at", "file1", "file2", "status",
+            "difference_count", "statistics": {stat: {"file1", "file2"}}}``
+        """
+        clauses, params = _file_filter(file1, file2, prefix="AND")
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT c.id, c.run_id, c.status, c.difference_count, r.created_at, r.file1, r.file2 "
+            "FROM columns c JOIN runs r ON r.id = c.run_id "
+            f"WHERE c.sheet_name = ? AND c.column_name = ? {clauses} ORDER BY r.created_at DESC, r.id DESC LIMIT ?",
+            (sheet, column, *params, limit),
+        ).fetchall()
+
+        points = {row["id"]: {
+            "run_id": row["run_id"],
+            "created_at": row["created_at"],
+            "file1": row["file1"],
+            "file2": row["file2"],
+            "status": row["status"],
+            "difference_count": row["difference_count"],
+            "statistics": {},
+        } for row in rows}
+        if points:
+            stat_clause = "AND statistic = ?" if statistic else ""
+            placeholders = ",".join("?" * len(points))
+            for row in conn.execute(
+                f"SELECT column_id, statistic, file1_value, file2_value FROM statistics "
+                f"WHERE column_id IN ({placeholders}) {stat_clause}",
+                (*points, *([statistic] if statistic else [])),
+            ):
+                points[row["column_id"]]["statistics"][row["statistic"]] = {
+                    "file1": row["file1_value"], "file2": row["file2_value"],
+                }
+        return list(reversed(points.values()))
+
+    def drift(self, sheet, file1=None, file2=None, runs=30):
+        """
+        Columns of ``sheet`` that differed or changed status within the last ``runs`` runs.
+
+        Returns:
+            One entry per column with the runs seen, how many of them differed,
+            how often the status changed and the latest status, most drifted first
+        """
+        clauses, params = _file_filter(file1, file2, prefix="AND")
+        conn = self._connect()
+        run_ids = [row["id"] for row in conn.execute(
+            "SELECT DISTINCT r.id, r.created_at FROM runs r JOIN sheets s ON s.run_id = r.id "
+            f"WHERE s.sheet_name = ? {clauses} ORDER BY r.created_at DESC, r.id DESC LIMIT ?",
+            (sheet, *params, runs),
+        )]
+        if not run_ids:
+            return []
+
+        placeholders = ",".join("?" * len(run_ids))
+        history = {}
+        for row in conn.execute(
+            "SELECT c.column_name, c.status, c.difference_count, r.created_at FROM columns c "
+            "JOIN runs r ON r.id = c.run_id "
+            f"WHERE c.sheet_name = ? AND c.run_id IN ({placeholders}) ORDER BY r.created_at, r.id",
+            (sheet, *run_ids),
+        ):
+            history.setdefault(row["column_name"], []).append(row)
+
+        report = []
+        for column, rows in history.items():
+            statuses = [row["status"] for row in rows]
+            different = [row for row in rows if row["status"] == "different"]
+            changes = sum(1 for before, after in zip(statuses, statuses[1:]) if before != after)
+            if not different and not changes:
+                continue
+            report.append({
+                "column": column,
+                "runs": len(rows),
+                "different_runs": len(different),
+                "status_changes": changes,
+                "last_status": statuses[-1],
+                "last_different_at": different[-1]["created_at"] if different else None,
+            })
+        report.sort(key=lambda entry: (-entry["different_runs"], -entry["status_changes"], entry["column"]))
+        return report
+
+    def backfill(self, paths):
+        """
+        Import JSON reports written before the history store existed.
+
+        ``paths`` may be report files or directories searched recursively;
+        formatted reports and batch summaries are skipped, and reports
+        already imported (by path) are not imported twice. With no paths,
+        the JSON reports in the report store and the older report files
+        in ``REPORT_FOLDER`` (outside the store's ``objects/`` and
+        ``staging/``) are imported.
+
+        Returns:
+            (imported, skipped) counts
+        """
+        imported = skipped = 0
+        for source, path, created_at in _report_files(paths):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    results = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping {path}: {str(e)}")
+                skipped += 1
+                continue
+            if not isinstance(results, dict) or "sheets" not in results:
+                skipped += 1
+                continue
+            if created_at is None:
+                created_at = _comparison_time(results, path)
+            if self.record(source, results, created_at) is None:
+                skipped += 1
+            else:
+                imported += 1
+        return imported, skipped
+
+
+def _file_filter(file1, file2, prefix="WHERE"):
+    conditions, params = [], []
+    for name, value in (("file1", file1), ("file2", file2)):
+        if value:
+            conditions.append(f"r.{name} = ?" if prefix == "AND" else f"{name} = ?")
+            params.append(value)
+    if not conditions:
+        return "", params
+    return f"{prefix} " + " AND ".join(conditions), params
+
+
+def _comparison_time(results, path):
+    try:
+        return datetime.strptime(results["comparison_time"], "%Y-%m-%d %H:%M:%S").timestamp()
+    except (KeyError, TypeError, ValueError):
+        return os.path.getmtime(path)
+
+
+def _difference_row(column_id, diff):
+    if "statistic" in diff:
+        return (column_id, "statistic", diff["statistic"], _scalar(diff.get("file1_value")),
+                _scalar(diff.get("file2_value")))
+    return (column_id, "value", _scalar(diff.get("value")), _scalar(diff.get("file1_count")),
+            _scalar(diff.get("file2_count")))
+
+
+def _report_files(paths):
+    """
+    (source, path, created_at) for each JSON report under ``paths``; by
+    default, the report store's JSON reports and the legacy report files
+    in ``REPORT_FOLDER``
+    """
+    if paths:
+        for path in paths:
+            yield from _json_report_files(path)
+        return
+
+    from app.services.report_store import report_store
+
+    for row in report_store.reports(".json"):
+        resolved = report_store.resolve(row["id"])
+        if resolved:
+            # Same source as the live record of the job, so runs are not imported twice
+            yield row["id"][:-len(".json")], resolved[0], row["created_at"]
+    # Blobs and half-written files of the report store are not report files
+    store_dirs = {os.path.abspath(report_store.objects_dir), os.path.abspath(report_store.staging_dir)}
+    yield from _json_report_files(config.REPORT_FOLDER, exclude_dirs=store_dirs)
+
+
+def _json_report_files(path, exclude_dirs=()):
+    if os.path.isdir(path):
+        files = []
+        for root, dirs, names in os.walk(path):
+            dirs[:] = sorted(name for name in dirs if os.path.abspath(os.path.join(root, name)) not in exclude_dirs)
+            files.extend(os.path.join(root, name) for name in sorted(names))
+    else:
+        files = [path]
+    for file_path in files:
+        name = os.path.basename(file_path)
+        if not name.endswith(".json") or name.endswith(".formatted.json") or name == "summary.json":
+            continue
+        yield os.path.abspath(file_path), file_path, None
+
+
+def record_results(source, results):
+    """Record a run in the history store if enabled; failures are logged, never raised"""
+    if not config.HISTORY:
+        return None
+    try:
+        return history_store.record(source, results)
+    except Exception as e:
+        logger.warning(f"Could not record {source} in the history store: {str(e)}")
+        return None
+
+
+history_store = HistoryStore(config.HISTORY_DB_PATH)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Comparison history store maintenance")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    backfill = subcommands.add_parser("backfill", help="Import existing JSON reports")
+    backfill.add_argument("paths", nargs="*", help="Report files or directories (default: the report store and REPORT_FOLDER)")
+    args = parser.parse_args(argv)
+
+    if args.command == "backfill":
+        imported, skipped = history_store.backfill(args.paths)
+        print(f"Imported {imported} reports into {history_store.path} ({skipped} skipped)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
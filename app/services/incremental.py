@@ -0,0 +1,90 @@
+import logging
+import posixpath
+import xml.etree.ElementTree as ET
+import zipfile
+
+from app.services.cache import cache_key, load_json, store_json
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAMESPACE = "manifests"
+
+_MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_PKG_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+# Parts every sheet depends on: shared string table and number formats (dates)
+SHARED_PARTS = ("xl/sharedStrings.xml", "xl/styles.xml")
+
+
+def read_sheet_fingerprints(stream):
+    """
+    Map each sheet name to the CRC-32 and size of its worksheet part.
+
+    Only the zip central directory and the small workbook/relationship parts
+    are read. The CRCs of the shared strings and styles parts are folded into
+    every sheet's fingerprint, since a change there can change any sheet's
+    values. Returns None for files that are not xlsx zip packages.
+    """
+    position = stream.tell()
+    try:
+        stream.seek(0)
+        with zipfile.ZipFile(stream) as archive:
+            infos = {info.filename: info for info in archive.infolist()}
+            workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+            rels = ET.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    except (zipfile.BadZipFile, KeyError, ET.ParseError):
+        return None
+    finally:
+        stream.seek(position)
+
+    targets = {}
+    for rel in rels.iter(f"{_PKG_REL_NS}Relationship"):
+        target = rel.get("Target", "")
+        # Targets are relative to xl/ unless absolute
+        part = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+        targets[rel.get("Id")] = part
+
+    shared = [
+        [name, infos[name].CRC, infos[name].file_size] if name in infos else [name, None, None]
+        for name in SHARED_PARTS
+    ]
+
+    fingerprints = {}
+    for sheet in workbook.iter(f"{_MAIN_NS}sheet"):
+        part = targets.get(sheet.get(f"{_REL_NS}id"))
+        info = infos.get(part)
+        if info is None:
+            continue
+        fingerprints[sheet.get("name")] = {"part": part, "crc": info.CRC, "size": info.file_size,
+                                          "shared": shared}
+    return fingerprints
+
+
+def manifest_key(file1_name, file2_name):
+    return cache_key("pair", file1_name, file2_name)
+
+
+def load_manifest(file1_name, file2_name):
+    return load_json(MANIFEST_NAMESPACE, manifest_key(file1_name, file2_name))
+
+
+def store_manifest(file1_name, file2_name, manifest):
+    try:
+        store_json(MANIFEST_NAMESPACE, manifest_key(file1_name, file2_name), manifest)
+    except OSError as e:
+        logger.warning(f"Could not store comparison manifest: {str(e)}")
+
+
+def reusable_sheet_result(manifest, sheet, fingerprint1, fingerprint2, options):
+    """Return the cached result for ``sheet`` if neither side's parts changed since it was stored"""
+    if not manifest or fingerprint1 is None or fingerprint2 is None:
+        return None
+    if manifest.get("options") != options:
+        return None
+    entry = manifest.get("sheets", {}).get(sheet)
+    if not entry:
+        return None
+    if entry.get("file1") != fingerprint1 or entry.get("file2") != fingerprint2:
+        return None
+    return entry.get("result")
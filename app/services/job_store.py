@@ -0,0 +1,87 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from app import config
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    pair TEXT NOT NULL,
+    worker_pid INTEGER,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    reports TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_created_at ON jobs (created_at);
+"""
+
+
+class JobStore:
+    """
+    Record of comparison jobs in SQLite, shared by every worker process.
+
+    WAL mode lets readers proceed while one process writes, and the busy
+    timeout makes concurrent writers wait for the lock instead of failing.
+    Each thread gets its own connection.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        with self._init_lock:
+            if not self._initialized:
+                conn.executescript(_SCHEMA)
+                self._initialized = True
+        return conn
+
+    def create(self, pair):
+        job_id = uuid.uuid4().hex
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, pair, worker_pid, created_at, started_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, "running", pair, os.getpid(), time.time(), time.time()),
+            )
+        return job_id
+
+    def finish(self, job_id, reports=None, error=None):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, reports = ?, error = ? WHERE id = ?",
+                ("failed" if error else "done", time.time(), json.dumps(reports or {}), error, job_id),
+            )
+
+    def get(self, job_id):
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["reports"] = json.loads(job["reports"]) if job["reports"] else {}
+        return job
+
+    def recent(self, limit=50):
+        rows = self._connect().execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(row, reports=json.loads(row["reports"]) if row["reports"] else {}) for row in rows]
+
+
+job_store = JobStore(config.JOB_DB_PATH)
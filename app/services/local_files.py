@@ -0,0 +1,108 @@
+import io
+import mmap
+import os
+from io import BytesIO
+
+ALLOWED_EXT = {".xls", ".xlsx"}
+
+
+def allowed_filename(filename):
+    _, ext = os.path.splitext(filename.lower())
+    return ext in ALLOWED_EXT
+
+
+class PathNotAllowed(Exception):
+    """Raised when a requested server-side path is outside the configured roots"""
+
+
+def resolve_allowed_path(path, allowed_roots):
+    """
+    Resolve ``path`` (following symlinks) and make sure it is a file inside
+    one of ``allowed_roots``. Relative paths are resolved against each root.
+    """
+    if not allowed_roots:
+        raise PathNotAllowed("Server-side paths are disabled: no allowed roots configured")
+
+    candidates = [path] if os.path.isabs(path) else [os.path.join(root, path) for root in allowed_roots]
+    for candidate in candidates:
+        resolved = os.path.realpath(candidate)
+        for root in allowed_roots:
+            try:
+                inside = os.path.commonpath([resolved, root]) == root
+            except ValueError:  # different drives on Windows
+                inside = False
+            if inside and os.path.isfile(resolved):
+                return resolved
+    raise PathNotAllowed(f"'{path}' is not a file under the allowed roots")
+
+
+class MappedStream(io.RawIOBase):
+    """File-like, seekable view over an ``mmap`` so zipfile/openpyxl can read it without a copy"""
+
+    def __init__(self, mapped):
+        super().__init__()
+        self._mapped = mapped
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def read(self, size=-1):
+        return self._mapped.read(None if size is None or size < 0 else size)
+
+    def readinto(self, buffer):
+        data = self._mapped.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        self._mapped.seek(offset, whence)
+        return self._mapped.tell()
+
+    def tell(self):
+        return self._mapped.tell()
+
+    def close(self):
+        if not self.closed:
+            self._mapped.close()
+        super().close()
+
+
+class LocalFile:
+    """Wrap a workbook on disk so it can be passed where an upload is expected.
+
+    ``compare_excel_stats`` only needs ``filename`` and ``read()`` from the
+    Flask ``FileStorage`` objects it receives, so scripts and batch jobs can
+    hand it one of these instead. ``open_stream()`` maps the file into memory
+    rather than copying it into a buffer.
+    """
+
+    def __init__(self, path, filename=None):
+        self.path = path
+        self.filename = filename or os.path.basename(path)
+
+    def read(self):
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def open_stream(self):
+        """
+        Read-only, seekable view of the file backed by mmap (pages are loaded
+        on demand). The caller closes it, which releases the descriptor and
+        the mapping.
+        """
+        with open(self.path, "rb") as f:
+            try:
+                return MappedStream(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            except ValueError:  # empty files cannot be mapped
+                return BytesIO(b"")
+
+    def stat_key(self):
+        """(mtime_ns, size) of the file, used to validate cached results"""
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def __repr__(self):
+        return f"LocalFile({self.path!r})"
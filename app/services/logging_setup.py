@@ -0,0 +1,223 @@
+import atexit
+import contextlib
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import socketserver
+import struct
+import threading
+from datetime import datetime, timezone
+
+from app import config
+
+_configured = False
+_listener = None
+_queue_handler = None
+_log_server = None
+_log_server_lock = threading.Lock()
+
+# "pid:port" of the process that owns logs/comparison.log; inherited by forked and spawned children
+_LOG_SERVER_ENV = "EXCEL_COMPARE_LOG_SERVER"
+
+# Fields such as request_id and job_id attached to every record logged in the current context
+_log_context = contextvars.ContextVar("log_context", default={})
+
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+@contextlib.contextmanager
+def log_context(**fields):
+    """Attach ``fields`` to every log record emitted inside the block (and in threads started from it)"""
+    token = bind_log_context(**fields)
+    try:
+        yield
+    finally:
+        reset_log_context(token)
+
+
+def bind_log_context(**fields):
+    """Like ``log_context`` for code that cannot wrap a block; pass the token to ``reset_log_context``"""
+    return _log_context.set({**_log_context.get(), **fields})
+
+
+def reset_log_context(token):
+    _log_context.reset(token)
+
+
+def current_log_context():
+    return dict(_log_context.get())
+
+
+def sampled(rate=None):
+    """True for roughly ``rate`` of calls; used to thin out per-column debug records"""
+    rate = config.LOG_DEBUG_SAMPLE_RATE if rate is None else rate
+    return rate >= 1 or random.random() < rate
+
+
+class _ContextFilter(logging.Filter):
+    # Runs on the calling thread, before the record is queued, so the context is still visible
+    def filter(self, record):
+        for key, value in _log_context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the message, level, origin and any context fields"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "pid": record.process,
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _ForwardingHandler(logging.handlers.SocketHandler):
+    """Sends records to the log server of the owning process as length-prefixed JSON"""
+
+    def makePickle(self, record):
+        # JSON rather than the default pickle, so the server never unpickles what a local client sends
+        entry = dict(vars(record), msg=record.getMessage(), args=None, exc_info=None)
+        data = json.dumps(entry, default=str).encode("utf-8")
+        return struct.pack(">L", len(data)) + data
+
+
+class _LogRecordReceiver(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            header = self.rfile.read(4)
+            if len(header) < 4:
+                return
+            entry = json.loads(self.rfile.read(struct.unpack(">L", header)[0]))
+            # Already filtered by the child's level; straight to this process's listener
+            _queue_handler.queue.put(logging.makeLogRecord(entry))
+
+
+def _start_log_server():
+    """Accept records from child processes on a loopback port and advertise it to them"""
+    global _log_server
+    _log_server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _LogRecordReceiver)
+    _log_server.daemon_threads = True
+    threading.Thread(target=_log_server.serve_forever, name="log-server", daemon=True).start()
+    os.environ[_LOG_SERVER_ENV] = f"{os.getpid()}:{_log_server.server_address[1]}"
+
+
+def serve_child_logs():
+    """
+    Have child processes started after this call send their records to this
+    process instead of opening the log file themselves. Call it just before
+    forking or spawning workers; a process that never starts any keeps the
+    plain queue and listener and opens no port.
+    """
+    configure_logging()
+    with _log_server_lock:
+        if _log_server is None and _parent_log_port() is None:
+            _start_log_server()
+
+
+def _parent_log_port():
+    """Port of the owning process's log server, or None when this process owns the log file"""
+    owner, _, port = os.environ.get(_LOG_SERVER_ENV, "").partition(":")
+    if not port or owner == str(os.getpid()):
+        return None
+    return int(port)
+
+
+def _build_handlers():
+    port = _parent_log_port()
+    if port is not None:
+        # Only the owning process writes and rotates the file; children forward to it
+        return [_ForwardingHandler("127.0.0.1", port)]
+
+    handlers = []
+    if config.LOG_MAX_BYTES > 0:
+        file_handler = logging.handlers.RotatingFileHandler(
+            os.path.join(config.LOGS_DIR, "comparison.log"),
+            maxBytes=config.LOG_MAX_BYTES, backupCount=config.LOG_BACKUP_COUNT, encoding="utf-8",
+        )
+    else:
+        file_handler = logging.FileHandler(os.path.join(config.LOGS_DIR, "comparison.log"), encoding="utf-8")
+    file_handler.setFormatter(JsonFormatter())
+    handlers.append(file_handler)
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    handlers.append(console_handler)
+    return handlers
+
+
+def _start_listener():
+    global _listener
+    log_queue = queue.SimpleQueue()
+    _queue_handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, *_build_handlers(), respect_handler_level=True)
+    _listener.start()
+
+
+def _restart_after_fork():
+    # The listener and server threads do not survive fork; the child gets its own queue and thread,
+    # which forward to the parent instead of opening the log file again
+    global _log_server
+    if _listener is not None:
+        for handler in _listener.handlers:
+            handler.close()
+        if _log_server is not None:
+            _log_server.socket.close()
+            _log_server = None
+        _start_listener()
+
+
+def stop_logging():
+    """Flush queued records and stop the listener and log server threads"""
+    if _log_server is not None:
+        _log_server.shutdown()
+        _log_server.server_close()
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+
+def configure_logging():
+    """
+    Set up logging once, however many entry points ask for it.
+
+    Records are put on a queue by the calling thread and written by a
+    listener thread, so comparisons never wait on disk or console I/O.
+    ``logs/comparison.log`` gets JSON lines (rotated by size) and the console
+    keeps the readable one-line format.
+
+    Processes that start workers (production serving, column and CLI
+    pools) call ``serve_child_logs`` first: they then serve a loopback port
+    and the processes they fork or spawn send their records there, so a
+    single process writes and rotates the file.
+    """
+    global _configured, _queue_handler
+    if _configured:
+        return
+    os.makedirs(config.LOGS_DIR, exist_ok=True)
+
+    _queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+    _queue_handler.addFilter(_ContextFilter())
+    root = logging.getLogger()
+    root.setLevel(config.LOG_LEVEL)
+    root.addHandler(_queue_handler)
+    _start_listener()
+
+    atexit.register(stop_logging)
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=_restart_after_fork)
+    _configured = True
@@ -0,0 +1,133 @@
+import hashlib
+import itertools
+import logging
+from io import BytesIO
+
+import pandas as pd
+
+from app.services.compare_logic import compare_excel_stats, read_sheet_header, safe_parse_excel_from_memory
+from app.services.metrics import span
+from app.services.verdict import results_verdict
+
+logger = logging.getLogger(__name__)
+
+PAIRING_MODES = ("cross", "all-vs-all")
+
+
+class SharedWorkbook:
+    """
+    A workbook opened once for matrix mode.
+
+    Sheet headers, parsed sheets and per-column statistics (numeric
+    summaries, value counts, normalized datetimes) are cached on first use,
+    so a workbook that appears in many pairs is read, parsed and summarised
+    exactly once.
+    ``compare_excel_stats`` accepts these in place of uploads.
+    """
+
+    def __init__(self, data, filename, content_hash=None):
+        self.filename = filename
+        self.filenames = [filename]
+        self.content_hash = content_hash or hashlib.sha256(data).hexdigest()
+        self.size = len(data)
+        self._data = data
+        self.excel_file = pd.ExcelFile(BytesIO(data), engine="openpyxl")
+        self.sheet_names = self.excel_file.sheet_names
+        self._headers = {}
+        self._frames = {}
+        self._column_stats = {}
+
+    @property
+    def stream(self):
+        return BytesIO(self._data)
+
+    def header(self, sheet):
+        if sheet not in self._headers:
+            self._headers[sheet] = read_sheet_header(self.excel_file, sheet)
+        return self._headers[sheet]
+
+    def frame(self, sheet):
+        # Parsed in full: other pairs may need columns this pair does not share
+        if sheet not in self._frames:
+            with span("sheet_parse_shared", sheet=sheet):
+                self._frames[sheet] = safe_parse_excel_from_memory(self.excel_file, sheet)
+        return self._frames[sheet]
+
+    def column_stats(self, sheet):
+        """Statistics cache of ``sheet``'s full frame: column name -> {kind: value}"""
+        return self._column_stats.setdefault(sheet, {})
+
+    def summary(self):
+        return {
+            "id": self.content_hash[:12],
+            "filenames": self.filenames,
+            "bytes": self.size,
+            "sheets": self.sheet_names,
+            "sheets_parsed": len(self._frames),
+        }
+
+
+def load_shared_workbooks(uploads, registry=None):
+    """
+    Open each distinct upload once.
+
+    Args:
+        uploads: Objects with ``filename`` and ``read()`` (Flask uploads or ``LocalFile``)
+        registry: Dict of content hash to ``SharedWorkbook`` shared between calls
+
+    Returns:
+        One ``SharedWorkbook`` per upload, in order; identical contents share an object
+    """
+    registry = {} if registry is None else registry
+    workbooks = []
+    for upload in uploads:
+        # Chunked uploads were hashed as they arrived
+        content_hash = getattr(upload, "sha256", None)
+        workbook = registry.get(content_hash) if content_hash else None
+        if workbook is None:
+            data = upload.read()
+            content_hash = content_hash or hashlib.sha256(data).hexdigest()
+            workbook = registry.get(content_hash)
+        if workbook is None:
+            workbook = registry[content_hash] = SharedWorkbook(data, upload.filename, content_hash)
+        elif upload.filename not in workbook.filenames:
+            workbook.filenames.append(upload.filename)
+            logger.info(f"{upload.filename} is identical to {workbook.filename}; reusing it")
+        workbooks.append(workbook)
+    return workbooks
+
+
+def plan_pairs(mode, actual, expected=None):
+    """
+    Index pairs to compare.
+
+    ``cross`` compares every actual against every expected, which covers
+    one-vs-many when either side has a single file. ``all-vs-all``
+    compares every unordered pair of ``actual``.
+    """
+    if mode == "cross":
+        return [(i, j) for i in range(len(actual)) for j in range(len(expected or []))]
+    if mode == "all-vs-all":
+        return list(itertools.combinations(range(len(actual)), 2))
+    raise ValueError(f"Unknown pairing mode '{mode}'; expected one of {', '.join(PAIRING_MODES)}")
+
+
+def grid_cell(results):
+    """Verdict and counts for one matrix cell, from unformatted comparison results"""
+    summary = results.get("summary", {})
+    return {
+        "verdict": results_verdict(results),
+        "error": results.get("error"),
+        "matching_columns": summary.get("matching_columns", 0),
+        "different_columns": summary.get("different_columns", 0),
+        "error_columns": summary.get("error_columns", 0),
+    }
+
+
+def recording_compare(cells, **options):
+    """``compare_excel_stats`` that also stores each pair's grid cell before results are formatted"""
+    def compare(workbook1, workbook2):
+        results = compare_excel_stats(workbook1, workbook2, **options)
+        cells[(id(workbook1), id(workbook2))] = grid_cell(results)
+        return results
+    return compare
@@ -0,0 +1,324 @@
+import contextvars
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from sub-millisecond column checks up to multi-minute workbooks
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+PHASE_METRIC = "excel_compare_phase_duration_seconds"
+
+
+def _label_key(labels):
+    return tuple(sorted((labels or {}).items()))
+
+
+def _format_labels(key, extra=None):
+    items = list(key) + list(extra or [])
+    if not items:
+        return ""
+    escaped = []
+    for name, value in items:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        escaped.append(f'{name}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    """Thread-safe in-process store for counters, gauges and histograms.
+
+    Rendered in the Prometheus text exposition format by ``render()``.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self._lock = threading.Lock()
+        self._buckets = tuple(buckets)
+        self._help = {}
+        self._types = {}
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+
+    def _register(self, name, metric_type, help_text):
+        known = self._types.setdefault(name, metric_type)
+        if known != metric_type:
+            raise ValueError(f"Metric {name} already registered as {known}")
+        if help_text:
+            self._help.setdefault(name, help_text)
+
+    def inc(self, name, value=1, labels=None, help_text=None):
+        with self._lock:
+            self._register(name, "counter", help_text)
+            series = self._counters.setdefault(name, {})
+            key = _label_key(labels)
+            series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name, value, labels=None, help_text=None):
+        with self._lock:
+            self._register(name, "gauge", help_text)
+            self._gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def observe(self, name, value, labels=None, help_text=None):
+        with self._lock:
+            self._register(name, "histogram", help_text)
+            series = self._histograms.setdefault(name, {})
+            key = _label_key(labels)
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = {"buckets": [0] * len(self._buckets), "sum": 0.0, "count": 0}
+            for idx, bound in enumerate(self._buckets):
+                if value <= bound:
+                    hist["buckets"][idx] += 1
+            hist["sum"] += value
+            hist["count"] += 1
+
+    def render(self):
+        """Return all metrics in Prometheus text format (version 0.0.4)"""
+        lines = []
+        with self._lock:
+            for name in sorted(self._types):
+                metric_type = self._types[name]
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                if metric_type == "counter":
+                    for key, value in sorted(self._counters.get(name, {}).items()):
+                        lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+                elif metric_type == "gauge":
+                    for key, value in sorted(self._gauges.get(name, {}).items()):
+                        lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+                else:
+                    for key, hist in sorted(self._histograms.get(name, {}).items()):
+                        for bound, count in zip(self._buckets, hist["buckets"]):
+                            lines.append(f"{name}_bucket{_format_labels(key, [('le', _format_value(bound))])} {count}")
+                        lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {hist['count']}")
+                        lines.append(f"{name}_sum{_format_labels(key)} {_format_value(hist['sum'])}")
+                        lines.append(f"{name}_count{_format_labels(key)} {hist['count']}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """JSON-serializable copy of every series, for ``merge`` in another process"""
+        def series(store):
+            return {name: [[list(map(list, key)), value] for key, value in values.items()]
+                    for name, values in store.items()}
+
+        with self._lock:
+            return {
+                "help": dict(self._help),
+                "types": dict(self._types),
+                "buckets": list(self._buckets),
+                "counters": series(self._counters),
+                "gauges": series(self._gauges),
+                "histograms": series(self._histograms),
+            }
+
+    def merge(self, snapshot, worker=None, gauges=True):
+        """
+        Add another registry's ``snapshot``: counters and histograms are
+        summed, and gauges are kept per process under a ``worker`` label.
+        """
+        with self._lock:
+            for name, metric_type in snapshot["types"].items():
+                self._register(name, metric_type, snapshot["help"].get(name))
+            for name, values in snapshot["counters"].items():
+                series = self._counters.setdefault(name, {})
+                for key, value in values:
+                    key = tuple(map(tuple, key))
+                    series[key] = series.get(key, 0) + value
+            if gauges:
+                for name, values in snapshot["gauges"].items():
+                    series = self._gauges.setdefault(name, {})
+                    for key, value in values:
+                        labels = dict(map(tuple, key))
+                        if worker is not None:
+                            labels["worker"] = worker
+                        series[_label_key(labels)] = value
+            if tuple(snapshot["buckets"]) != self._buckets:
+                logger.warning("Skipping histograms with different buckets")
+                return
+            for name, values in snapshot["histograms"].items():
+                series = self._histograms.setdefault(name, {})
+                for key, other in values:
+                    key = tuple(map(tuple, key))
+                    hist = series.get(key)
+                    if hist is None:
+                        hist = series[key] = {"buckets": [0] * len(self._buckets), "sum": 0.0, "count": 0}
+                    hist["buckets"] = [count + added for count, added in zip(hist["buckets"], other["buckets"])]
+                    hist["sum"] += other["sum"]
+                    hist["count"] += other["count"]
+
+    def clear_totals(self):
+        """Drop counters and histograms, keeping gauges; a forked worker starts its totals from zero"""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+REGISTRY = MetricsRegistry()
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+class SharedMetrics:
+    """
+    Latest ``REGISTRY`` snapshot of every production worker, in SQLite.
+
+    Forked workers each have their own registry, so a scrape answered by
+    one of them would otherwise see only that worker's series. Each worker
+    publishes its snapshot every ``interval`` seconds and before rendering.
+    ``render`` sums counters and histograms over every snapshot, including
+    workers that have exited, so totals never go down while the server
+    runs. Gauges are shown per live process with a ``worker`` label.
+    """
+
+    def __init__(self, path, registry=None, interval=5.0):
+        self.path = path
+        self.registry = registry or REGISTRY
+        self.interval = interval
+
+    def _connect(self):
+        # A connection per call: publishing is infrequent and connections must not cross a fork
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS snapshots "
+                     "(pid INTEGER PRIMARY KEY, updated_at REAL NOT NULL, snapshot TEXT NOT NULL)")
+        return conn
+
+    def reset(self):
+        """Forget the snapshots of an earlier server run"""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM snapshots")
+        finally:
+            conn.close()
+
+    def publish(self):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO snapshots (pid, updated_at, snapshot) VALUES (?, ?, ?)",
+                             (os.getpid(), time.time(), json.dumps(self.registry.snapshot())))
+        finally:
+            conn.close()
+
+    def start_worker(self):
+        """In a freshly forked worker: drop totals inherited from the parent and publish periodically"""
+        self.registry.clear_totals()
+
+        def publish_periodically():
+            while True:
+                try:
+                    self.publish()
+                except sqlite3.Error as e:
+                    logger.warning(f"Could not publish metrics: {str(e)}")
+                time.sleep(self.interval)
+
+        threading.Thread(target=publish_periodically, name="metrics-publisher", daemon=True).start()
+
+    def render(self):
+        self.publish()
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT pid, snapshot FROM snapshots ORDER BY pid").fetchall()
+        finally:
+            conn.close()
+        merged = MetricsRegistry(self.registry._buckets)
+        for pid, snapshot in rows:
+            merged.merge(json.loads(snapshot), worker=str(pid), gauges=_process_alive(pid))
+        return merged.render()
+
+
+_shared_metrics = None
+
+
+def share_metrics(path):
+    """
+    Aggregate metrics across the worker processes about to be forked.
+
+    Called by the parent before forking: earlier snapshots are dropped and
+    the parent's own totals (pre-warming) are published once. Each worker
+    then calls ``start_worker`` on the returned object.
+    """
+    global _shared_metrics
+    _shared_metrics = SharedMetrics(path)
+    _shared_metrics.reset()
+    _shared_metrics.publish()
+    return _shared_metrics
+
+
+def render_metrics():
+    """Prometheus text for ``/metrics``: every worker's metrics in production mode, else this process's"""
+    if _shared_metrics is not None:
+        return _shared_metrics.render()
+    return REGISTRY.render()
+
+_current_timings = contextvars.ContextVar("excel_compare_timings", default=None)
+
+
+@contextmanager
+def collect_timings():
+    """Collect every span recorded in this context into the yielded list"""
+    spans = []
+    token = _current_timings.set(spans)
+    try:
+        yield spans
+    finally:
+        _current_timings.reset(token)
+
+
+@contextmanager
+def span(phase, **attributes):
+    """
+    Time a processing phase.
+
+    The yielded dict can be updated inside the block (e.g. with row and
+    column counts once a sheet is parsed). On exit the duration is added to
+    the phase latency histogram and, when a ``collect_timings()`` block is
+    active, the span is appended to its list.
+    """
+    record = {"phase": phase, **attributes}
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record["seconds"] = round(time.perf_counter() - start, 6)
+        REGISTRY.observe(PHASE_METRIC, record["seconds"], {"phase": phase},
+                         help_text="Duration of comparison processing phases")
+        spans = _current_timings.get()
+        if spans is not None:
+            spans.append(record)
+        logger.debug(f"span {record}")
+
+
+def summarize_spans(spans):
+    """Aggregate spans into total seconds and count per phase"""
+    summary = {}
+    for record in spans:
+        phase = summary.setdefault(record["phase"], {"seconds": 0.0, "count": 0})
+        phase["seconds"] = round(phase["seconds"] + record["seconds"], 6)
+        phase["count"] += 1
+    return summary
@@ -0,0 +1,166 @@
+import re
+from collections import defaultdict
+
+from app import config
+
+# Score given to acronym matches, which share too few n-grams to be found otherwise
+ACRONYM_SCORE = 0.9
+
+_SEPARATORS = re.compile(r"[^0-9a-z]+")
+_LEADING_ZEROS = re.compile(r"\b0+(?=\d)")
+
+
+def normalize_value(value):
+    """Lowercase, separators collapsed to single spaces and leading zeros dropped ("Employee_008" -> "employee 8")"""
+    text = _SEPARATORS.sub(" ", str(value).lower()).strip()
+    return _LEADING_ZEROS.sub("", text)
+
+
+def ngrams(text, n=3):
+    padded = f"^{text}$"
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+def _initials(text):
+    words = text.split()
+    return "".join(word[0] for word in words) if len(words) >= 2 else None
+
+
+def _acronym_key(text):
+    # Short single words such as "hr" may be the initials of a multi-word value
+    return text if 2 <= len(text) <= 6 and text.isalpha() else None
+
+
+def _splits(acronym):
+    """Every way to cut ``acronym`` into two or more non-empty parts (at most 32 for six letters)"""
+    for mask in range(1, 2 ** (len(acronym) - 1)):
+        parts, start = [], 0
+        for pos in range(1, len(acronym)):
+            if mask & (1 << (pos - 1)):
+                parts.append(acronym[start:pos])
+                start = pos
+        parts.append(acronym[start:])
+        yield parts
+
+
+def _acronym_matches(acronym, side):
+    """
+    Multi-word values of ``side`` that ``acronym`` abbreviates, taking a prefix
+    of each word in order: "hr" -> "human resources", "apac" -> "asia pacific"
+    """
+    matches = []
+    for parts in _splits(acronym):
+        for idx in side.by_initials.get("".join(part[0] for part in parts), ()):
+            words = side.normalized[idx].split()
+            if all(word.startswith(part) for word, part in zip(words, parts)):
+                matches.append(idx)
+    return matches
+
+
+class _Side:
+    def __init__(self, values, n):
+        self.values = values
+        self.normalized = [normalize_value(value) for value in values]
+        self.grams = [ngrams(text, n) for text in self.normalized]
+        self.postings = defaultdict(list)
+        for idx, grams in enumerate(self.grams):
+            for gram in grams:
+                self.postings[gram].append(idx)
+        self.by_initials = defaultdict(list)
+        self.acronyms = []
+        for idx, text in enumerate(self.normalized):
+            initials = _initials(text)
+            if initials:
+                self.by_initials[initials].append(idx)
+            if _acronym_key(text):
+                self.acronyms.append(idx)
+
+
+def _candidates(query_grams, index, budget):
+    """
+    Count shared n-grams against ``index``, scanning the rarest grams first
+    and stopping once ``budget`` postings have been read. Common grams
+    (shared by most values) are then only checked for the candidates found.
+    """
+    counts = defaultdict(int)
+    scanned = 0
+    for gram in sorted(query_grams, key=lambda g: len(index.postings.get(g, ()))):
+        posting = index.postings.get(gram)
+        if not posting:
+            continue
+        if scanned and scanned + len(posting) > budget:
+            break
+        for idx in posting[:budget]:
+            counts[idx] += 1
+        scanned += len(posting)
+    return counts
+
+
+def propose_renames(only_in_file1, only_in_file2, n=3, max_values=None, candidate_budget=None,
+                    min_score=None, limit=20):
+    """
+    Pair values found only in file 1 with similar values found only in file 2.
+
+    Every value is reduced to character ``n``-grams of its normalized form and
+    file 2's values are indexed by n-gram. For each file 1 value, candidates
+    come from the rarest shared n-grams (at most ``candidate_budget`` postings)
+    and are scored by Dice similarity, so work grows with the number of values
+    rather than its square. Short all-letter values are also matched against
+    multi-word values they abbreviate with a prefix of each word ("HR" ->
+    "Human Resources", "APAC" -> "Asia Pacific"). Pairs are
+    accepted best-first so each value is used at most once.
+
+    Args:
+        only_in_file1: Values whose count is positive only in file 1
+        only_in_file2: Values whose count is positive only in file 2
+        n: n-gram length
+        max_values: At most this many values per side are considered
+        candidate_budget: Postings scanned per file 1 value
+        min_score: Lowest similarity reported (0-1)
+        limit: Number of proposals returned
+
+    Returns:
+        List of ``{"file1_value", "file2_value", "score", "method"}``, best first
+    """
+    max_values = config.NEAR_MATCH_MAX_VALUES if max_values is None else max_values
+    candidate_budget = config.NEAR_MATCH_CANDIDATE_BUDGET if candidate_budget is None else candidate_budget
+    min_score = config.NEAR_MATCH_MIN_SCORE if min_score is None else min_score
+    if not only_in_file1 or not only_in_file2:
+        return []
+
+    left = _Side(sorted(map(str, only_in_file1))[:max_values], n)
+    right = _Side(sorted(map(str, only_in_file2))[:max_values], n)
+
+    proposals = []
+    for i, query in enumerate(left.grams):
+        counts = _candidates(query, right, candidate_budget)
+        best = sorted(counts.items(), key=lambda item: -item[1])[:10]
+        for j, _ in best:
+            target = right.grams[j]
+            score = 2 * len(query & target) / (len(query) + len(target))
+            if score >= min_score:
+                proposals.append((score, "ngram", i, j))
+
+    # Either side may hold the acronym of the other's value
+    for i in left.acronyms:
+        proposals.extend((ACRONYM_SCORE, "acronym", i, j) for j in _acronym_matches(left.normalized[i], right))
+    for j in right.acronyms:
+        proposals.extend((ACRONYM_SCORE, "acronym", i, j) for i in _acronym_matches(right.normalized[j], left))
+
+    used_left, used_right, accepted = set(), set(), []
+    for score, method, i, j in sorted(proposals, key=lambda p: (-p[0], p[2], p[3])):
+        if i in used_left or j in used_right:
+            continue
+        used_left.add(i)
+        used_right.add(j)
+        accepted.append({
+            "file1_value": left.values[i],
+            "file2_value": right.values[j],
+            "score": round(score, 3),
+            "method": method,
+        })
+        if len(accepted) >= limit:
+            break
+    return accepted
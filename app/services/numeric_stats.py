@@ -0,0 +1,143 @@
+import json
+import math
+
+import numpy as np
+
+from app import config
+
+# Order in which statistics are reported and checked
+STATISTICS = ("count", "null_count", "sum", "mean", "std", "min", "p1", "p50", "p99", "max")
+EXACT_STATISTICS = {"count", "null_count"}
+# Compared with the absolute tolerance only, unless a column's own entry sets "rel"
+ABSOLUTE_STATISTICS = {"min", "max"}
+QUANTILE_STATISTICS = {"p1", "p50", "p99"}
+
+BLOCK_SIZE = 1 << 16
+# Values kept for the quantile estimate; columns up to this size get exact quantiles
+QUANTILE_SAMPLE_SIZE = 8192
+
+
+def numeric_summary(values, block_size=BLOCK_SIZE, sample_size=QUANTILE_SAMPLE_SIZE):
+    """
+    Summary statistics of a float column in a single blocked pass.
+
+    Each block of ``block_size`` values is reduced once: its sum is added
+    with Neumaier (Kahan) compensation, its mean and squared deviations are
+    merged with Chan's parallel update for the standard deviation, and every
+    ``len(values) // sample_size``-th value is kept for quantiles. Only one
+    block of non-null values is ever copied, never the whole column.
+
+    Args:
+        values: 1-D float64 array, NaN marking nulls
+        block_size: Values reduced per block
+        sample_size: Approximate number of values kept for the p1/p50/p99 estimate
+
+    Returns:
+        Dict keyed by ``STATISTICS``, plus ``quantiles_estimated`` when the
+        quantiles come from a sample; the value statistics are None when the
+        column has no values
+    """
+    n = len(values)
+    stride = max(1, n // sample_size)
+    count = 0
+    total = compensation = 0.0
+    mean = m2 = 0.0
+    low, high = math.inf, -math.inf
+    samples = []
+
+    for start in range(0, n, block_size):
+        block = values[start:start + block_size]
+        finite = block[~np.isnan(block)]
+        k = finite.size
+        if k:
+            block_sum = float(finite.sum())
+            running = total + block_sum
+            if abs(total) >= abs(block_sum):
+                compensation += (total - running) + block_sum
+            else:
+                compensation += (block_sum - running) + total
+            total = running
+
+            block_mean = block_sum / k
+            block_m2 = float(np.dot(finite - block_mean, finite - block_mean))
+            merged = count + k
+            delta = block_mean - mean
+            mean += delta * k / merged
+            m2 += block_m2 + delta * delta * count * k / merged
+            count = merged
+
+            low = min(low, float(finite.min()))
+            high = max(high, float(finite.max()))
+
+        sampled = block[(-start) % stride::stride]
+        samples.append(sampled[~np.isnan(sampled)])
+
+    summary = {"count": count, "null_count": n - count, "quantiles_estimated": stride > 1}
+    if not count:
+        summary.update({name: None for name in STATISTICS if name not in summary})
+        return summary
+
+    exact_sum = total + compensation
+    p1, p50, p99 = np.quantile(np.concatenate(samples), [0.01, 0.5, 0.99])
+    summary.update({
+        "sum": exact_sum,
+        "mean": exact_sum / count,
+        "std": math.sqrt(m2 / (count - 1)) if count > 1 else 0.0,
+        "min": low,
+        "p1": float(p1),
+        "p50": float(p50),
+        "p99": float(p99),
+        "max": high,
+    })
+    return summary
+
+
+def values_differ(v1, v2, abs_tolerance, rel_tolerance):
+    """True when ``v1`` and ``v2`` are further apart than both tolerances allow"""
+    allowed = max(abs_tolerance, rel_tolerance * max(abs(v1), abs(v2)))
+    return abs(v1 - v2) > allowed
+
+
+def resolve_tolerances(overrides=None):
+    """
+    Tolerance table for a comparison: defaults from config, per-column entries
+    from ``EXCEL_COMPARE_TOLERANCES_FILE`` and then ``overrides``.
+
+    Per-column entries look like ``{"Premium": {"abs": 0.01, "rel": 1e-4}}``;
+    either key may be left out to keep the default.
+    """
+    table = {"default": {"abs": config.NUMERIC_ABS_TOLERANCE, "rel": config.NUMERIC_REL_TOLERANCE},
+             "columns": {}}
+    if config.TOLERANCES_FILE:
+        with open(config.TOLERANCES_FILE, "r", encoding="utf-8") as f:
+            table["columns"].update(json.load(f))
+    table["columns"].update(overrides or {})
+    table["columns"] = {
+        str(name): {key: float(value) for key, value in entry.items() if key in ("abs", "rel")}
+        for name, entry in table["columns"].items()
+    }
+    return table
+
+
+def column_tolerance(tolerances, col_name):
+    """(absolute, relative) tolerance for ``col_name``"""
+    tolerances = tolerances or resolve_tolerances()
+    entry = {**tolerances["default"], **tolerances["columns"].get(str(col_name), {})}
+    return entry["abs"], entry["rel"]
+
+
+def statistic_tolerance(tolerances, col_name, stat, quantiles_estimated=False):
+    """
+    (absolute, relative) tolerance for one statistic of ``col_name``.
+
+    Min and max keep the absolute-only check unless the column's own entry
+    sets ``rel``. Quantiles estimated from a sample are compared with
+    ``NUMERIC_QUANTILE_REL_TOLERANCE`` when it is looser than the column's.
+    """
+    tolerances = tolerances or resolve_tolerances()
+    abs_tolerance, rel_tolerance = column_tolerance(tolerances, col_name)
+    if stat in ABSOLUTE_STATISTICS and "rel" not in tolerances["columns"].get(str(col_name), {}):
+        return abs_tolerance, 0.0
+    if stat in QUANTILE_STATISTICS and quantiles_estimated:
+        return abs_tolerance, max(rel_tolerance, config.NUMERIC_QUANTILE_REL_TOLERANCE)
+    return abs_tolerance, rel_tolerance
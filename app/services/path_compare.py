@@ -0,0 +1,66 @@
+import json
+import logging
+import threading
+import time
+
+from app import config
+from app.services.cache import cache_key, load_json, prune_namespace, store_json
+from app.services.local_files import LocalFile, resolve_allowed_path
+
+logger = logging.getLogger(__name__)
+
+RESULTS_NAMESPACE = "path_results"
+_PRUNE_INTERVAL = 600
+
+_last_prune = 0.0
+_prune_lock = threading.Lock()
+
+
+def open_allowed_pair(actual_path, expected_path):
+    """Resolve both paths against the allowed roots and wrap them for comparison"""
+    actual = LocalFile(resolve_allowed_path(actual_path, config.ALLOWED_ROOTS))
+    expected = LocalFile(resolve_allowed_path(expected_path, config.ALLOWED_ROOTS))
+    return actual, expected
+
+
+def _prune_results():
+    # Entries are only ever added; drop old ones at most every few minutes
+    global _last_prune
+    with _prune_lock:
+        if time.monotonic() - _last_prune < _PRUNE_INTERVAL:
+            return
+        _last_prune = time.monotonic()
+    removed = prune_namespace(RESULTS_NAMESPACE, config.PATH_CACHE_MAX_AGE_HOURS * 3600,
+                              config.PATH_CACHE_MAX_MB * 2**20)
+    if removed:
+        logger.info(f"Pruned {removed} cached path results")
+
+
+def compare_local_files(actual, expected, tolerances=None, alignment=None, sample=None, seed=None, escalate=None):
+    """
+    Compare two files on shared storage, reusing the stored result while
+    neither file's mtime nor size has changed and the comparison settings
+    are the same.
+    """
+    from app.services.compare_logic import compare_excel_stats, comparison_settings
+
+    settings = comparison_settings(tolerances, alignment, sample, seed, escalate)
+    key = cache_key(actual.path, *actual.stat_key(), expected.path, *expected.stat_key(),
+                    json.dumps(settings, sort_keys=True))
+    cached = load_json(RESULTS_NAMESPACE, key)
+    if cached is not None:
+        logger.info(f"Reusing cached result for {actual.path} vs {expected.path}")
+        cached["cache_hit"] = True
+        return cached
+
+    stat_before = (actual.stat_key(), expected.stat_key())
+    results = compare_excel_stats(actual, expected, tolerances=tolerances, alignment=alignment, sample=sample,
+                                  seed=seed, escalate=escalate)
+    # A file rewritten mid-comparison must not be cached under its old mtime/size
+    if "error" not in results and stat_before == (actual.stat_key(), expected.stat_key()):
+        try:
+            store_json(RESULTS_NAMESPACE, key, results)
+            _prune_results()
+        except OSError as e:
+            logger.warning(f"Could not cache result: {str(e)}")
+    return results
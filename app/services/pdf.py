@@ -160,6 +160,10 @@ class PDFReport(FPDF):
             if diffs:
                 if col.get('type') == 'numeric':
                     return f"{len(diffs)} statistical differences"
+                elif col.get('type') == 'datetime':
+                    return f"{len(diffs)} date differences"
+                elif col.get('near_matches'):
+                    return f"{len(diffs)} value count differences, {len(col['near_matches'])} possible renames"
                 else:
                     return f"{len(diffs)} value count differences"
             return "Differences detected"
@@ -0,0 +1,50 @@
+import importlib
+import logging
+import threading
+import time
+
+from app.services.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Heavy modules the first comparison would otherwise import on the request thread
+PREWARM_MODULES = (
+    "numpy",
+    "pandas",
+    "openpyxl",
+    "app.services.compare_logic",
+    "app.services.pdf",
+)
+
+_prewarm_done = threading.Event()
+
+
+def prewarm():
+    """Import the comparison stack and run one tiny read on the calling thread"""
+    start = time.perf_counter()
+    for name in PREWARM_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            logger.warning(f"Pre-warm import of {name} failed: {str(e)}")
+    try:
+        # Touch the Excel reader once so openpyxl's lazily built parser state exists
+        import pandas as pd
+        from io import BytesIO
+        buffer = BytesIO()
+        pd.DataFrame({"warm": [1]}).to_excel(buffer, index=False, engine="openpyxl")
+        buffer.seek(0)
+        pd.read_excel(buffer, engine="openpyxl")
+    except Exception as e:
+        logger.warning(f"Pre-warm read failed: {str(e)}")
+    seconds = time.perf_counter() - start
+    REGISTRY.set_gauge("excel_compare_prewarm_seconds", round(seconds, 6),
+                       help_text="Time spent importing comparison dependencies in the background")
+    logger.info(f"Pre-warmed comparison dependencies in {seconds:.2f}s")
+    _prewarm_done.set()
+
+
+def start_prewarm():
+    """Import the comparison stack on a daemon thread; returns the Event set when done"""
+    threading.Thread(target=prewarm, name="prewarm", daemon=True).start()
+    return _prewarm_done
@@ -0,0 +1,150 @@
+import contextvars
+import logging
+import os
+import sys
+import threading
+
+from app import config
+
+logger = logging.getLogger(__name__)
+
+# tracemalloc is process-wide, so profiled runs are serialized
+_profiling_lock = threading.Lock()
+
+# Stats gathered from worker threads and processes of the profiled run in this context
+_worker_stats = contextvars.ContextVar("profile_worker_stats", default=None)
+
+# From 3.12 cProfile runs on sys.monitoring, which sees every thread and allows one profiler at a time
+_PROFILER_SEES_THREADS = sys.version_info >= (3, 12)
+
+
+class _CollectedStats:
+    """Raw cProfile stats in the form ``pstats.Stats.add`` accepts"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def profiling_active():
+    """True inside a ``run_profiled`` call, including the worker threads it submits work to"""
+    return _worker_stats.get() is not None
+
+
+def profile_call(func, *args, **kwargs):
+    """
+    Run ``func`` under its own cProfile when a profiled run is active.
+
+    Before Python 3.12 cProfile only sees the thread that enabled it, so
+    column batches on the thread pool profile themselves and their stats
+    are merged into the run's ``.prof`` file. From 3.12 the run's profiler
+    already covers them and a second one cannot be enabled, so ``func``
+    simply runs. Returns ``func``'s result.
+    """
+    collected = _worker_stats.get()
+    if collected is None or _PROFILER_SEES_THREADS:
+        return func(*args, **kwargs)
+    stats, result = profiled_stats(func, *args, **kwargs)
+    add_worker_stats(stats)
+    return result
+
+
+def profiled_stats(func, *args, **kwargs):
+    """Tuple of the raw cProfile stats of ``func`` (picklable, for worker processes) and its result"""
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        profiler.disable()
+    profiler.create_stats()
+    return profiler.stats, result
+
+
+def add_worker_stats(stats):
+    """Merge raw stats from a worker thread or process into the active profiled run"""
+    collected = _worker_stats.get()
+    if collected is not None and stats:
+        with collected["lock"]:
+            collected["stats"].append(stats)
+
+
+def profiling_requested(flag):
+    """Decide whether a request should be profiled given its ``profile`` flag"""
+    if config.PROFILING_MODE == "always":
+        return True
+    if config.PROFILING_MODE == "on-request":
+        return str(flag or "").lower() in ("1", "true", "yes")
+    return False
+
+
+def run_profiled(func, *args, output_dir, base_name, top_n=None, **kwargs):
+    """
+    Run ``func`` under cProfile and tracemalloc and save the captures.
+
+    Column batches run on the thread pool or in worker processes during the
+    call are profiled where they run, and their stats are merged into the
+    ``.prof`` file. tracemalloc covers every thread of this process, but not
+    worker processes.
+
+    Args:
+        func: Callable to profile
+        output_dir: Folder the ``.prof`` file and allocation snapshot are written to
+        base_name: File name stem shared by both captures
+        top_n: Number of allocation sites kept in the snapshot
+
+    Returns:
+        Tuple of ``func``'s result and a dict describing the written files
+    """
+    import cProfile
+    import pstats
+    import tracemalloc
+
+    top_n = top_n or config.PROFILING_TOP_ALLOCATIONS
+    profile_filename = f"{base_name}.prof"
+    allocations_filename = f"{base_name}_allocations.txt"
+
+    with _profiling_lock:
+        profiler = cProfile.Profile()
+        collected = {"lock": threading.Lock(), "stats": []}
+        token = _worker_stats.set(collected)
+        tracemalloc.start()
+        profiler.enable()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            profiler.disable()
+            _worker_stats.reset(token)
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+    stats = pstats.Stats(profiler)
+    for worker_stats in collected["stats"]:
+        stats.add(_CollectedStats(worker_stats))
+    stats.dump_stats(os.path.join(output_dir, profile_filename))
+
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ))
+    top_stats = snapshot.statistics("lineno")
+    with open(os.path.join(output_dir, allocations_filename), "w", encoding="utf-8") as f:
+        f.write(f"Peak traced memory: {peak / 2**20:.2f} MiB\n")
+        f.write(f"Traced memory at end: {current / 2**20:.2f} MiB\n")
+        f.write("Allocations in column worker processes are not traced.\n\n")
+        f.write(f"Top {top_n} allocation sites still alive at end of run:\n")
+        for stat in top_stats[:top_n]:
+            f.write(f"{stat}\n")
+
+    logger.info(f"Profile written to {profile_filename} ({len(collected['stats'])} worker captures merged), "
+                f"peak traced memory {peak / 2**20:.2f} MiB")
+    return result, {
+        "profile_file": profile_filename,
+        "allocations_file": allocations_filename,
+        "peak_traced_bytes": peak,
+    }
@@ -0,0 +1,227 @@
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from app import config
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id TEXT PRIMARY KEY,
+    job_id TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    download_name TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reports_created_at ON reports (created_at);
+CREATE INDEX IF NOT EXISTS reports_sha256 ON reports (sha256);
+"""
+
+_CHUNK_SIZE = 1 << 20
+# Staged files older than this were abandoned by a crashed job
+_STALE_STAGING_SECONDS = 3600
+
+
+class ReportStore:
+    """
+    Report files stored by content hash and looked up through a SQLite index.
+
+    Each report gets an id of ``<job_id><ext>`` that maps to a blob under
+    ``objects/<sha256[:2]>/<sha256>``, so concurrent jobs with the same upload
+    names cannot overwrite each other and identical reports are stored once.
+    Producers that need a path (PDF rendering, profiling) write into
+    ``staging_dir`` first. Blobs are moved into place with a rename while
+    holding the index write lock, so the janitor never removes a blob that a
+    new row is about to reference.
+    """
+
+    def __init__(self, root, index_path):
+        self.root = root
+        self.index_path = index_path
+        self.objects_dir = os.path.join(root, "objects")
+        self.staging_dir = os.path.join(root, "staging")
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        self._janitor_pid = None
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+            # Autocommit mode so BEGIN IMMEDIATE can be issued explicitly
+            conn = sqlite3.connect(self.index_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        with self._init_lock:
+            if not self._initialized:
+                conn.executescript(_SCHEMA)
+                os.makedirs(self.objects_dir, exist_ok=True)
+                os.makedirs(self.staging_dir, exist_ok=True)
+                self._initialized = True
+        return conn
+
+    def _object_path(self, sha256):
+        return os.path.join(self.objects_dir, sha256[:2], sha256)
+
+    def staging_path(self, suffix=""):
+        """Fresh path in the staging area for a producer to write a report into"""
+        self._connect()
+        fd, path = tempfile.mkstemp(dir=self.staging_dir, suffix=suffix)
+        os.close(fd)
+        return path
+
+    def staging_directory(self):
+        """Fresh directory in the staging area for producers that write several files"""
+        self._connect()
+        return tempfile.mkdtemp(dir=self.staging_dir)
+
+    def put_bytes(self, job_id, data, download_name):
+        """Store ``data`` as a report of ``job_id``; returns the report id"""
+        path = self.staging_path()
+        with open(path, "wb") as f:
+            f.write(data)
+        return self.put_file(job_id, path, download_name)
+
+    def put_file(self, job_id, staged_path, download_name):
+        """
+        Move a file written under ``staging_dir`` into the store.
+
+        Args:
+            job_id: Job the report belongs to
+            staged_path: File from ``staging_path()``; it is consumed
+            download_name: File name offered to the browser on download
+
+        Returns:
+            Report id used by ``/download/reports/<id>``
+        """
+        digest = hashlib.sha256()
+        with open(staged_path, "rb") as f:
+            for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        sha256 = digest.hexdigest()
+        size = os.path.getsize(staged_path)
+        report_id = f"{job_id}{os.path.splitext(download_name)[1].lower()}"
+        object_path = self._object_path(sha256)
+
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if os.path.exists(object_path):
+                os.unlink(staged_path)
+            else:
+                os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                os.replace(staged_path, object_path)
+            conn.execute(
+                "INSERT OR REPLACE INTO reports (id, job_id, sha256, size, download_name, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (report_id, job_id, sha256, size, download_name, time.time()),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._ensure_janitor()
+        return report_id
+
+    def resolve(self, report_id):
+        """(blob path, download name) for a report id, or None when unknown or evicted"""
+        row = self._connect().execute(
+            "SELECT sha256, download_name FROM reports WHERE id = ?", (report_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        path = self._object_path(row["sha256"])
+        return (path, row["download_name"]) if os.path.exists(path) else None
+
+    def reports(self, extension=""):
+        """Stored report ids ending in ``extension``, with their creation times, oldest first"""
+        rows = self._connect().execute(
+            "SELECT id, created_at FROM reports WHERE id LIKE ? ORDER BY created_at", (f"%{extension}",)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def enforce_limits(self, max_age_seconds=None, max_bytes=None):
+        """
+        Drop reports older than ``max_age_seconds``, then the oldest ones until
+        the stored blobs fit in ``max_bytes``, and delete unreferenced blobs.
+        Returns the number of index entries and blobs removed.
+        """
+        max_age_seconds = config.REPORT_MAX_AGE_HOURS * 3600 if max_age_seconds is None else max_age_seconds
+        max_bytes = config.REPORT_MAX_TOTAL_MB * 2**20 if max_bytes is None else max_bytes
+
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute("SELECT id, sha256, size, created_at FROM reports ORDER BY created_at").fetchall()
+            refs = {}
+            for row in rows:
+                refs[row["sha256"]] = refs.get(row["sha256"], 0) + 1
+            total = sum(row["size"] for row in {r["sha256"]: r for r in rows}.values())
+
+            cutoff = time.time() - max_age_seconds if max_age_seconds > 0 else None
+            removed_ids, orphaned = [], []
+            for row in rows:
+                expired = cutoff is not None and row["created_at"] < cutoff
+                if not expired and (max_bytes <= 0 or total <= max_bytes):
+                    break
+                removed_ids.append(row["id"])
+                refs[row["sha256"]] -= 1
+                if refs[row["sha256"]] == 0:
+                    orphaned.append(row["sha256"])
+                    total -= row["size"]
+
+            conn.executemany("DELETE FROM reports WHERE id = ?", [(report_id,) for report_id in removed_ids])
+            for sha256 in orphaned:
+                try:
+                    os.unlink(self._object_path(sha256))
+                except FileNotFoundError:
+                    pass
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        self._clean_staging()
+        if removed_ids:
+            logger.info(f"Report janitor removed {len(removed_ids)} reports and {len(orphaned)} files")
+        return {"reports_removed": len(removed_ids), "files_removed": len(orphaned)}
+
+    def _clean_staging(self):
+        cutoff = time.time() - _STALE_STAGING_SECONDS
+        for entry in os.scandir(self.staging_dir):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    if entry.is_dir():
+                        shutil.rmtree(entry.path, ignore_errors=True)
+                    else:
+                        os.unlink(entry.path)
+            except OSError:
+                pass
+
+    def _ensure_janitor(self):
+        # Started lazily, and once per process, so forked workers each get their own thread
+        if self._janitor_pid == os.getpid() or config.REPORT_JANITOR_INTERVAL <= 0:
+            return
+        self._janitor_pid = os.getpid()
+        threading.Thread(target=self._janitor_loop, name="report-janitor", daemon=True).start()
+
+    def _janitor_loop(self):
+        while True:
+            try:
+                self.enforce_limits()
+            except Exception as e:
+                logger.warning(f"Report janitor failed: {str(e)}")
+            time.sleep(config.REPORT_JANITOR_INTERVAL)
+
+
+report_store = ReportStore(config.REPORT_FOLDER, config.REPORT_INDEX_PATH)
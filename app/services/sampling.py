@@ -0,0 +1,288 @@
+import logging
+import math
+import re
+import zipfile
+import zlib
+from statistics import NormalDist
+from xml.etree import ElementTree
+
+import numpy as np
+import openpyxl
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+from app import config
+from app.services.incremental import read_sheet_fingerprints
+
+logger = logging.getLogger(__name__)
+
+_READ_SIZE = 1 << 22
+_ROOT_TAG = re.compile(rb"<(?:\w+:)?worksheet\b[^>]*>")
+_NAMESPACES = re.compile(rb"\sxmlns(?::\w+)?=\"[^\"]*\"")
+# Row start tag: the row number when the tag has one, and the rest of the tag (ends with "/" for empty rows)
+_ROW_TAG = re.compile(rb"<(?:\w+:)?row(?=[\s>/])(?:[^>]*?\sr=\"(\d+)\")?([^>]*)>")
+_ROW_END = re.compile(rb"</(?:\w+:)?row>")
+
+_reader_warned = False
+
+
+def sample_rows(data_rows, sample_size, seed, sheet):
+    """
+    Stratified sample of the data rows of a sheet.
+
+    The rows are cut into ``sample_size`` equal strata and one row is drawn
+    from each, so the sample covers the whole sheet evenly. The draw is
+    seeded with ``seed`` and the sheet name: the same sheet of both files,
+    and every rerun, samples the same positions.
+
+    Returns:
+        Sorted Excel row numbers (the header is row 1), or None when the
+        sheet has no more rows than the sample
+    """
+    if not data_rows or sample_size <= 0 or data_rows <= sample_size:
+        return None
+    rng = np.random.default_rng([seed, zlib.crc32(str(sheet).encode("utf-8"))])
+    edges = np.linspace(0, data_rows, sample_size + 1)
+    positions = np.floor(edges[:-1] + rng.random(sample_size) * np.diff(edges)).astype(np.int64)
+    return (np.unique(np.clip(positions, 0, data_rows - 1)) + 2).tolist()
+
+
+def _convert_cell(cell):
+    # Same conversions as pandas' openpyxl reader, so sampled frames get the dtypes a full parse would
+    value, data_type = cell["value"], cell["data_type"]
+    if value is None:
+        return ""
+    if data_type == "e":
+        return np.nan
+    if data_type == "n":
+        return int(value) if int(value) == value else float(value)
+    return value
+
+
+class SheetSampler:
+    """
+    Reads selected rows of an xlsx sheet without parsing the others.
+
+    The decompressed sheet part is scanned for ``<row>`` elements; only the
+    sampled ones are decoded, with openpyxl's own cell parser and the
+    workbook's shared strings and date formats. Every other row is skipped
+    without building XML elements or cells, which is where a full parse
+    spends its time.
+    """
+
+    def __init__(self, stream, book):
+        self.stream = stream
+        self.book = book
+        self._parts = None
+        self._last_rows = {}
+
+    def _part(self, sheet):
+        if self._parts is None:
+            self._parts = read_sheet_fingerprints(self.stream) or {}
+        fingerprint = self._parts.get(sheet)
+        if fingerprint is None:
+            raise KeyError(f"No worksheet part for sheet '{sheet}'")
+        return fingerprint["part"]
+
+    def _cell_parser(self):
+        from openpyxl.worksheet._reader import WorkSheetParser
+
+        return WorkSheetParser(None, self.book.shared_strings, data_only=True, epoch=self.book.epoch,
+                               date_formats=self.book._date_formats,
+                               timedelta_formats=self.book._timedelta_formats)
+
+    def _rows(self, sheet, wanted):
+        """Yield ``(row number, cells)`` for the wanted row numbers present in the sheet"""
+        parser = self._cell_parser()
+        last = max(wanted, default=None)
+        position = self.stream.tell()
+        try:
+            with zipfile.ZipFile(self.stream) as archive, archive.open(self._part(sheet)) as part:
+                buffer, wrapper, counter = b"", None, 0
+                for chunk in iter(lambda: part.read(_READ_SIZE), b""):
+                    buffer += chunk
+                    if wrapper is None:
+                        root = _ROOT_TAG.search(buffer)
+                        if root is None:
+                            continue
+                        # Rows are parsed on their own, under the namespaces the root element declares
+                        wrapper = b"<rows" + b"".join(_NAMESPACES.findall(root.group(0))) + b">"
+                    offset = 0
+                    for start in _ROW_TAG.finditer(buffer):
+                        number, rest = start.groups()
+                        number = int(number) if number else counter + 1
+                        if number in wanted and not rest.endswith(b"/"):
+                            end = _ROW_END.search(buffer, start.end())
+                            if end is None:
+                                # Row continues in the next chunk
+                                offset = start.start()
+                                break
+                            element = ElementTree.fromstring(wrapper + buffer[start.start():end.end()] + b"</rows>")
+                            yield number, parser.parse_row(element[0])[1]
+                            offset = end.end()
+                        else:
+                            offset = start.end()
+                        counter = number
+                        if last is not None and counter >= last:
+                            return
+                    buffer = buffer[offset:]
+                self._last_rows[sheet] = counter
+        finally:
+            self.stream.seek(position)
+
+    def last_row(self, sheet):
+        """Number of the last row of a sheet, for workbooks written without a dimension record"""
+        if sheet not in self._last_rows:
+            for _ in self._rows(sheet, set()):
+                pass
+        return self._last_rows[sheet]
+
+    def read(self, sheet, rows):
+        """Frame of the header row and the given Excel row numbers, typed as ``pd.read_excel`` would"""
+        wanted = set(rows)
+        wanted.add(1)
+        found = {}
+        for number, cells in self._rows(sheet, wanted):
+            values = []
+            for cell in cells:
+                values.extend([""] * (cell["column"] - 1 - len(values)))
+                values.append(_convert_cell(cell))
+            while values and values[-1] == "":
+                values.pop()
+            found[number] = values
+        data = [found.get(1, [])] + [found.get(number, []) for number in rows]
+        while len(data) > 1 and not data[-1]:
+            data.pop()
+        width = max(len(row) for row in data)
+        data = [row + [""] * (width - len(row)) for row in data]
+        return TextParser(data, header=0, skip_blank_lines=False).read()
+
+
+def open_sampler(stream, book):
+    """
+    ``SheetSampler`` for an open workbook, or None when the installed openpyxl
+    lacks the private parser and workbook attributes it relies on; sampled
+    sheets are then parsed in full and the rows picked from the frame.
+    """
+    try:
+        from openpyxl.worksheet._reader import WorkSheetParser  # noqa: F401
+        book.shared_strings, book.epoch, book._date_formats, book._timedelta_formats
+    except (ImportError, AttributeError) as e:
+        global _reader_warned
+        if not _reader_warned:
+            logger.warning(f"Row sampling reader unavailable with openpyxl {openpyxl.__version__}, "
+                           f"parsing sampled sheets in full: {str(e)}")
+            _reader_warned = True
+        return None
+    return SheetSampler(stream, book)
+
+
+def z_score(confidence=None):
+    confidence = config.SAMPLE_CONFIDENCE if confidence is None else confidence
+    return NormalDist().inv_cdf((1 + confidence) / 2)
+
+
+def _interval(estimate, low=None, high=None):
+    def display(value):
+        if value is None or isinstance(value, str) or not math.isfinite(value):
+            return None
+        return round(float(value), 4)
+    return {"estimate": display(estimate), "low": display(low), "high": display(high)}
+
+
+def _fpc(n, population):
+    # Finite population correction: the interval closes as the sample approaches the whole sheet
+    return math.sqrt(max(population - n, 0) / (population - 1)) if population > 1 else 0.0
+
+
+def _proportion(k, n, population, z):
+    """Wilson interval of a count among ``n`` sampled rows, scaled to the population"""
+    if n == 0:
+        return _interval(None)
+    p = k / n
+    denominator = 1 + z * z / n
+    centre = (p + z * z / (2 * n)) / denominator
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator * _fpc(n, population)
+    low, high = max(min(centre - half, p), 0.0), min(max(centre + half, p), 1.0)
+    return _interval(p * population, low * population, high * population)
+
+
+def _counts(col, population, z):
+    n = len(col)
+    valid = int(col.notna().sum())
+    count = _proportion(valid, n, population, z)
+    null_count = _interval(*(None if v is None else population - v
+                             for v in (count["estimate"], count["high"], count["low"])))
+    return {"count": count, "null_count": null_count}
+
+
+def _numeric_estimates(col, population, z):
+    values = pd.to_numeric(col, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    estimates = _counts(pd.Series(values), population, z)
+    finite = np.sort(values[np.isfinite(values)])
+    n, k = len(values), finite.size
+    if not k:
+        return estimates
+    fpc = _fpc(n, population)
+    std = float(finite.std(ddof=1)) if k > 1 else 0.0
+    mean_half = z * std / math.sqrt(k) * fpc
+    estimates["mean"] = _interval(finite.mean(), finite.mean() - mean_half, finite.mean() + mean_half)
+    # The total is estimated from every sampled row, empty cells counting as zero
+    filled = np.where(np.isfinite(values), values, 0.0)
+    total = population * filled.mean()
+    total_half = z * population * (filled.std(ddof=1) if n > 1 else 0.0) / math.sqrt(n) * fpc
+    estimates["sum"] = _interval(total, total - total_half, total + total_half)
+    std_half = z * std / math.sqrt(2 * (k - 1)) if k > 1 else None
+    estimates["std"] = _interval(std, None if std_half is None else max(std - std_half, 0.0),
+                                 None if std_half is None else std + std_half)
+    for stat, q in (("p1", 0.01), ("p50", 0.5), ("p99", 0.99)):
+        # Order-statistic interval: the ranks a binomial draw puts around the quantile
+        rank, spread = q * (k - 1), z * math.sqrt(k * q * (1 - q))
+        estimates[stat] = _interval(float(np.quantile(finite, q)),
+                                    finite[max(0, math.floor(rank - spread))],
+                                    finite[min(k - 1, math.ceil(rank + spread))])
+    # A sample bounds the extremes from one side only, so they carry no interval
+    estimates["min"], estimates["max"] = _interval(finite[0]), _interval(finite[-1])
+    return estimates
+
+
+def _overlap(interval1, interval2):
+    bounds = (interval1["low"], interval1["high"], interval2["low"], interval2["high"])
+    if None in bounds:
+        return True
+    return interval1["low"] <= interval2["high"] and interval2["low"] <= interval1["high"]
+
+
+def annotate_estimates(col_result, col1, col2, population1, population2, z):
+    """
+    Mark a column result computed on sampled rows as an estimate.
+
+    Adds ``confidence`` with population estimates and intervals for the
+    column's statistics and for the value counts of its differences, and
+    sets ``borderline`` on a different column when every interval of file 1
+    overlaps the one of file 2, i.e. the sample cannot tell the difference
+    apart from sampling noise.
+    """
+    col_result["estimated"] = True
+    if col_result.get("type") == "numeric":
+        estimates1 = _numeric_estimates(col1, population1, z)
+        estimates2 = _numeric_estimates(col2, population2, z)
+    else:
+        estimates1, estimates2 = _counts(col1, population1, z), _counts(col2, population2, z)
+
+    statistics = {stat: {"file1": estimates1[stat], "file2": estimates2[stat],
+                         "overlap": _overlap(estimates1[stat], estimates2[stat])}
+                  for stat in estimates1 if stat in estimates2}
+    values = []
+    for diff in col_result.get("differences") or []:
+        if "value" not in diff:
+            continue
+        value1 = _proportion(diff.get("file1_count", 0), len(col1), population1, z)
+        value2 = _proportion(diff.get("file2_count", 0), len(col2), population2, z)
+        values.append({"value": diff["value"], "file1": value1, "file2": value2,
+                       "overlap": _overlap(value1, value2)})
+    col_result["confidence"] = {"statistics": statistics, "values": values}
+
+    if col_result.get("status") == "different":
+        col_result["borderline"] = all(entry["overlap"] for entry in (*statistics.values(), *values))
+    return col_result
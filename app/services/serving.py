@@ -0,0 +1,115 @@
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+from app import config
+
+logger = logging.getLogger(__name__)
+
+
+def _limit_memory(megabytes):
+    """Cap this process's address space so a runaway comparison raises MemoryError"""
+    if not megabytes:
+        return
+    try:
+        import resource
+    except ImportError:
+        logger.warning("Per-worker memory caps are not supported on this platform")
+        return
+    limit = megabytes * 2**20
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _serve_worker(app, sock, metrics):
+    from waitress import serve
+
+    _limit_memory(config.WORKER_MEMORY_MB)
+    metrics.start_worker()
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    serve(app, sockets=[sock], threads=config.WAITRESS_THREADS)
+
+
+def _spawn_worker(app, sock, metrics):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            _serve_worker(app, sock, metrics)
+        finally:
+            os._exit(0)
+    logger.info(f"Started worker {pid}")
+    return pid
+
+
+def serve_production(app, prewarm=None):
+    """
+    Serve ``app`` through waitress as configured in ``app.config``.
+
+    With ``WORKERS`` above 1 on POSIX systems, the parent binds the listening
+    socket once and forks that many workers that all accept on it. The parent
+    then supervises them and restarts any worker that dies, for example one
+    that hit its memory cap. Workers share state only through the on-disk cache
+    (atomic renames) and the SQLite job store. ``prewarm`` is called before
+    forking so every worker starts with the comparison stack already imported.
+    """
+    from waitress import serve
+
+    if prewarm:
+        prewarm()
+
+    workers = config.WORKERS
+    if workers <= 1 or not hasattr(os, "fork"):
+        if workers > 1:
+            logger.warning("Multiple workers need os.fork; serving with a single process")
+        _limit_memory(config.WORKER_MEMORY_MB)
+        serve(app, host=config.HOST, port=config.PORT, threads=config.WAITRESS_THREADS)
+        return
+
+    sock = socket.socket(socket.AF_INET6 if ":" in config.HOST else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((config.HOST, config.PORT))
+    sock.listen(1024)
+    sock.setblocking(False)
+    logger.info(f"Serving on http://{config.HOST}:{config.PORT} with {workers} workers x "
+                f"{config.WAITRESS_THREADS} threads")
+
+    # Workers inherit the controller; each may use only its share of the memory budget and queue
+    from app.services.admission import admission_controller
+    admission_controller.share_between(workers)
+    from app.services.logging_setup import serve_child_logs
+    serve_child_logs()
+    # Each worker has its own registry; they publish snapshots that any worker's /metrics merges
+    from app.services.metrics import share_metrics
+    metrics = share_metrics(config.METRICS_DB_PATH)
+
+    children = {_spawn_worker(app, sock, metrics) for _ in range(workers)}
+    stopping = False
+
+    def _stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        children.discard(pid)
+        if not stopping:
+            logger.warning(f"Worker {pid} exited with status {status}; restarting")
+            # Avoid a hot loop if workers die immediately on start
+            time.sleep(1)
+            children.add(_spawn_worker(app, sock, metrics))
+    sock.close()
@@ -0,0 +1,264 @@
+import atexit
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# NumPy dtype kinds shared as raw buffers: bool, integers, floats, datetimes and timedeltas
+_BUFFER_KINDS = "biufMm"
+
+# Segments created by this process and not yet unlinked, for leak detection at exit
+_live_segments = {}
+_live_lock = threading.Lock()
+
+
+class SharedColumn:
+    """
+    Picklable handle to one column placed in shared memory.
+
+    Numeric, boolean and datetime columns are stored as their raw NumPy
+    buffer and come back as a read-only view of it. Other columns (text,
+    mixed objects, extension dtypes) are dictionary encoded: the integer
+    codes go into shared memory and only the distinct values travel with
+    the handle, so each string is pickled once however often it repeats.
+    """
+
+    __slots__ = ("segment", "name", "length", "dtype", "buffer_dtype", "dictionary")
+
+    def __init__(self, segment, name, length, dtype, buffer_dtype, dictionary=None):
+        self.segment = segment
+        self.name = name
+        self.length = length
+        self.dtype = dtype
+        self.buffer_dtype = buffer_dtype
+        self.dictionary = dictionary
+
+    def __getstate__(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def __setstate__(self, state):
+        for slot, value in state.items():
+            setattr(self, slot, value)
+        if self.dictionary is not None:
+            # Unpickled NaNs are new float objects; value sets only merge missing values that are np.nan itself
+            missing = pd.isna(self.dictionary)
+            if missing.any():
+                self.dictionary[missing] = np.nan
+
+    def attach(self):
+        """
+        Rebuild the column from shared memory.
+
+        Returns:
+            ``(Series, SharedMemory)``; close the segment with
+            ``detach`` once the Series is no longer used
+        """
+        shm = shared_memory.SharedMemory(name=self.segment)
+        values = np.ndarray(self.length, dtype=self.buffer_dtype, buffer=shm.buf)
+        values.flags.writeable = False
+        if self.dictionary is None:
+            return pd.Series(values, name=self.name, copy=False), shm
+        # Codes index the distinct values in order of first appearance; NA is one of them
+        return pd.Series(self.dictionary.take(values), name=self.name, dtype=self.dtype, copy=False), shm
+
+
+def detach(shm):
+    """Close a worker's mapping of a segment; the owner unlinks it"""
+    try:
+        shm.close()
+    except BufferError:
+        # A view of the buffer is still referenced; the mapping goes when it is collected
+        logger.debug(f"Shared column segment {shm.name} still in use, leaving it mapped")
+
+
+class ColumnTransport:
+    """
+    Owner side of the shared memory segments of one batch of work.
+
+    ``share`` copies a column into a new segment once. Every task that
+    uses a segment holds a reference from ``acquire`` until ``release``,
+    on top of the transport's own reference, and a segment is unlinked as
+    soon as its last reference is released. ``close`` drops the transport's
+    references; a segment still referenced by then belongs to a task that
+    never reported back, so it is logged as a leak and unlinked anyway.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # segment name -> [SharedMemory, references]
+        self._segments = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def share(self, series):
+        """Place ``series`` in a new segment and return its ``SharedColumn`` handle"""
+        dictionary = None
+        if isinstance(series.dtype, np.dtype) and series.dtype.kind in _BUFFER_KINDS:
+            values = series.to_numpy()
+        else:
+            codes, uniques = series.factorize(use_na_sentinel=False)
+            dictionary = uniques.array
+            values = codes.astype(np.int32) if len(uniques) < 2**31 else codes
+        values = np.ascontiguousarray(values)
+
+        # Zero-size segments are not allowed; empty columns still get one byte
+        shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf)[:] = values
+        with self._lock:
+            self._segments[shm.name] = [shm, 1]
+        with _live_lock:
+            _live_segments[shm.name] = values.nbytes
+        return SharedColumn(shm.name, series.name, len(values), series.dtype, values.dtype, dictionary)
+
+    def acquire(self, columns):
+        with self._lock:
+            for column in columns:
+                self._segments[column.segment][1] += 1
+
+    def release(self, columns):
+        with self._lock:
+            for column in columns:
+                entry = self._segments.get(column.segment)
+                if entry is None:
+                    continue
+                entry[1] -= 1
+                if entry[1] <= 0:
+                    self._unlink(column.segment)
+
+    def close(self):
+        with self._lock:
+            leaked = [name for name, (_, references) in self._segments.items() if references > 1]
+            if leaked:
+                logger.warning(f"{len(leaked)} shared column segment(s) still referenced at close: "
+                               f"{', '.join(leaked[:5])}; unlinking them")
+            for name in list(self._segments):
+                self._unlink(name)
+
+    def _unlink(self, name):
+        shm, _ = self._segments.pop(name)
+        shm.close()
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+        with _live_lock:
+            _live_segments.pop(name, None)
+
+
+def live_segments():
+    """Names and sizes of the segments this process created and has not unlinked yet"""
+    with _live_lock:
+        return dict(_live_segments)
+
+
+@atexit.register
+def _report_leaks():
+    leaked = live_segments()
+    if leaked:
+        logger.warning(f"{len(leaked)} shared column segment(s) ({sum(leaked.values())} bytes) "
+                       f"were never released")
+        for name in leaked:
+            try:
+                shared_memory.SharedMemory(name=name).unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _init_worker():
+    # Importing up front keeps the first batch from paying for pandas and the comparison modules
+    import app.services.compare_logic  # noqa: F401
+
+
+def _compare_shared_batch(pairs, force_object_cols, tolerances, profile=False):
+    """
+    Worker side: attach each pair of columns and compare them with ``efficient_column_comparison``.
+
+    Returns the results, and the batch's raw cProfile stats when ``profile`` is set (otherwise None).
+    """
+    if profile:
+        from app.services.profiling import profiled_stats
+
+        stats, results = profiled_stats(_compare_shared_batch, pairs, force_object_cols, tolerances)
+        return results[0], stats
+
+    from app.services.compare_logic import efficient_column_comparison
+
+    results = []
+    for shared1, shared2 in pairs:
+        col1, shm1 = shared1.attach()
+        try:
+            col2, shm2 = shared2.attach()
+            try:
+                results.append(efficient_column_comparison(col1, col2, shared1.name, force_object_cols, tolerances))
+            finally:
+                del col2
+                detach(shm2)
+        finally:
+            del col1
+            detach(shm1)
+    return results, None
+
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def get_process_pool(workers):
+    """Shared process pool for column batches, resized when the worker count changes"""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None or _process_pool._max_workers != workers:
+            if _process_pool is not None:
+                _process_pool.shutdown(wait=False)
+            from app.services.logging_setup import serve_child_logs
+
+            serve_child_logs()
+            # Forking a threaded server is unsafe, so workers start from a fresh interpreter
+            _process_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                                initializer=_init_worker)
+        return _process_pool
+
+
+def compare_columns_in_processes(df1, df2, batches, force_object_cols, tolerances, workers):
+    """
+    Compare batches of columns on the process pool, moving them through shared memory.
+
+    Each column is copied into shared memory once and workers read it in
+    place, instead of every batch being pickled to the worker and unpickled
+    into a second copy there. Results come back in the original column order.
+    """
+    from app.services.profiling import add_worker_stats, profiling_active
+
+    pool = get_process_pool(workers)
+    profile = profiling_active()
+    with ColumnTransport() as transport:
+        futures = []
+        for batch in batches:
+            pairs = [(transport.share(df1[col]), transport.share(df2[col])) for col in batch]
+            handles = [shared for pair in pairs for shared in pair]
+            transport.acquire(handles)
+            future = pool.submit(_compare_shared_batch, pairs, force_object_cols, tolerances, profile)
+            future.add_done_callback(lambda _, handles=handles: transport.release(handles))
+            futures.append((batch, future))
+
+        col_results = []
+        for batch, future in futures:
+            try:
+                results, stats = future.result()
+                add_worker_stats(stats)
+                col_results.extend(results)
+            except Exception as e:
+                logger.warning(f"Column batch failed in worker process: {str(e)}")
+                col_results.extend({"name": col, "type": "unknown", "status": "error", "differences": [],
+                                    "error": f"Processing failed: {str(e)}"} for col in batch)
+    return col_results
@@ -0,0 +1,280 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows has no flock; the first byte of the file is locked instead
+    fcntl = None
+    import msvcrt
+
+from app import config
+from app.services.local_files import LocalFile, allowed_filename
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    size INTEGER,
+    received INTEGER NOT NULL DEFAULT 0,
+    sha256 TEXT,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS uploads_updated_at ON uploads (updated_at);
+"""
+
+_COPY_SIZE = 1 << 20
+_SWEEP_INTERVAL = 600
+
+
+class UploadError(Exception):
+    """Raised for upload requests that cannot be applied; ``offset`` tells the client where to resume"""
+
+    def __init__(self, message, status_code=400, offset=None):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.offset = offset
+
+
+@contextmanager
+def _exclusive(f, message):
+    """Hold an exclusive lock on an open upload file, or raise a 409 ``UploadError`` when it is taken"""
+    if fcntl is not None:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadError(message, 409)
+        # Released when the file is closed
+        yield
+        return
+    f.seek(0)
+    try:
+        msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        raise UploadError(message, 409)
+    try:
+        yield
+    finally:
+        f.flush()
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class UploadedFile(LocalFile):
+    """A finished upload, usable wherever an upload or ``LocalFile`` is expected"""
+
+    def __init__(self, path, filename, sha256):
+        super().__init__(path, filename)
+        self.sha256 = sha256
+
+
+class UploadStore:
+    """
+    Resumable chunked uploads written straight to disk.
+
+    Each upload is a file under ``root`` that grows by one chunk per PUT;
+    a chunk is accepted only at the current end of the file, so a client
+    that lost its connection asks for the offset and continues from there.
+    The SHA-256 is updated as chunks arrive. The running hash lives in the
+    process that received the previous chunk, so when a chunk lands on
+    another worker (or after a restart) the file is hashed again at
+    finalize instead. An exclusive lock on the file keeps two chunks of the
+    same upload from being written at once.
+    """
+
+    def __init__(self, root, index_path):
+        self.root = root
+        self.index_path = index_path
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        # upload id -> (hashlib object, bytes hashed), for chunks received by this process
+        self._hashers = {}
+        self._hashers_lock = threading.Lock()
+        self._last_sweep = 0.0
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+            conn = sqlite3.connect(self.index_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        with self._init_lock:
+            if not self._initialized:
+                conn.executescript(_SCHEMA)
+                os.makedirs(self.root, exist_ok=True)
+                self._initialized = True
+        return conn
+
+    def _data_path(self, upload_id):
+        return os.path.join(self.root, f"{upload_id}.part")
+
+    def _require(self, upload_id, status=None):
+        upload = self.get(upload_id)
+        if upload is None:
+            raise UploadError(f"Unknown upload '{upload_id}'", 404)
+        if status and upload["status"] != status:
+            raise UploadError(f"Upload '{upload_id}' is {upload['status']}", 409, upload["received"])
+        return upload
+
+    def create(self, filename, size=None):
+        """Start an upload of ``filename``; ``size`` (bytes), when given, is checked at finalize"""
+        if not filename or not allowed_filename(filename):
+            raise UploadError(f"Invalid file type: {filename}")
+        if size is not None and (size < 0 or size > config.UPLOAD_MAX_MB * 2**20):
+            raise UploadError(f"Upload size must be between 0 and {config.UPLOAD_MAX_MB} MB", 413)
+        self._sweep()
+
+        upload_id = uuid.uuid4().hex
+        conn = self._connect()
+        open(self._data_path(upload_id), "wb").close()
+        now = time.time()
+        with conn:
+            conn.execute(
+                "INSERT INTO uploads (id, filename, size, received, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, 0, 'open', ?, ?)",
+                (upload_id, os.path.basename(filename), size, now, now),
+            )
+        with self._hashers_lock:
+            self._hashers[upload_id] = (hashlib.sha256(), 0)
+        return self.get(upload_id)
+
+    def get(self, upload_id):
+        row = self._connect().execute("SELECT * FROM uploads WHERE id = ?", (upload_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def write_chunk(self, upload_id, offset, stream):
+        """
+        Append the bytes of ``stream`` to an open upload.
+
+        Args:
+            upload_id: Upload to extend
+            offset: Where the client believes the chunk starts; must be the current size
+            stream: File-like object read until exhausted (the request body)
+
+        Returns:
+            The new offset. Bytes written before a dropped connection are kept,
+            so the client resumes from whatever offset it is told next.
+        """
+        upload = self._require(upload_id, "open")
+        limit = upload["size"] if upload["size"] is not None else config.UPLOAD_MAX_MB * 2**20
+
+        path = self._data_path(upload_id)
+        with open(path, "r+b") as f, _exclusive(f, "Another chunk of this upload is being written"):
+            current = f.seek(0, os.SEEK_END)
+            if offset != current:
+                raise UploadError(f"Chunk offset {offset} does not match upload offset {current}", 409, current)
+
+            with self._hashers_lock:
+                hasher, hashed = self._hashers.pop(upload_id, (None, 0))
+            if hashed != current:
+                hasher = None
+            written = 0
+            try:
+                for piece in iter(lambda: stream.read(_COPY_SIZE), b""):
+                    if current + written + len(piece) > limit:
+                        raise UploadError(f"Upload exceeds its size of {limit} bytes", 413, current + written)
+                    f.write(piece)
+                    if hasher is not None:
+                        hasher.update(piece)
+                    written += len(piece)
+            finally:
+                f.flush()
+                if hasher is not None:
+                    with self._hashers_lock:
+                        self._hashers[upload_id] = (hasher, current + written)
+                self._set_received(upload_id, current + written)
+        return current + written
+
+    def _set_received(self, upload_id, received):
+        conn = self._connect()
+        with conn:
+            conn.execute("UPDATE uploads SET received = ?, updated_at = ? WHERE id = ?",
+                         (received, time.time(), upload_id))
+
+    def finalize(self, upload_id, sha256=None):
+        """
+        Close an upload once every byte has arrived.
+
+        The declared size is checked and, when the client sends its own
+        ``sha256``, so is the content. Returns the upload record with its hash.
+        """
+        upload = self._require(upload_id)
+        if upload["status"] == "complete":
+            return upload
+        path = self._data_path(upload_id)
+        with open(path, "rb") as f, _exclusive(f, "A chunk of this upload is still being written"):
+            size = os.fstat(f.fileno()).st_size
+            if upload["size"] is not None and size != upload["size"]:
+                raise UploadError(f"Upload has {size} of {upload['size']} bytes", 409, size)
+
+            with self._hashers_lock:
+                hasher, hashed = self._hashers.pop(upload_id, (None, 0))
+            if hasher is None or hashed != size:
+                hasher = hashlib.sha256()
+                for piece in iter(lambda: f.read(_COPY_SIZE), b""):
+                    hasher.update(piece)
+            digest = hasher.hexdigest()
+
+        if sha256 and sha256.lower() != digest:
+            raise UploadError(f"SHA-256 mismatch: received content hashes to {digest}", 422, size)
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "UPDATE uploads SET status = 'complete', size = ?, received = ?, sha256 = ?, updated_at = ? "
+                "WHERE id = ?",
+                (size, size, digest, time.time(), upload_id),
+            )
+        logger.info(f"Upload {upload_id} ({upload['filename']}) finalized: {size} bytes, sha256 {digest[:12]}")
+        return self.get(upload_id)
+
+    def open(self, upload_id):
+        """``UploadedFile`` for a finalized upload"""
+        upload = self._require(upload_id, "complete")
+        return UploadedFile(self._data_path(upload_id), upload["filename"], upload["sha256"])
+
+    def delete(self, upload_id):
+        self._require(upload_id)
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM uploads WHERE id = ?", (upload_id,))
+        with self._hashers_lock:
+            self._hashers.pop(upload_id, None)
+        try:
+            os.unlink(self._data_path(upload_id))
+        except FileNotFoundError:
+            pass
+
+    def _sweep(self):
+        """Drop uploads untouched for ``UPLOAD_MAX_AGE_HOURS``; runs at most every few minutes per process"""
+        now = time.time()
+        if config.UPLOAD_MAX_AGE_HOURS <= 0 or now - self._last_sweep < _SWEEP_INTERVAL:
+            return
+        self._last_sweep = now
+        conn = self._connect()
+        cutoff = now - config.UPLOAD_MAX_AGE_HOURS * 3600
+        stale = [row["id"] for row in conn.execute("SELECT id FROM uploads WHERE updated_at < ?", (cutoff,))]
+        for upload_id in stale:
+            try:
+                self.delete(upload_id)
+            except (UploadError, OSError):
+                pass
+        if stale:
+            logger.info(f"Removed {len(stale)} expired uploads")
+
+
+upload_store = UploadStore(config.UPLOAD_FOLDER, config.UPLOAD_INDEX_PATH)
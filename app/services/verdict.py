@@ -0,0 +1,149 @@
+import logging
+import time
+
+from app.services.metrics import span
+
+logger = logging.getLogger(__name__)
+
+def results_verdict(results):
+    """"match", "different" or "error" for unformatted ``compare_excel_stats`` results"""
+    summary = results.get("summary", {})
+    if "error" in results or results.get("sheets_failed") or summary.get("error_columns"):
+        return "error"
+    # Workbooks without a common sheet were never compared, so they cannot match
+    if summary.get("different_columns") or not results.get("sheets"):
+        return "different"
+    return "match"
+
+
+def _same_content(fingerprint1, fingerprint2):
+    # The part names may differ (sheet1.xml vs sheet3.xml) for identical content
+    return bool(fingerprint1 and fingerprint2) and all(
+        fingerprint1[key] == fingerprint2[key] for key in ("crc", "size", "shared"))
+
+
+def quick_verdict(file1, file2, tolerances=None):
+    """
+    Decide only whether two workbooks match, stopping at the first difference.
+
+    Checks run cheapest first: sheet names, then each sheet's header row,
+    then the zip CRCs of the sheet parts (sheets whose parts are
+    byte-identical on both sides are not parsed), and finally the column
+    statistics of the remaining sheets, smallest sheet first and one column
+    at a time. No differences are collected and nothing is formatted.
+    This is stricter than a full comparison, which only compares the
+    sheets and columns both workbooks have: here any extra sheet or column
+    is a difference. Dimension records that disagree only mark the sheet in
+    ``dimension_mismatches``: formatted blank rows change them without
+    changing any data, so they never decide the verdict.
+
+    Returns:
+        Dict with ``verdict`` ("match", "different" or "error"), the check
+        that decided it as ``decided_by``, a ``detail`` message, where the
+        difference was found (``sheet``/``column``) and the ``checks`` run
+        with their timings
+    """
+    streams = []
+    try:
+        return _quick_verdict(file1, file2, tolerances, streams)
+    finally:
+        # Memory maps of files on disk keep a descriptor and a mapping until closed
+        for stream in streams:
+            stream.close()
+
+
+def _quick_verdict(file1, file2, tolerances, streams):
+    import pandas as pd
+
+    from app.services.compare_logic import (FORCE_OBJECT_COLS, efficient_column_comparison, open_workbook_stream,
+                                            read_sheet_header, resolve_tolerances)
+    from app.services.incremental import read_sheet_fingerprints
+
+    checks = []
+    result = {"file1_name": file1.filename, "file2_name": file2.filename}
+
+    def decide(verdict, check, detail, **where):
+        result.update(verdict=verdict, decided_by=check, detail=detail, checks=checks, **where)
+        logger.info(f"Quick verdict {verdict} ({check}): {detail}")
+        return result
+
+    def timed(check, func):
+        start = time.perf_counter()
+        with span(f"verdict_{check}"):
+            value = func()
+        checks.append({"check": check, "seconds": round(time.perf_counter() - start, 6)})
+        return value
+
+    try:
+        stream1 = open_workbook_stream(file1)
+        streams.append(stream1)
+        stream2 = open_workbook_stream(file2)
+        streams.append(stream2)
+        xl1 = pd.ExcelFile(stream1, engine="openpyxl")
+        xl2 = pd.ExcelFile(stream2, engine="openpyxl")
+    except Exception as e:
+        return decide("error", "open", f"Failed to read Excel files: {str(e)}")
+
+    sheets1, sheets2 = timed("sheet_names", lambda: (xl1.sheet_names, xl2.sheet_names))
+    if sorted(sheets1) != sorted(sheets2):
+        only1 = sorted(set(sheets1) - set(sheets2))
+        only2 = sorted(set(sheets2) - set(sheets1))
+        return decide("different", "sheet_names",
+                      f"{len(sheets1)} vs {len(sheets2)} sheets; only in file 1: {only1}, only in file 2: {only2}")
+    if not sheets1:
+        return decide("different", "sheet_names", "Workbooks have no sheets")
+
+    headers = timed("dimensions", lambda: {
+        sheet: (read_sheet_header(xl1, sheet), read_sheet_header(xl2, sheet)) for sheet in sheets1})
+    result["dimension_mismatches"] = {
+        sheet: f"{rows1}x{cols1} vs {rows2}x{cols2}"
+        for sheet, ((_, rows1, cols1), (_, rows2, cols2)) in headers.items()
+        if None not in (rows1, rows2, cols1, cols2) and (rows1, cols1) != (rows2, cols2)}
+
+    differing = timed("headers", lambda: [
+        sheet for sheet, ((header1, _, _), (header2, _, _)) in headers.items()
+        if list(map(str, header1)) != list(map(str, header2))])
+    if differing:
+        return decide("different", "headers", "Column headers differ", sheet=differing[0])
+
+    fingerprints1, fingerprints2 = timed("fingerprints", lambda: (
+        read_sheet_fingerprints(stream1) or {}, read_sheet_fingerprints(stream2) or {}))
+    remaining = [sheet for sheet in sheets1
+                 if not _same_content(fingerprints1.get(sheet), fingerprints2.get(sheet))]
+    if not remaining:
+        return decide("match", "fingerprints", "Every sheet is byte-identical")
+
+    def sheet_cells(sheet):
+        _, rows, cols = headers[sheet][0]
+        return (rows or 0) * (cols or 0)
+
+    tolerances = resolve_tolerances(tolerances)
+    force_object_cols = set(FORCE_OBJECT_COLS)
+
+    def parse(xl, sheet):
+        # safe_parse_excel_from_memory turns parse failures into empty frames, which would compare as equal
+        with span("sheet_parse", sheet=sheet):
+            df = pd.read_excel(xl, sheet_name=sheet, engine="openpyxl")
+        return pd.DataFrame() if df.empty else df
+
+    def compare_statistics():
+        for sheet in sorted(remaining, key=sheet_cells):
+            try:
+                df1, df2 = parse(xl1, sheet), parse(xl2, sheet)
+            except Exception as e:
+                return "error", f"Could not parse sheet: {str(e)}", {"sheet": sheet}
+            if df1.empty != df2.empty:
+                return "different", "One sheet is empty", {"sheet": sheet}
+            for col in df1.columns.intersection(df2.columns):
+                col_result = efficient_column_comparison(df1[col], df2[col], col, force_object_cols, tolerances)
+                if col_result["status"] != "matching":
+                    verdict = "error" if col_result["status"] == "error" else "different"
+                    detail = col_result.get("error") or f"{len(col_result.get('differences', []))} differences"
+                    return verdict, detail, {"sheet": sheet, "column": str(col)}
+        return "match", f"{len(remaining)} sheet(s) compared by statistics", {}
+
+    try:
+        verdict, detail, where = timed("statistics", compare_statistics)
+    except Exception as e:
+        return decide("error", "statistics", f"Comparison failed: {str(e)}")
+    return decide(verdict, "statistics", detail, **where)
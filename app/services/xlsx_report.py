@@ -0,0 +1,198 @@
+import logging
+import math
+from copy import copy
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE, Cell
+from openpyxl.formatting.rule import CellIsRule
+from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
+
+from app.services.verdict import results_verdict
+
+logger = logging.getLogger(__name__)
+
+# Excel caps a sheet at 1,048,576 rows; stop well before that
+MAX_DIFFERENCE_ROWS = 1_000_000
+
+_HEADER_FONT = Font(bold=True, color="FFFFFF")
+_HEADER_FILL = PatternFill("solid", start_color="1F497D")
+_FILE1_FILL = PatternFill("solid", start_color="DDEBF7")
+_FILE2_FILL = PatternFill("solid", start_color="FCE4D6")
+_STATUS_FILLS = {
+    "different": PatternFill("solid", start_color="F8CBAD", end_color="F8CBAD"),
+    "error": PatternFill("solid", start_color="FFE699", end_color="FFE699"),
+    "matching": PatternFill("solid", start_color="C6EFCE", end_color="C6EFCE"),
+}
+
+
+def _value(ws, value):
+    """
+    Cell value Excel accepts: NaN/inf and unknown types become text, and
+    control characters (not allowed in xlsx) are dropped. Text starting with
+    "=" comes back as a cell typed as a string, because openpyxl would
+    otherwise write it as a formula; names and values come from the
+    compared workbooks and must never run in the report.
+    """
+    if value is None or isinstance(value, (bool, int)):
+        return value
+    if isinstance(value, float) and math.isfinite(value):
+        return value
+    value = ILLEGAL_CHARACTERS_RE.sub("", str(value))
+    if not value.startswith("="):
+        return value
+    cell = WriteOnlyCell(ws, value)
+    cell.data_type = "s"
+    return cell
+
+
+def _header_row(ws, titles):
+    cells = []
+    for title in titles:
+        cell = WriteOnlyCell(ws, title)
+        cell.font, cell.fill = _HEADER_FONT, _HEADER_FILL
+        cells.append(cell)
+    ws.append(cells)
+
+
+def _header(ws, titles, widths):
+    for index, width in enumerate(widths, 1):
+        ws.column_dimensions[get_column_letter(index)].width = width
+    ws.freeze_panes = "A2"
+    _header_row(ws, titles)
+
+
+def _highlight_status(ws, column_letter, last_row):
+    # Conditional formats stay live if reviewers edit or filter the sheet
+    cells = f"{column_letter}2:{column_letter}{max(last_row, 2)}"
+    for status, fill in _STATUS_FILLS.items():
+        ws.conditional_formatting.add(cells, CellIsRule(operator="equal", formula=[f'"{status}"'], fill=fill))
+
+
+def _filled(ws, value, template):
+    # Copying a styled template's style ids skips the style lookup of ``cell.fill = ...`` on every row
+    value = _value(ws, value)
+    cell = value if isinstance(value, Cell) else WriteOnlyCell(ws, value)
+    cell._style = copy(template._style)
+    return cell
+
+
+def _write_summary(wb, data):
+    ws = wb.create_sheet("Summary")
+    ws.column_dimensions["A"].width = 28
+    ws.column_dimensions["B"].width = 48
+    summary = data.get("summary", {})
+    for label, value in (
+        ("File 1", data.get("file1_name")),
+        ("File 2", data.get("file2_name")),
+        ("Comparison time", data.get("comparison_time")),
+        ("Verdict", results_verdict(data) + (" (estimated from a sample)" if data.get("estimated") else "")),
+        ("Error", data.get("error") or data.get("warning")),
+        ("Sheets compared", data.get("total_sheets")),
+        ("Sheets processed", data.get("sheets_processed")),
+        ("Sheets failed", data.get("sheets_failed")),
+        ("Sheets reused", data.get("sheets_reused")),
+        ("Columns compared", summary.get("total_columns_compared")),
+        ("Matching columns", summary.get("matching_columns")),
+        ("Different columns", summary.get("different_columns")),
+        ("Error columns", summary.get("error_columns")),
+        ("Success rate (%)", summary.get("success_rate")),
+    ):
+        label_cell = WriteOnlyCell(ws, label)
+        label_cell.font = Font(bold=True)
+        ws.append([label_cell, _value(ws, value)])
+
+    ws.append([])
+    sheet_titles = ["Sheet", "File 2 sheet", "Status", "Columns", "Matching", "Different", "Errors",
+                    "Only in file 1", "Only in file 2", "Message"]
+    _header_row(ws, sheet_titles)
+    for sheet in data.get("sheets", []):
+        ws.append([_value(ws, v) for v in (
+            sheet.get("sheet_name"), sheet.get("file2_sheet_name"), sheet.get("status"),
+            sheet.get("total_columns"), sheet.get("matching_columns"), sheet.get("different_columns"),
+            sheet.get("error_columns"), ", ".join(sheet.get("columns_only_in_file1", [])),
+            ", ".join(sheet.get("columns_only_in_file2", [])), sheet.get("error"),
+        )])
+
+
+def _write_columns(wb, data):
+    ws = wb.create_sheet("Columns")
+    _header(ws, ["Sheet", "Column", "File 2 column", "Type", "Status", "Differences", "Error"],
+            [24, 28, 28, 12, 12, 12, 48])
+    rows = 1
+    for sheet in data.get("sheets", []):
+        for column in sheet.get("columns", []):
+            ws.append([_value(ws, v) for v in (
+                sheet.get("sheet_name"), column.get("name"), column.get("file2_name"), column.get("type"),
+                column.get("status"), len(column.get("differences") or []), column.get("error"),
+            )])
+            rows += 1
+    ws.auto_filter.ref = f"A1:G{rows}"
+    _highlight_status(ws, "E", rows)
+
+
+def _difference_rows(data):
+    """(sheet, column, kind, key, file 1, file 2, difference) for every reported difference"""
+    for sheet in data.get("sheets", []):
+        sheet_name = sheet.get("sheet_name")
+        for column in sheet.get("columns", []):
+            name = column.get("name")
+            for diff in column.get("differences") or []:
+                if "statistic" in diff:
+                    yield (sheet_name, name, "statistic", diff["statistic"], diff.get("file1_value"),
+                           diff.get("file2_value"), diff.get("difference"))
+                else:
+                    count1, count2 = diff.get("file1_count", 0), diff.get("file2_count", 0)
+                    yield (sheet_name, name, "value count", diff.get("value"), count1, count2, count2 - count1)
+            for bucket in ((column.get("histograms") or {}).get("month") or {}).get("buckets", []):
+                yield (sheet_name, name, "month count", bucket["period"], bucket["file1"], bucket["file2"],
+                       bucket["file2"] - bucket["file1"])
+            for match in column.get("near_matches") or []:
+                yield (sheet_name, name, "possible rename", None, match["file1_value"], match["file2_value"],
+                       match["score"])
+
+
+def _write_differences(wb, data):
+    ws = wb.create_sheet("Differences")
+    _header(ws, ["Sheet", "Column", "Kind", "Statistic / value", "File 1", "File 2", "Difference"],
+            [24, 28, 16, 28, 22, 22, 18])
+    file1_template, file2_template = WriteOnlyCell(ws), WriteOnlyCell(ws)
+    file1_template.fill, file2_template.fill = _FILE1_FILL, _FILE2_FILL
+    rows = 1
+    for sheet_name, column, kind, key, value1, value2, difference in _difference_rows(data):
+        if rows > MAX_DIFFERENCE_ROWS:
+            ws.append([f"Truncated after {MAX_DIFFERENCE_ROWS} differences"])
+            break
+        ws.append([_value(ws, sheet_name), _value(ws, column), kind, _value(ws, key),
+                   _filled(ws, value1, file1_template), _filled(ws, value2, file2_template), _value(ws, difference)])
+        rows += 1
+    ws.auto_filter.ref = f"A1:G{rows}"
+    red, green = Font(color="C00000"), Font(color="00B050")
+    ws.conditional_formatting.add(f"G2:G{max(rows, 2)}", CellIsRule(operator="lessThan", formula=["0"], font=red))
+    ws.conditional_formatting.add(f"G2:G{max(rows, 2)}", CellIsRule(operator="greaterThan", formula=["0"], font=green))
+
+
+def generate_xlsx_report(comparison_data, output_path):
+    """
+    Write comparison results as an xlsx workbook in openpyxl write-only mode.
+
+    Rows are streamed to disk as they are produced instead of building the
+    workbook in memory, so memory use does not grow with the number of
+    columns or differences. The workbook has a summary sheet, one row per
+    compared column with its status highlighted, and one row per reported
+    difference with the file 1 and file 2 values shaded.
+
+    Returns:
+        True when the report was written
+    """
+    try:
+        wb = Workbook(write_only=True)
+        _write_summary(wb, comparison_data)
+        _write_columns(wb, comparison_data)
+        _write_differences(wb, comparison_data)
+        wb.save(output_path)
+        return True
+    except Exception as e:
+        logger.warning(f"Error generating Excel report: {str(e)}")
+        return False
@@ -0,0 +1,365 @@
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from queue import Empty
+
+from gen_rand_date import DEFAULT_DTYPE_MIX, generate_synthetic_workbooks, parse_dtype_mix
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RESULTS_DIR = os.path.join(BASE_DIR, "bench_results")
+
+
+def _int_list(spec):
+    return [int(x) for x in spec.split(",") if x.strip()]
+
+
+def _peak_rss_bytes():
+    """Peak resident set size of the current process, or None when unavailable"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS reports bytes
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset
+    except (ImportError, AttributeError):
+        return None
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _run_case(actual_path, expected_path, pdf_path, queue):
+    """Run one comparison end to end and report timings (executes in a fresh process)"""
+    try:
+        phases = {}
+        start = time.perf_counter()
+        from app.formatter import format_comparison_results
+        from app.services.compare_logic import compare_excel_stats
+        from app.services.local_files import LocalFile
+        from app.services.metrics import collect_timings, span, summarize_spans
+        from app.services.pdf import generate_pdf_report
+        phases["import"] = time.perf_counter() - start
+
+        with collect_timings() as spans:
+            phase_start = time.perf_counter()
+            # Incremental reuse would turn repeated runs into cache hits
+            results = compare_excel_stats(LocalFile(actual_path), LocalFile(expected_path), incremental=False)
+            phases["compare"] = time.perf_counter() - phase_start
+
+            with span("pdf_render") as pdf_span:
+                pdf_ok = generate_pdf_report(results, pdf_path)
+            with span("formatting") as format_span:
+                format_comparison_results(results)
+        phases["pdf"] = pdf_span["seconds"]
+        phases["format"] = format_span["seconds"]
+
+        summary = results.get("summary", {})
+        queue.put({
+            "wall_seconds": time.perf_counter() - start,
+            "peak_rss_bytes": _peak_rss_bytes(),
+            "phases": phases,
+            "spans": summarize_spans(spans),
+            "pdf_generated": pdf_ok,
+            "error": results.get("error"),
+            "different_columns": summary.get("different_columns"),
+            "matching_columns": summary.get("matching_columns"),
+        })
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+
+
+def _case_result(proc, queue, timeout):
+    """Result posted by a case process, or an error when it dies or runs past ``timeout`` seconds without one"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            # Poll so a process killed by the OOM killer or a crash is noticed instead of waited on forever
+            result = queue.get(timeout=1)
+            break
+        except Empty:
+            if not proc.is_alive() and queue.empty():
+                result = {"error": f"Case process exited with code {proc.exitcode} without a result"}
+                break
+            if time.monotonic() > deadline:
+                proc.terminate()
+                result = {"error": f"Case timed out after {timeout:.0f}s"}
+                break
+    proc.join()
+    return result
+
+
+def run_case(params, work_dir, repeat=1, timeout=3600):
+    """Generate the workbook pair for ``params`` and time it ``repeat`` times"""
+    tag = "r{rows}_c{columns}_s{sheets}".format(**params)
+    actual_path = os.path.join(work_dir, f"{tag}_Actual.xlsx")
+    expected_path = os.path.join(work_dir, f"{tag}_Expected.xlsx")
+
+    gen_start = time.perf_counter()
+    generate_synthetic_workbooks(actual_path, expected_path, **params)
+    generate_seconds = time.perf_counter() - gen_start
+
+    # A fresh process per run keeps peak RSS and import costs per case
+    ctx = multiprocessing.get_context("spawn")
+    runs = []
+    for _ in range(repeat):
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_run_case,
+                           args=(actual_path, expected_path, os.path.join(work_dir, f"{tag}.pdf"), queue))
+        proc.start()
+        runs.append(_case_result(proc, queue, timeout))
+
+    return {
+        "case": tag,
+        "params": params,
+        "input_bytes": os.path.getsize(actual_path) + os.path.getsize(expected_path),
+        "generate_seconds": generate_seconds,
+        "runs": runs,
+    }
+
+
+def _synthetic_frames(rows, columns, params):
+    """Build an actual/expected DataFrame pair in memory, skipping the xlsx round trip"""
+    import numpy as np
+    from gen_rand_date import synthetic_sheet_frames
+
+    actual, expected, _ = synthetic_sheet_frames(rows, columns, params["dtype_mix"], params["cardinality"],
+                                                 params["null_rate"], params["difference_rate"],
+                                                 np.random.default_rng(params["seed"]))
+    return actual, expected
+
+
+def bench_column_workers(rows_list, columns_list, workers_list, params, repeat=1):
+    """
+    Time ``compare_sheet_columns`` serially and on the thread pool.
+
+    Frames are built in memory so the numbers isolate column comparison from
+    xlsx parsing. Every threaded result is checked against the serial one.
+    """
+    from app.services.compare_logic import compare_sheet_columns
+
+    cases = []
+    for rows, columns in itertools.product(rows_list, columns_list):
+        df1, df2 = _synthetic_frames(rows, columns, params)
+        common_cols = list(df1.columns)
+        baseline = None
+        for workers in [1] + [w for w in workers_list if w != 1]:
+            timings = []
+            for _ in range(repeat):
+                sheet_data = {"matching_columns": 0, "different_columns": 0, "error_columns": 0, "columns": []}
+                start = time.perf_counter()
+                compare_sheet_columns(df1, df2, common_cols, set(), sheet_data, workers=workers)
+                timings.append(time.perf_counter() - start)
+            serialized = json.dumps(sheet_data, sort_keys=True, default=str)
+            baseline = baseline or (min(timings), serialized)
+            case = {
+                "rows": rows, "columns": columns, "workers": workers,
+                "seconds": min(timings),
+                "speedup": baseline[0] / min(timings),
+                "identical_to_serial": serialized == baseline[1],
+            }
+            cases.append(case)
+            print(f"r{rows}_c{columns} workers={workers:>2}: {case['seconds']:.3f}s "
+                  f"speedup={case['speedup']:.2f}x identical={case['identical_to_serial']}")
+    return cases
+
+
+def _canonical_columns(col_results):
+    # Text columns report the first ten differing values of a set, and which ten depends on the string
+    # hashing of the process that compared them; keep how many were reported rather than which
+    canonical = []
+    for col in col_results:
+        differences = col.get("differences") or []
+        statistics = [diff for diff in differences if "value" not in diff]
+        canonical.append(dict(col, differences=statistics, value_differences=len(differences) - len(statistics)))
+    return json.dumps(canonical, sort_keys=True, default=str)
+
+
+def bench_column_transport(rows_list, columns_list, workers, params, repeat=1):
+    """
+    Time handing column batches to worker processes: pickled DataFrames vs shared memory.
+
+    Both variants run the same batches on the same process pool (warmed up
+    first), so the difference is the cost of moving columns to the workers.
+    Results are checked against the serial ones, and every shared memory
+    segment must be released once a case finishes.
+    """
+    import pickle
+
+    from app import config
+    from app.services.compare_logic import _compare_column_batch
+    from app.services.shared_columns import compare_columns_in_processes, get_process_pool, live_segments
+
+    pool = get_process_pool(workers)
+    list(pool.map(abs, range(workers)))
+    batch_size = max(1, config.COLUMN_BATCH_SIZE)
+    cases = []
+    for rows, columns in itertools.product(rows_list, columns_list):
+        df1, df2 = _synthetic_frames(rows, columns, params)
+        common_cols = list(df1.columns)
+        batches = [common_cols[i:i + batch_size] for i in range(0, len(common_cols), batch_size)]
+        serial = _canonical_columns(_compare_column_batch(df1, df2, common_cols, set()))
+
+        def pickled():
+            futures = [pool.submit(_compare_column_batch, df1[batch], df2[batch], batch, set()) for batch in batches]
+            return [result for future in futures for result in future.result()]
+
+        def shared():
+            return compare_columns_in_processes(df1, df2, batches, set(), None, workers)
+
+        case = {"rows": rows, "columns": columns, "workers": workers, "batches": len(batches),
+                "pickled_bytes": sum(len(pickle.dumps((df1[b], df2[b]), protocol=pickle.HIGHEST_PROTOCOL))
+                                     for b in batches)}
+        for label, run in (("pickle", pickled), ("shared_memory", shared)):
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                col_results = run()
+                timings.append(time.perf_counter() - start)
+            case[f"{label}_seconds"] = min(timings)
+            case[f"{label}_identical_to_serial"] = _canonical_columns(col_results) == serial
+        case["speedup"] = case["pickle_seconds"] / case["shared_memory_seconds"]
+        case["leaked_segments"] = len(live_segments())
+        cases.append(case)
+        print(f"r{rows}_c{columns} workers={workers}: pickle={case['pickle_seconds']:.3f}s "
+              f"shared={case['shared_memory_seconds']:.3f}s speedup={case['speedup']:.2f}x "
+              f"identical={case['pickle_identical_to_serial'] and case['shared_memory_identical_to_serial']} "
+              f"leaked={case['leaked_segments']}")
+    return cases
+
+
+_STARTUP_PROBE = """
+import importlib.util, json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {base_dir!r})
+spec = importlib.util.spec_from_file_location("webapp", {app_path!r})
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+print(json.dumps({{
+    "import_seconds": time.perf_counter() - start,
+    "app_startup_seconds": module.STARTUP_SECONDS,
+    "heavy_modules_loaded": [m for m in ("pandas", "numpy", "openpyxl", "fpdf") if m in sys.modules],
+}}))
+"""
+
+
+def bench_startup(repeat=5):
+    """Time importing app.py (up to a ready Flask app) in fresh interpreters"""
+    probe = _STARTUP_PROBE.format(base_dir=BASE_DIR, app_path=os.path.join(BASE_DIR, "app.py"))
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, cwd=BASE_DIR)
+        run = {"process_seconds": time.perf_counter() - start}
+        try:
+            run.update(json.loads(proc.stdout.strip().splitlines()[-1]))
+        except (IndexError, ValueError):
+            run["error"] = proc.stderr[-2000:]
+        runs.append(run)
+        print(f"startup: process={run['process_seconds']:.3f}s import={run.get('import_seconds', float('nan')):.3f}s "
+              f"heavy={run.get('heavy_modules_loaded')}")
+    return runs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark comparison, formatting and PDF generation")
+    parser.add_argument("--rows", type=_int_list, default=[1000, 10000], help="Comma separated row counts")
+    parser.add_argument("--columns", type=_int_list, default=[10, 50], help="Comma separated column counts")
+    parser.add_argument("--sheets", type=_int_list, default=[1], help="Comma separated sheet counts")
+    parser.add_argument("--dtype-mix", type=parse_dtype_mix, default=DEFAULT_DTYPE_MIX)
+    parser.add_argument("--cardinality", type=int, default=100)
+    parser.add_argument("--null-rate", type=float, default=0.01)
+    parser.add_argument("--difference-rate", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=1, help="Timed runs per case")
+    parser.add_argument("--timeout", type=float, default=3600,
+                        help="Seconds a matrix case may run before it is stopped and reported as failed")
+    parser.add_argument("--mode", choices=("matrix", "column-workers", "column-transport", "startup"),
+                        default="matrix",
+                        help="matrix: end-to-end size matrix; column-workers: serial vs threaded column "
+                             "comparison; column-transport: pickled vs shared memory column batches on "
+                             "worker processes; startup: time importing app.py in fresh interpreters")
+    parser.add_argument("--workers", type=_int_list, default=[1, 2, 4, 8],
+                        help="Thread counts for --mode column-workers; the largest is the process count "
+                             "for --mode column-transport")
+    parser.add_argument("--output", default=None,
+                        help="Result file (default: bench_results/bench_<timestamp>_<commit>.json)")
+    args = parser.parse_args(argv)
+
+    commit = _git_commit()
+    output = args.output or os.path.join(
+        DEFAULT_RESULTS_DIR, f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{commit or 'nogit'}.json")
+
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cases": [],
+    }
+
+    if args.mode == "startup":
+        report["mode"] = "startup"
+        report["cases"] = bench_startup(repeat=max(args.repeat, 3))
+        _write_report(report, output)
+        return
+
+    if args.mode in ("column-workers", "column-transport"):
+        params = {"dtype_mix": args.dtype_mix, "cardinality": args.cardinality, "null_rate": args.null_rate,
+                  "difference_rate": args.difference_rate, "seed": args.seed}
+        report["mode"] = args.mode
+        if args.mode == "column-workers":
+            report["cases"] = bench_column_workers(args.rows, args.columns, args.workers, params,
+                                                   repeat=args.repeat)
+        else:
+            report["cases"] = bench_column_transport(args.rows, args.columns, max(args.workers), params,
+                                                     repeat=args.repeat)
+        _write_report(report, output)
+        return
+
+    with tempfile.TemporaryDirectory(prefix="excel_bench_") as work_dir:
+        for rows, columns, sheets in itertools.product(args.rows, args.columns, args.sheets):
+            params = {
+                "rows": rows, "columns": columns, "sheets": sheets, "dtype_mix": args.dtype_mix,
+                "cardinality": args.cardinality, "null_rate": args.null_rate,
+                "difference_rate": args.difference_rate, "seed": args.seed,
+            }
+            case = run_case(params, work_dir, repeat=args.repeat, timeout=args.timeout)
+            report["cases"].append(case)
+            for run in case["runs"]:
+                if run.get("error") and "wall_seconds" not in run:
+                    print(f"{case['case']:>22}: failed: {run['error']}")
+                    continue
+                rss = run["peak_rss_bytes"]
+                phases = " ".join(f"{name}={seconds:.3f}s" for name, seconds in run["phases"].items())
+                print(f"{case['case']:>22}: wall={run['wall_seconds']:.3f}s "
+                      f"rss={rss / 2**20 if rss else float('nan'):.1f}MiB {phases}")
+
+    _write_report(report, output)
+
+
+def _write_report(report, output):
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,11 @@
+import argparse
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import random
 
+DEFAULT_DTYPE_MIX = {"float": 0.4, "int": 0.2, "text": 0.3, "date": 0.1}
+
 def generate_sample_excel_files():
     """Generate two sample Excel files with realistic financial data for testing"""
     
@@ -241,7 +244,187 @@ These files are completely synthetic and contain no real financial data.
         f.write(readme_content)
     print("📖 Detailed README generated: SAMPLE_FILES_README.md")
 
-if __name__ == "__main__":
+def parse_dtype_mix(spec):
+    """Parse a ``float=0.4,text=0.6`` style spec into a normalized weight dict"""
+    mix = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition("=")
+        name = name.strip().lower()
+        if name not in DEFAULT_DTYPE_MIX:
+            raise ValueError(f"Unknown dtype '{name}', expected one of {sorted(DEFAULT_DTYPE_MIX)}")
+        mix[name] = float(weight) if weight else 1.0
+    total = sum(mix.values())
+    if total <= 0:
+        raise ValueError("dtype mix weights must add up to a positive number")
+    return {name: weight / total for name, weight in mix.items()}
+
+def _assign_column_dtypes(columns, dtype_mix, rng):
+    """Spread ``columns`` across dtypes proportionally to ``dtype_mix``"""
+    names = list(dtype_mix)
+    counts = np.floor(np.array([dtype_mix[n] for n in names]) * columns).astype(int)
+    # Hand out the rounding remainder to the heaviest dtypes first
+    for idx in np.argsort([-dtype_mix[n] for n in names])[:columns - counts.sum()]:
+        counts[idx] += 1
+    dtypes = [name for name, count in zip(names, counts) for _ in range(count)]
+    rng.shuffle(dtypes)
+    return dtypes
+
+def _synthetic_column(dtype, rows, cardinality, rng):
+    """Build one column of ``rows`` values with at most ``cardinality`` distinct values"""
+    if dtype == "float":
+        pool = rng.uniform(-1_000_000, 1_000_000, cardinality).round(2)
+        return pool[rng.integers(0, cardinality, rows)]
+    if dtype == "int":
+        pool = rng.integers(0, 1_000_000, cardinality)
+        return pool[rng.integers(0, cardinality, rows)]
+    if dtype == "text":
+        pool = np.array([f"Value_{i:06d}" for i in range(cardinality)], dtype=object)
+        return pool[rng.integers(0, cardinality, rows)]
+    if dtype == "date":
+        pool = np.datetime64("2020-01-01") + rng.integers(0, 3650, cardinality).astype("timedelta64[D]")
+        return pool[rng.integers(0, cardinality, rows)]
+    raise ValueError(f"Unknown dtype '{dtype}'")
+
+def _introduce_differences(values, dtype, mask, rng):
+    """Return a copy of ``values`` with the rows selected by ``mask`` perturbed"""
+    changed = values.copy()
+    count = int(mask.sum())
+    if count == 0:
+        return changed
+    if dtype == "float":
+        changed[mask] = (changed[mask] * rng.uniform(0.9, 1.1, count)).round(2)
+    elif dtype == "int":
+        changed[mask] = changed[mask] + rng.integers(1, 100, count)
+    elif dtype == "text":
+        changed[mask] = np.array([f"{value}_alt" for value in changed[mask]], dtype=object)
+    elif dtype == "date":
+        changed[mask] = changed[mask] + rng.integers(1, 30, count).astype("timedelta64[D]")
+    return changed
+
+def _apply_nulls(values, dtype, mask):
+    if not mask.any():
+        return values
+    if dtype in ("int", "text"):
+        values = values.astype(object)
+        values[mask] = None
+    elif dtype == "float":
+        values = values.copy()
+        values[mask] = np.nan
+    elif dtype == "date":
+        values = values.copy()
+        values[mask] = np.datetime64("NaT")
+    return values
+
+def synthetic_sheet_frames(rows, columns, dtype_mix, cardinality, null_rate, difference_rate, rng):
+    """
+    Actual and expected DataFrames of one synthetic sheet.
+
+    Returns:
+        Tuple of (actual, expected, dtype of each column in order)
+    """
+    actual_data = {}
+    expected_data = {}
+    dtypes = _assign_column_dtypes(columns, dtype_mix, rng)
+    for col_idx, dtype in enumerate(dtypes):
+        col_name = f"{dtype.capitalize()}_{col_idx + 1:03d}"
+        values = _synthetic_column(dtype, rows, cardinality, rng)
+        changed = _introduce_differences(values, dtype, rng.random(rows) < difference_rate, rng)
+        null_mask = rng.random(rows) < null_rate
+        actual_data[col_name] = _apply_nulls(values, dtype, null_mask)
+        expected_data[col_name] = _apply_nulls(changed, dtype, null_mask)
+    return pd.DataFrame(actual_data), pd.DataFrame(expected_data), list(dtypes)
+
+def generate_synthetic_workbooks(actual_path, expected_path, rows=1000, columns=10, sheets=1,
+                                 dtype_mix=None, cardinality=100, null_rate=0.0,
+                                 difference_rate=0.01, seed=42):
+    """
+    Write an actual/expected workbook pair of arbitrary size for performance work.
+
+    Args:
+        actual_path: Destination of the "actual" workbook
+        expected_path: Destination of the "expected" workbook
+        rows: Data rows per sheet
+        columns: Columns per sheet
+        sheets: Number of sheets per workbook
+        dtype_mix: Mapping of dtype ("float", "int", "text", "date") to weight
+        cardinality: Distinct values drawn per column
+        null_rate: Fraction of cells blanked out in both workbooks
+        difference_rate: Fraction of cells changed in the expected workbook
+        seed: Seed for the random generator, so runs are reproducible
+
+    Returns:
+        Dictionary describing the generated pair
+    """
+    dtype_mix = dtype_mix or DEFAULT_DTYPE_MIX
+    cardinality = max(1, int(cardinality))
+    rng = np.random.default_rng(seed)
+    dtype_counts = {}
+
+    with pd.ExcelWriter(actual_path, engine='openpyxl') as actual_writer, \
+            pd.ExcelWriter(expected_path, engine='openpyxl') as expected_writer:
+        for sheet_idx in range(sheets):
+            sheet_name = f"Sheet_{sheet_idx + 1:02d}"
+            actual, expected, dtypes = synthetic_sheet_frames(rows, columns, dtype_mix, cardinality, null_rate,
+                                                              difference_rate, rng)
+            for dtype in dtypes:
+                dtype_counts[dtype] = dtype_counts.get(dtype, 0) + 1
+
+            actual.to_excel(actual_writer, sheet_name=sheet_name, index=False)
+            expected.to_excel(expected_writer, sheet_name=sheet_name, index=False)
+
+    return {
+        "actual_path": actual_path,
+        "expected_path": expected_path,
+        "rows": rows,
+        "columns": columns,
+        "sheets": sheets,
+        "dtype_mix": dtype_mix,
+        "dtype_counts": dtype_counts,
+        "cardinality": cardinality,
+        "null_rate": null_rate,
+        "difference_rate": difference_rate,
+        "seed": seed,
+    }
+
+def add_synthetic_arguments(parser):
+    """Register the synthetic generator knobs on an argparse parser"""
+    parser.add_argument("--rows", type=int, default=1000, help="Data rows per sheet")
+    parser.add_argument("--columns", type=int, default=10, help="Columns per sheet")
+    parser.add_argument("--sheets", type=int, default=1, help="Sheets per workbook")
+    parser.add_argument("--dtype-mix", type=parse_dtype_mix, default=DEFAULT_DTYPE_MIX,
+                        help="Column dtype weights, e.g. float=0.4,int=0.2,text=0.3,date=0.1")
+    parser.add_argument("--cardinality", type=int, default=100, help="Distinct values per column")
+    parser.add_argument("--null-rate", type=float, default=0.0, help="Fraction of blank cells")
+    parser.add_argument("--difference-rate", type=float, default=0.01,
+                        help="Fraction of cells changed in the expected workbook")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate Excel files for testing ExcelCompare Pro")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("sample", help="Write the small hand-crafted sample pair (default)")
+    synthetic_parser = subparsers.add_parser("synthetic", help="Write a parametric pair for performance work")
+    add_synthetic_arguments(synthetic_parser)
+    synthetic_parser.add_argument("--output-prefix", default="Synthetic",
+                                  help="Files are written as <prefix>_Actual.xlsx and <prefix>_Expected.xlsx")
+    args = parser.parse_args(argv)
+
+    if args.command == "synthetic":
+        info = generate_synthetic_workbooks(
+            f"{args.output_prefix}_Actual.xlsx", f"{args.output_prefix}_Expected.xlsx",
+            rows=args.rows, columns=args.columns, sheets=args.sheets, dtype_mix=args.dtype_mix,
+            cardinality=args.cardinality, null_rate=args.null_rate,
+            difference_rate=args.difference_rate, seed=args.seed,
+        )
+        print("✅ Synthetic files generated successfully!")
+        print(f"   - {info['actual_path']}")
+        print(f"   - {info['expected_path']}")
+        print(f"   - {info['sheets']} sheet(s) x {info['rows']} rows x {info['columns']} columns "
+              f"{info['dtype_counts']}")
+        return
+
     generate_sample_excel_files()
     generate_detailed_readme()
     
@@ -259,4 +442,6 @@ if __name__ == "__main__":
     print("✅ Mixed data type handling")
     print("✅ Special column processing (UW_Year, Loss_Period)")
     print("✅ Realistic financial data scenarios")
-    
\ No newline at end of file
+
+if __name__ == "__main__":
+    main()
@@ -83,13 +83,17 @@ const handleSubmit = async (event) => {
   }
 
   try {
-    const response = await fetch("/process", {
+    const response = await fetch("/process/stream", {
       method: "POST",
       body: body,
     });
 
-    const data = await response.json();
-    displayResults(data);
+    if ((response.headers.get("Content-Type") || "").includes("application/x-ndjson")) {
+      resultsSection.style.display = "block";
+      await streamResults(response);
+    } else {
+      displayResults(await response.json());
+    }
   } catch (error) {
     resultsSection.innerHTML = `
       <div class="alert alert-danger" role="alert">
@@ -105,6 +109,80 @@ const handleSubmit = async (event) => {
 
 document.getElementById("uploadForm").addEventListener("submit", handleSubmit);
 
+// Render the newline-delimited events of /process/stream as they arrive:
+// each pair's card is drawn on pair_start, grows with every finished sheet
+// and is replaced by the full result once the pair's reports are written.
+async function streamResults(response) {
+  const resultsSection = document.getElementById("results-section");
+  resultsSection.innerHTML = `
+    <h3 class="text-primary mb-4">
+        <i class="fas fa-chart-bar me-2"></i>Comparison Results
+    </h3>
+    <div id="stream-results"></div>
+  `;
+  const container = document.getElementById("stream-results");
+  const pairs = [];
+
+  const renderPair = (index) => {
+    let slot = document.getElementById(`pair-result-${index}`);
+    if (!slot) {
+      slot = document.createElement("div");
+      slot.id = `pair-result-${index}`;
+      container.appendChild(slot);
+    }
+    slot.innerHTML = renderPairCard(pairs[index], index);
+    bindColumnToggles(slot);
+  };
+
+  const handleEvent = (event) => {
+    if (event.event === "pair_start") {
+      pairs[event.pair] = { pair: event.name, pending: true, results: { sheets: [] } };
+      renderPair(event.pair);
+    } else if (event.event === "sheet") {
+      const pair = pairs[event.pair];
+      pair.results.sheets.push(event.sheet);
+      pair.results.total_sheets = event.total;
+      pair.progress = `${event.position}/${event.total} sheets`;
+      renderPair(event.pair);
+    } else if (event.event === "pair") {
+      pairs[event.pair] = event.data;
+      renderPair(event.pair);
+    } else if (event.event === "error") {
+      container.insertAdjacentHTML("beforeend", `
+        <div class="alert alert-danger" role="alert">
+            <i class="fas fa-exclamation-triangle me-2"></i>
+            ${event.error}
+        </div>
+      `);
+    } else if (event.event === "summary" && event.pairs === 0) {
+      container.innerHTML = `
+        <div class="alert alert-warning text-center" role="alert">
+            <i class="fas fa-info-circle me-2"></i>
+            No valid file pairs found for comparison.
+        </div>
+      `;
+    }
+  };
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffered = "";
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) {
+      break;
+    }
+    buffered += decoder.decode(value, { stream: true });
+    const lines = buffered.split("\n");
+    // The last piece may be an incomplete event; keep it for the next chunk
+    buffered = lines.pop();
+    lines.filter((line) => line.trim()).forEach((line) => handleEvent(JSON.parse(line)));
+  }
+  if (buffered.trim()) {
+    handleEvent(JSON.parse(buffered));
+  }
+}
+
 function displayResults(data) {
   const resultsSection = document.getElementById("results-section");
 
@@ -135,139 +213,167 @@ function displayResults(data) {
   `;
 
   data.forEach((pair, pairIndex) => {
-    const results = pair.results;
+    resultsHTML += renderPairCard(pair, pairIndex);
+  });
 
-    if (results.error) {
-      resultsHTML += `
-        <div class="alert alert-warning">
-            <i class="fas fa-exclamation-triangle me-2"></i>
-            ${results.error}
-        </div>
-      `;
-      return;
-    }
+  resultsSection.innerHTML = resultsHTML;
+  bindColumnToggles(resultsSection);
+}
 
-    // Overall statistics
-    const totalSheets = results.total_sheets || 0;
-    let totalColumns = 0;
-    let matchingColumns = 0;
-    let differentColumns = 0;
+function renderPairCard(pair, pairIndex) {
+  const results = pair.results;
 
-    results.sheets?.forEach((sheet) => {
-      totalColumns += sheet.total_columns || 0;
-      matchingColumns += sheet.matching_columns || 0;
-      differentColumns += sheet.different_columns || 0;
-    });
+  if (results.error) {
+    return `
+      <div class="alert alert-warning">
+          <i class="fas fa-exclamation-triangle me-2"></i>
+          ${results.error}
+      </div>
+    `;
+  }
+
+  // Overall statistics
+  const totalSheets = results.total_sheets || 0;
+  let totalColumns = 0;
+  let matchingColumns = 0;
+  let differentColumns = 0;
+
+  results.sheets?.forEach((sheet) => {
+    totalColumns += sheet.total_columns || 0;
+    matchingColumns += sheet.matching_columns || 0;
+    differentColumns += sheet.different_columns || 0;
+  });
 
-    const cardHeader = `
-      <div class="card-header bg-primary text-white border-0">
-        <div class="d-flex justify-content-between align-items-center">
-          <div class="d-flex align-items-between">
-            <h5 class="mb-0">
-                <i class="fas fa-file-contract me-2"></i>
-                ${pair.pair}
-            </h5>
-            <small class="ms-2 badge bg-info">${results.comparison_time || "Unknown time"}</small>
-          </div>
-          <div class="d-flex align-items-center">
-
-            <!-- Download Button -->
+  const cardHeader = `
+    <div class="card-header bg-primary text-white border-0">
+      <div class="d-flex justify-content-between align-items-center">
+        <div class="d-flex align-items-between">
+          <h5 class="mb-0">
+              <i class="fas fa-file-contract me-2"></i>
+              ${pair.pair}
+          </h5>
+          ${pair.pending
+            ? `<small class="ms-2 badge bg-warning text-dark"><i class="fas fa-spinner fa-spin me-1"></i>${pair.progress || "Comparing"}</small>`
+            : `<small class="ms-2 badge bg-info">${results.comparison_time || "Unknown time"}</small>`}
+        </div>
+        <div class="d-flex align-items-center">
+
+          <!-- Download Button -->
+          ${pair.report_file ? `
             <a href="/download/reports/${pair.report_file}" class="btn btn-sm me-2">
                 <i class="fa-solid fa-file-pdf me-2"></i>
+            </a>` : ''
+          }
+          ${pair.has_pdf ? `
+            <a href="/download/reports/${pair.json_report_file}" class="btn btn-sm">
+                <i class="fas fa-code me-2"></i>
+            </a>` : ''
+          }
+          ${pair.xlsx_report_file ? `
+            <a href="/download/reports/${pair.xlsx_report_file}" class="btn btn-sm" title="Excel report">
+                <i class="fas fa-file-excel me-2"></i>
+            </a>` : ''
+          }
+          ${pair.profile_files ? `
+            <a href="${pair.profile_files.profile_url}" class="btn btn-sm" title="cProfile capture">
+                <i class="fas fa-stopwatch me-2"></i>
             </a>
-            ${pair.has_pdf ? `
-              <a href="/download/reports/${pair.json_report_file}" class="btn btn-sm">
-                  <i class="fas fa-code me-2"></i>
-              </a>` : ''
-            }
-          </div>
+            <a href="${pair.profile_files.allocations_url}" class="btn btn-sm" title="Top allocations">
+                <i class="fas fa-memory me-2"></i>
+            </a>` : ''
+          }
         </div>
-      </div>    
-    `;
+      </div>
+    </div>    
+  `;
 
-    const stats = [
-      { label: "Total Sheets", value: totalSheets, icon:"fa-layer-group", color:"" },
-      { label: "Total Columns", value: totalColumns, icon:"fa-columns", color:"warning" },
-      { label: "Matching Columns", value: matchingColumns, icon:"fa-check-circle", color: "success" },
-      { label: "Different Columns", value: differentColumns, icon:"fa-times-circle", color: "danger" },
-    ]
-    const summaryStats = `
-      <div class="row mb-4">
-        ${stats.map((stat) => `
-          <div class="col-md-3">
-              <div class="stat-card ${stat.color} text-center">
-                  <i class="fas ${stat.icon} fa-2x mb-2"></i>
-                  <h4>${stat.value}</h4>
-                  <small>${stat.label}</small>
-              </div>
-          </div>  
-        `).join("")}
-    </div>`;
-
-    const getSheetSummary = (sheet) => `
-      <div class="sheet-summary p-3 border border-secondary rounded" onclick="toggleSheetDetails(${pairIndex}, '${sheet.sheet_name}')">
-        <div class="d-flex justify-content-between align-items-center">
-          <h6 class="mb-0 text-light">
-            <i class="fas fa-table me-2"></i> ${sheet.sheet_name}
-            <span class="badge bg-secondary ms-2">${sheet.total_columns} columns</span>
-          </h6>
-          <div>
-              <span class="badge bg-success">${sheet.matching_columns || 0} matching</span>
-              <span class="badge bg-danger">${sheet.different_columns || 0} different</span>
-              <i class="fas fa-chevron-down ms-2"></i>
-          </div>
+  const stats = [
+    { label: "Total Sheets", value: totalSheets, icon:"fa-layer-group", color:"" },
+    { label: "Total Columns", value: totalColumns, icon:"fa-columns", color:"warning" },
+    { label: "Matching Columns", value: matchingColumns, icon:"fa-check-circle", color: "success" },
+    { label: "Different Columns", value: differentColumns, icon:"fa-times-circle", color: "danger" },
+  ]
+  const summaryStats = `
+    <div class="row mb-4">
+      ${stats.map((stat) => `
+        <div class="col-md-3">
+            <div class="stat-card ${stat.color} text-center">
+                <i class="fas ${stat.icon} fa-2x mb-2"></i>
+                <h4>${stat.value}</h4>
+                <small>${stat.label}</small>
+            </div>
+        </div>  
+      `).join("")}
+  </div>`;
+
+  const getSheetSummary = (sheet) => `
+    <div class="sheet-summary p-3 border border-secondary rounded" onclick="toggleSheetDetails(${pairIndex}, '${sheet.sheet_name}')">
+      <div class="d-flex justify-content-between align-items-center">
+        <h6 class="mb-0 text-light">
+          <i class="fas fa-table me-2"></i> ${sheet.sheet_name}${sheet.file2_sheet_name ? ` &harr; ${sheet.file2_sheet_name}` : ''}
+          <span class="badge bg-secondary ms-2">${sheet.total_columns} columns</span>
+          ${sheet.reused ? '<span class="badge bg-info ms-1" title="Sheet unchanged since the last run of this pair">cached</span>' : ''}
+          ${sheet.sampling ? (sheet.sampling.escalated
+            ? '<span class="badge bg-info ms-1" title="Borderline in the sample, so every row was compared">escalated</span>'
+            : `<span class="badge bg-warning text-dark ms-1" title="Compared on a sample of ${sheet.sampling.file1.rows} of ${sheet.sampling.file1.population} rows">estimated</span>`) : ''}
+        </h6>
+        <div>
+            <span class="badge bg-success">${sheet.matching_columns || 0} matching</span>
+            <span class="badge bg-danger">${sheet.different_columns || 0} different</span>
+            <i class="fas fa-chevron-down ms-2"></i>
         </div>
-    </div>`;
-
-    const getSheetDetails = (sheet) => `
-    <div id="sheet-${pairIndex}-${sheet.sheet_name}" class="sheet-details mt-3" style="display: none;">
-      ${sheet.columns?.map((column) => `
-        <div class="column-comparison p-3 mb-2 rounded ${
-          column.status === "different"? "column-diff": "column-match"}">
-          <div class="d-flex justify-content-between align-items-start">
-              <div>
-                  <strong class="text-light">${column.name}</strong>
-                  <span class="badge ${column.type === "numeric" ? "bg-info": "bg-warning"} ms-2">${column.type}</span>
-                  <span class="badge ${column.status === "different" ? "bg-danger" : "bg-success"} ms-1">${column.status}</span>
-              </div>
-              <small class="text-light mt-1">Click to expand</small>
-          </div>
-          <div class="column-details mt-2" style="display: none;">
-              ${renderColumnDetails(
-                column
-              )}
-          </div>
+      </div>
+  </div>`;
+
+  const getSheetDetails = (sheet) => `
+  <div id="sheet-${pairIndex}-${sheet.sheet_name}" class="sheet-details mt-3" style="display: none;">
+    ${sheet.columns?.map((column) => `
+      <div class="column-comparison p-3 mb-2 rounded ${
+        column.status === "different"? "column-diff": "column-match"}">
+        <div class="d-flex justify-content-between align-items-start">
+            <div>
+                <strong class="text-light">${column.name}${column.file2_name ? ` &harr; ${column.file2_name}` : ''}</strong>
+                <span class="badge ${column.type === "numeric" ? "bg-info": "bg-warning"} ms-2">${column.type}</span>
+                <span class="badge ${column.status === "different" ? "bg-danger" : "bg-success"} ms-1">${column.status}</span>
+                ${column.estimated ? `<span class="badge bg-secondary ms-1">${column.borderline ? "borderline" : "estimated"}</span>` : ''}
+            </div>
+            <small class="text-light mt-1">Click to expand</small>
         </div>
-    `).join("") ||'<p class="text-light mt-1">No columns to display</p>'
-    }
-  </div>
+        <div class="column-details mt-2" style="display: none;">
+            ${renderColumnDetails(
+              column
+            )}
+        </div>
+      </div>
+  `).join("") ||'<p class="text-light mt-1">No columns to display</p>'
+  }
+</div>
 `;
 
-    resultsHTML += `
-      <div class="card results-card glass-card mb-4">
-        ${cardHeader}
-        <div class="card-body">
-          <!-- Summary Statistics -->
-          ${summaryStats}
-
-          <!-- Sheets Comparison -->
-          <div class="sheets-comparison">
-              ${results.sheets?.map((sheet) => `
-                <div class="sheet-section mb-4">
-                  ${getSheetSummary(sheet)}
-                  ${getSheetDetails(sheet)}
-                </div>`).join("") ||'<p class="text-light mt-1">No sheets to display</p>'
-              }
-          </div>
+  return `
+    <div class="card results-card glass-card mb-4">
+      ${cardHeader}
+      <div class="card-body">
+        <!-- Summary Statistics -->
+        ${summaryStats}
+
+        <!-- Sheets Comparison -->
+        <div class="sheets-comparison">
+            ${results.sheets?.map((sheet) => `
+              <div class="sheet-section mb-4">
+                ${getSheetSummary(sheet)}
+                ${getSheetDetails(sheet)}
+              </div>`).join("") ||'<p class="text-light mt-1">No sheets to display</p>'
+            }
         </div>
       </div>
-  `;
-  });
-
-  resultsSection.innerHTML = resultsHTML;
+    </div>
+`;
+}
 
+function bindColumnToggles(container) {
   // Add click handlers for column details
-  document.querySelectorAll(".column-comparison").forEach((column) => {
+  container.querySelectorAll(".column-comparison").forEach((column) => {
     column.addEventListener("click", function () {
       const details = this.querySelector(".column-details");
       details.style.display =
@@ -278,7 +384,7 @@ function displayResults(data) {
 
 function renderColumnDetails(column) {
   if (column.status === "matching") {
-    if (column.type === "numeric" && column.statistics) {
+    if ((column.type === "numeric" || column.type === "datetime") && column.statistics) {
       return `
         <div class="row text-light mt-1">
             ${Object.entries(column.statistics)
@@ -296,7 +402,30 @@ function renderColumnDetails(column) {
     return '<small class="text-success">✓ All values match perfectly</small>';
   } else {
     if (column.type === "numeric" && column.differences) {
-      return `
+      return renderStatisticDifferences(column.differences) + renderConfidence(column);
+    } else if (column.type === "datetime" && column.differences) {
+      // Date columns mix statistic rows and value-count rows, plus differing month buckets
+      return (
+        renderStatisticDifferences(column.differences.filter((diff) => "statistic" in diff)) +
+        renderValueDifferences(column.differences.filter((diff) => "value" in diff)) +
+        renderBucketDifferences(column.histograms)
+      );
+    } else if (column.differences) {
+      return (
+        renderValueDifferences(column.differences) +
+        renderNearMatches(column.near_matches) +
+        renderConfidence(column)
+      );
+    }
+  }
+  return '<small class="text-light mt-1">No detailed information available</small>';
+}
+
+function renderStatisticDifferences(differences) {
+  if (!differences.length) {
+    return "";
+  }
+  return `
         <div class="table-responsive">
             <table class="table table-dark table-sm table-bordered">
                 <thead>
@@ -308,7 +437,7 @@ function renderColumnDetails(column) {
                     </tr>
                 </thead>
                 <tbody>
-                    ${column.differences
+                    ${differences
                       .map(
                         (diff) => `
                         <tr>
@@ -327,8 +456,13 @@ function renderColumnDetails(column) {
                 </tbody>
             </table>
         </div>`;
-    } else if (column.differences) {
-      return `
+}
+
+function renderValueDifferences(differences) {
+  if (!differences.length) {
+    return "";
+  }
+  return `
         <div class="table-responsive">
             <table class="table table-dark table-sm table-bordered">
                 <thead>
@@ -340,7 +474,7 @@ function renderColumnDetails(column) {
                     </tr>
                 </thead>
                 <tbody>
-                    ${column.differences
+                    ${differences
                       .map(
                         (diff) => `
                         <tr>
@@ -358,9 +492,114 @@ function renderColumnDetails(column) {
                 </tbody>
             </table>
         </div>`;
-    }
+}
+
+function renderBucketDifferences(histograms) {
+  const month = histograms && histograms.month;
+  if (!month || !month.buckets.length) {
+    return "";
   }
-  return '<small class="text-light mt-1">No detailed information available</small>';
+  return `
+        <small class="text-light">${month.differing_buckets} month(s) with different counts</small>
+        <div class="table-responsive">
+            <table class="table table-dark table-sm table-bordered">
+                <thead>
+                    <tr>
+                        <th>Month</th>
+                        <th>File 1 Count</th>
+                        <th>File 2 Count</th>
+                    </tr>
+                </thead>
+                <tbody>
+                    ${month.buckets
+                      .map(
+                        (bucket) => `
+                        <tr>
+                            <td>${bucket.period}</td>
+                            <td>${bucket.file1}</td>
+                            <td>${bucket.file2}</td>
+                        </tr>
+                    `
+                      )
+                      .join("")}
+                </tbody>
+            </table>
+        </div>`;
+}
+
+function renderNearMatches(nearMatches) {
+  if (!nearMatches || !nearMatches.length) {
+    return "";
+  }
+  return `
+        <small class="text-light">Possible renames</small>
+        <div class="table-responsive">
+            <table class="table table-dark table-sm table-bordered">
+                <thead>
+                    <tr>
+                        <th>File 1 Value</th>
+                        <th>File 2 Value</th>
+                        <th>Score</th>
+                    </tr>
+                </thead>
+                <tbody>
+                    ${nearMatches
+                      .map(
+                        (match) => `
+                        <tr>
+                            <td><code>${match.file1_value}</code></td>
+                            <td><code>${match.file2_value}</code></td>
+                            <td>${match.score} (${match.method})</td>
+                        </tr>
+                    `
+                      )
+                      .join("")}
+                </tbody>
+            </table>
+        </div>`;
+}
+
+function renderConfidence(column) {
+  // Sampled columns: population estimates with confidence intervals for what differed
+  if (!column.confidence) {
+    return "";
+  }
+  const differing = new Set((column.differences || []).map((diff) => diff.statistic).filter(Boolean));
+  const rows = Object.entries(column.confidence.statistics)
+    .filter(([stat]) => differing.has(stat))
+    .map(([stat, entry]) => [stat.toUpperCase(), entry])
+    .concat(column.confidence.values.map((entry) => [`<code>${entry.value}</code>`, entry]));
+  if (!rows.length) {
+    return "";
+  }
+  const interval = (estimate) =>
+    estimate.low === null ? `${estimate.estimate}` : `${estimate.estimate} (${estimate.low} – ${estimate.high})`;
+  return `
+        <small class="text-light">Estimated for all rows${column.borderline ? ", within sampling error" : ""}</small>
+        <div class="table-responsive">
+            <table class="table table-dark table-sm table-bordered">
+                <thead>
+                    <tr>
+                        <th>Statistic / Value</th>
+                        <th>File 1</th>
+                        <th>File 2</th>
+                    </tr>
+                </thead>
+                <tbody>
+                    ${rows
+                      .map(
+                        ([label, entry]) => `
+                        <tr>
+                            <td>${label}</td>
+                            <td>${interval(entry.file1)}</td>
+                            <td>${interval(entry.file2)}</td>
+                        </tr>
+                    `
+                      )
+                      .join("")}
+                </tbody>
+            </table>
+        </div>`;
 }
 
 // Utility functions